@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import glob
+import time
+import ctypes
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from utils import get_current_datetime, parse_time_range
+from project import load_project
+from planner import plan_timeline
+from probe_cache import ProbeCache
+from font_index import get_font_names
+from compositor import get_frame_pool_size
+from defaults import DEFAULT_MEMORY_SHARE
+
+# Batch renders: many projects are rendered by a local scheduler, every job runs in a worker process and never asks before overwriting files.
+# Jobs are started while the cpus and the estimated memory of the running jobs fit into the limits, jobs that do not fit are started later.
+
+JOB_BASE_MEMORY = 250 # MB of a render process without its frame buffers (python, moviepy, numpy, ffmpeg processes)
+DECODER_COUNT = 2 # decoders that usually prefetch frames at the same time (both clips of a transition)
+ENCODER_BUFFERED_FRAMES = 60 # yuv420 frames an encoder keeps for its lookahead and reference frames, roughly
+FALLBACK_TOTAL_MEMORY = 8192 # MB, when the physical memory can not be read
+
+JOB_OPTIONS = { # options of a job in a batch manifest: render() argument they are passed as
+    'width': 'output_width',
+    'height': 'output_height',
+    'fps': 'output_fps',
+    'overwrite_existing_file': 'overwrite_existing_file',
+    'jobs': 'jobs',
+    'font_dirs': 'font_dirs',
+    'max_readers': 'max_readers',
+    'engine': 'engine',
+    'audio_only': 'audio_only',
+    'range': 'time_range',
+    'preview': 'preview',
+    'max_memory': 'max_memory',
+    'segment_cache_size': 'segment_cache_size'
+}
+
+def log(text):
+    print(f'[{str(get_current_datetime())}] {text}', flush=True)
+
+def get_total_memory(): # physical memory in MB
+    try:
+        if sys.platform == 'win32':
+            class MemoryStatus(ctypes.Structure):
+                _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong), ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                    ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong), ('ullTotalVirtual', ctypes.c_ulonglong),
+                    ('ullAvailVirtual', ctypes.c_ulonglong), ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+            status = MemoryStatus(dwLength=ctypes.sizeof(MemoryStatus))
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return status.ullTotalPhys // 2**20
+        else:
+            return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 2**20
+    except (AttributeError, ValueError, OSError):
+        pass
+    return FALLBACK_TOTAL_MEMORY
+
+def load_batch(path, defaults): # returns the jobs of a manifest file or of all .wlmp files in a directory, defaults are the job options (see JOB_OPTIONS) of jobs that do not set them
+    if os.path.isdir(path): # every project is rendered next to itself with the default options
+        entries = [{'project': os.path.basename(file)} for file in sorted(glob.glob(os.path.join(path, '*.wlmp')))]
+        base_dir = os.path.abspath(path)
+    else: # json list of jobs or { "jobs": [...] }, e.g. [{ "project": "holiday.wlmp", "output": ["holiday_4k.mp4", "holiday_720p.mp4:1280x720"], "fps": 25 }]
+        with open(path, 'r', encoding='utf-8') as file:
+            entries = json.load(file)
+        if isinstance(entries, dict):
+            entries = entries.get('jobs', [])
+        base_dir = os.path.dirname(os.path.abspath(path))
+
+    jobs = []
+    for i, entry in enumerate(entries):
+        if 'project' not in entry:
+            raise ValueError(f'Job {i + 1} of batch "{path}" has no project')
+        unknown = set(entry) - set(JOB_OPTIONS) - {'project', 'output'}
+        if unknown:
+            raise ValueError(f'Job {i + 1} of batch "{path}" has unknown options: {", ".join(sorted(unknown))}')
+        project_file = os.path.join(base_dir, entry['project']) # relative to the manifest
+        outputs = entry.get('output', os.path.splitext(project_file)[0] + '.mp4')
+        outputs = [outputs] if isinstance(outputs, str) else outputs
+        job = {**defaults, **{name: value for name, value in entry.items() if name in JOB_OPTIONS}}
+        if isinstance(job.get('range'), str):
+            job['range'] = parse_time_range(job['range'])
+        job['name'] = f'{i + 1:03d}_{os.path.splitext(os.path.basename(project_file))[0]}'
+        job['project'] = project_file
+        job['output'] = [os.path.join(base_dir, output) for output in outputs]
+        jobs.append(job)
+    return jobs
+
+def get_job_groups(job):
+    from renderer import get_output_groups # the renderer (and moviepy) is imported when the batch runs, not when main.py starts
+    output_settings = {'width': job['width'], 'height': job['height'], 'fps': job['fps'], 'preset': 'medium'}
+    return get_output_groups(job['output'], output_settings, job['preview'])
+
+def estimate_job_memory(job): # rough peak memory in MB of a render job from its output sizes, the output groups are rendered one after another
+    from media_pool import READER_PREFETCH_FRAMES
+    memory = JOB_BASE_MEMORY
+    for settings, outputs in get_job_groups(job):
+        size = (settings['width'], settings['height'])
+        frame = size[0] * size[1] * 3 / 2**20 # MB of an rgb frame
+        frame_pool = frame * get_frame_pool_size(size, job['max_memory'])
+        decoders = frame * READER_PREFETCH_FRAMES * DECODER_COUNT
+        encoders = sum(output['size'][0] * output['size'][1] * 1.5 / 2**20 * ENCODER_BUFFERED_FRAMES for output in outputs)
+        memory = max(memory, JOB_BASE_MEMORY + frame_pool + decoders + encoders)
+    return int(memory * max(1, job['jobs'] if job['engine'] == 'moviepy' else 1)) # every render process composites and encodes its own segments
+
+def prepare_job(job, probe_cache): # probes the media files of the project once for all jobs (the probe cache is shared by the worker processes), raises when the project can not be rendered
+    project = load_project(job['project'])
+    plan_timeline(project, probe_cache.get)
+
+def run_job(job, log_file): # runs in a worker process, everything the render prints (also ffmpeg) goes to log_file
+    from renderer import render
+    sys.stdout.flush()
+    sys.stderr.flush()
+    stdout_fd, stderr_fd = os.dup(1), os.dup(2)
+    with open(log_file, 'w', encoding='utf-8') as file:
+        os.dup2(file.fileno(), 1)
+        os.dup2(file.fileno(), 2)
+        try:
+            render(job['project'], job['output'], **{JOB_OPTIONS[name]: job[name] for name in JOB_OPTIONS}, interactive=False)
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(stdout_fd, 1)
+            os.dup2(stderr_fd, 2)
+            os.close(stdout_fd)
+            os.close(stderr_fd)
+
+def write_summary(summary_file, summary):
+    temp_file = f'{summary_file}.tmp'
+    with open(temp_file, 'w', encoding='utf-8') as file:
+        json.dump(summary, file, indent=2)
+    os.replace(temp_file, summary_file)
+
+def run_batch(jobs, summary_file, max_cpus=None, max_memory=None): # renders the jobs with at most max_cpus render processes and max_memory MB (estimated) at the same time, writes the timings and failures of every job to summary_file (json); returns the number of failed jobs
+    max_cpus = max_cpus or os.cpu_count() or 1
+    max_memory = max_memory or int(get_total_memory() * DEFAULT_MEMORY_SHARE)
+    log_dir = os.path.splitext(summary_file)[0] + '_logs'
+    os.makedirs(log_dir, exist_ok=True)
+    log(f'Batch of {len(jobs)} job(s), at most {max_cpus} render process(es) and {max_memory} MB at the same time')
+
+    summary = {'start_time': str(get_current_datetime()), 'max_cpus': max_cpus, 'max_memory': max_memory, 'jobs': []}
+    results = []
+    pending = []
+    probe_cache = ProbeCache()
+    font_dirs = set()
+    for job in jobs:
+        result = {'name': job['name'], 'project': job['project'], 'output': job['output'], 'status': 'pending', 'log_file': os.path.join(log_dir, f'{job["name"]}.log')}
+        results.append(result)
+        try:
+            result['estimated_memory'] = estimate_job_memory(job)
+            result['cpus'] = min(max_cpus, max(1, job['jobs'])) if job['engine'] == 'moviepy' else 1
+            existing = [file for _, outputs in get_job_groups(job) for file in (output['file'] for output in outputs) if os.path.exists(file)]
+            if existing and not job['overwrite_existing_file']: # never asks
+                result['status'] = 'skipped'
+                result['error'] = f'Output file "{existing[0]}" already exists (use --overwrite-existing-file to overwrite it)'
+                log(f'Skipping job {job["name"]}: {result["error"]}')
+                continue
+            prepare_job(job, probe_cache)
+            if frozenset(job['font_dirs'] or []) not in font_dirs: # indexes new fonts once, before the jobs read the font index at the same time
+                font_dirs.add(frozenset(job['font_dirs'] or []))
+                get_font_names(job['font_dirs'])
+        except Exception as e:
+            result['status'] = 'failed'
+            result['error'] = f'{type(e).__name__}: {e}'
+            log(f'Job {job["name"]} failed: {result["error"]}')
+            continue
+        pending.append((job, result))
+    probe_cache.close()
+    summary['jobs'] = results
+    write_summary(summary_file, summary)
+
+    running = {} # { future: (job, result), ... }
+    used_cpus, used_memory = 0, 0
+    batch_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_cpus) as executor:
+        while pending or running:
+            for job, result in list(pending): # jobs that do not fit wait, smaller jobs behind them can start first
+                fits = used_cpus + result['cpus'] <= max_cpus and used_memory + result['estimated_memory'] <= max_memory
+                if fits or not running: # a job larger than the limits runs alone
+                    pending.remove((job, result))
+                    used_cpus += result['cpus']
+                    used_memory += result['estimated_memory']
+                    result['status'] = 'running'
+                    result['start_time'] = str(get_current_datetime())
+                    result['start'] = time.perf_counter()
+                    log(f'Starting job {job["name"]} ({result["cpus"]} cpu(s), ~{result["estimated_memory"]} MB), {len(pending)} waiting')
+                    running[executor.submit(run_job, job, result['log_file'])] = (job, result)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, result = running.pop(future)
+                used_cpus -= result['cpus']
+                used_memory -= result['estimated_memory']
+                result['duration'] = round(time.perf_counter() - result.pop('start'), 3)
+                result['end_time'] = str(get_current_datetime())
+                try:
+                    future.result()
+                    result['status'] = 'done'
+                    log(f'Job {job["name"]} done in {result["duration"]:.1f}s')
+                except Exception as e:
+                    result['status'] = 'failed'
+                    result['error'] = f'{type(e).__name__}: {e}'
+                    log(f'Job {job["name"]} failed after {result["duration"]:.1f}s: {result["error"]} (see "{result["log_file"]}")')
+                write_summary(summary_file, summary) # also up to date when the batch is interrupted
+
+    summary['end_time'] = str(get_current_datetime())
+    summary['duration'] = round(time.perf_counter() - batch_start, 3)
+    summary['counts'] = {status: sum(result['status'] == status for result in results) for status in ['done', 'failed', 'skipped']}
+    write_summary(summary_file, summary)
+    log(f'Batch finished in {summary["duration"]:.1f}s: {summary["counts"]["done"]} done, {summary["counts"]["failed"]} failed, {summary["counts"]["skipped"]} skipped. Summary: "{summary_file}"')
+    return summary['counts']['failed']
@@ -0,0 +1,105 @@
+# Renders a generated project with the moviepy and the ffmpeg engine, compares the outputs frame by frame and exits with code 1 when they differ more than the tolerance
+# usage: python benchmarks/engine_comparison.py [--tolerance 8] [--width 320] [--height 180] [--fps 10]
+import os
+import sys
+import time
+import tempfile
+import subprocess
+import numpy as np
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # make the renderer modules importable when run from any directory
+from moviepy import VideoFileClip
+from moviepy.config import FFMPEG_BINARY
+from renderer import read_project, build_clips, render_serial
+from planner import plan_timeline
+from ffmpeg_engine import render_ffmpeg
+from media_pool import MediaPool
+from synthetic import FONT_DIR, audio_clip, audio_fades, bound_properties, color_clip, crossfade, media_item, project_xml, text_effect, title_clip, video_clip
+
+def generate_media(media_dir): # short test clips generated with the lavfi sources of ffmpeg
+    sources = {
+        'clip1.mp4': ['-f', 'lavfi', '-i', 'testsrc2=size=480x360:rate=30:duration=4', '-f', 'lavfi', '-i', 'sine=frequency=440:duration=4'],
+        'clip2.mp4': ['-f', 'lavfi', '-i', 'smptebars=size=640x360:rate=25:duration=4', '-f', 'lavfi', '-i', 'sine=frequency=660:duration=4'],
+        'music.mp3': ['-f', 'lavfi', '-i', 'sine=frequency=220:duration=10'],
+        'photo.jpg': ['-f', 'lavfi', '-i', 'testsrc=size=400x300:rate=1', '-frames:v', '1']
+    }
+    for file, args in sources.items():
+        subprocess.run([FFMPEG_BINARY, '-y', '-hide_banner', '-loglevel', 'error'] + args + ['-shortest', os.path.join(media_dir, file)], check=True)
+
+def generate_project_xml(media_dir): # color clip, hard cut, crossfade, speed change, rotations (upside down and turned on their side), a hard cut after a clip that ends between two frames, an image with a crossfade into the next clip, a scrolling and a fading title and a soundtrack with fades
+    media_items = [
+        media_item(1, os.path.join(media_dir, 'clip1.mp4'), 1),
+        media_item(2, os.path.join(media_dir, 'clip2.mp4'), 1),
+        media_item(3, os.path.join(media_dir, 'music.mp3'), 2),
+        media_item(4, os.path.join(media_dir, 'photo.jpg'), 3)
+    ]
+    extents = [
+        color_clip(10, 1, [0.2, 0.4, 0.8]),
+        video_clip(11, 1, 0, 3.75),
+        video_clip(12, 2, 0.4, 3.9, 2, audio_fades(0.5, 0.5), crossfade(0.5)), # starts between two frames, the hard cut after it is at a whole frame
+        video_clip(13, 1, 1, 3.55, 2, properties=bound_properties(volume=0.5, rotation_steps=2)), # 1.275 s, not a whole number of frames
+        f'<ImageClip extentID="14" gapBefore="0" mediaItemID="4" duration="1.5"><Effects/><Transitions/>{bound_properties(rotation_steps=1)}</ImageClip>',
+        video_clip(15, 2, 1, 2, transitions=crossfade(0.5), properties=bound_properties(rotation_steps=3)),
+        title_clip(30, 0.5, 4, text_effect(['Engine comparison'] + [f'Scrolling line {i + 1}' for i in range(5)], scrolling=True)),
+        title_clip(31, 1, 3.5, text_effect(['Fading title'], scrolling=False)),
+        audio_clip(20, 0, 3, 0, 0, audio_fades(0.5, 0.5), bound_properties(volume=0.5))
+    ]
+    return project_xml('engine comparison', media_items, extents, [10, 11, 12, 13, 14, 15], [20], [30, 31])
+
+def render_with_engine(engine, project_file, output_file, output_settings): # same steps as renderer.render without opening the explorer, returns the render time
+    start = time.perf_counter()
+    project = read_project(project_file)
+    media_pool = MediaPool()
+    if engine == 'ffmpeg':
+        render_ffmpeg(project, output_file, output_settings, media_pool.probe, [FONT_DIR])
+    else:
+        plan = plan_timeline(project, media_pool.probe)
+        render_serial(project, plan, [{'file': output_file, 'size': (output_settings['width'], output_settings['height'])}], output_settings, media_pool, build_clips(project, plan, output_settings, media_pool), [FONT_DIR])
+    media_pool.close()
+    return time.perf_counter() - start
+
+def read_frames(file): # returns all decoded frames, moviepy's reader derives the frame count from the duration of the file (which includes the audio) and repeats the last frame
+    size = VideoFileClip(file).size
+    process = subprocess.run([FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-i', file, '-map', '0:v', '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-'], stdout=subprocess.PIPE, check=True)
+    return np.frombuffer(process.stdout, dtype=np.uint8).reshape(-1, size[1], size[0], 3)
+
+def compare_videos(file_a, file_b): # returns the frame counts and the mean absolute pixel difference of every frame
+    frames_a = read_frames(file_a)
+    frames_b = read_frames(file_b)
+    differences = [np.abs(a.astype(int) - b.astype(int)).mean() for a, b in zip(frames_a, frames_b)]
+    return len(frames_a), len(frames_b), differences
+
+def main():
+    parser = ArgumentParser(description='Compares the output of the moviepy and the ffmpeg render engine')
+    parser.add_argument('--tolerance', type=float, default=8, help='Maximum mean absolute difference (0-255) of a single frame (default: 8)')
+    parser.add_argument('--width', type=int, default=320)
+    parser.add_argument('--height', type=int, default=180)
+    parser.add_argument('--fps', type=int, default=10)
+    args = parser.parse_args()
+    output_settings = {'width': args.width, 'height': args.height, 'fps': args.fps, 'preset': 'medium'}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        generate_media(temp_dir)
+        project_file = os.path.join(temp_dir, 'comparison.wlmp')
+        with open(project_file, 'w', encoding='utf-8') as file:
+            file.write(generate_project_xml(temp_dir))
+
+        times = {}
+        for engine in ['moviepy', 'ffmpeg']:
+            times[engine] = render_with_engine(engine, project_file, os.path.join(temp_dir, f'{engine}.mp4'), output_settings)
+        frame_count_moviepy, frame_count_ffmpeg, differences = compare_videos(os.path.join(temp_dir, 'moviepy.mp4'), os.path.join(temp_dir, 'ffmpeg.mp4'))
+
+    print(f'moviepy engine: {times["moviepy"]:.2f} s, {frame_count_moviepy} frames')
+    print(f'ffmpeg engine: {times["ffmpeg"]:.2f} s, {frame_count_ffmpeg} frames')
+    print(f'frame difference: max {max(differences):.2f}, mean {sum(differences) / len(differences):.2f} (tolerance {args.tolerance})')
+    errors = []
+    if frame_count_moviepy != frame_count_ffmpeg:
+        errors.append(f'frame counts differ ({frame_count_moviepy} != {frame_count_ffmpeg})')
+    errors += [f'frame {i} differs by {difference:.2f}' for i, difference in enumerate(differences) if difference > args.tolerance]
+    for error in errors:
+        print(f'FAIL: {error}')
+    sys.exit(1 if errors else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# Parse benchmark for the project loader on generated projects
+# usage: python benchmarks/parse_benchmark.py [--clips 10000] [--repeat 3]
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # make the renderer modules importable when run from any directory
+from project import load_project
+from synthetic import audio_clip, audio_fades, bound_properties, color_clip, crossfade, media_item, project_xml, text_effect, title_clip, video_clip
+
+def generate_project_xml(clip_count): # every 4th 'Main' clip is a background color clip, every 2nd video clip has a crossfade, one soundtrack and one title per 10 clips
+    media_items = [media_item(i, f'C:\\Videos\\clip{i}.mp4', 1) for i in range(1, 101)]
+    extents = []
+    main_ids, soundtrack_ids, text_ids = [], [], []
+    next_id = 10
+    for i in range(clip_count):
+        next_id += 1
+        main_ids.append(next_id)
+        if i % 4 == 0:
+            extents.append(color_clip(next_id, 3, [0, 0.5, 1]))
+        else:
+            extents.append(video_clip(next_id, i % 100 + 1, 0, 5, transitions=crossfade(1) if i % 2 else '<Transitions/>', properties=bound_properties(rotation_steps=i % 4)))
+        if i % 10 == 0:
+            next_id += 1
+            soundtrack_ids.append(next_id)
+            extents.append(audio_clip(next_id, -1 if soundtrack_ids[1:] else 0, i % 100 + 1, 0, 0, audio_fades(1, 1), bound_properties(volume=0.5)))
+            next_id += 1
+            text_ids.append(next_id)
+            extents.append(title_clip(next_id, 2, 4, text_effect([f'Title {i}'], scrolling=False, family='Segoe UI', size=0.5)))
+    return project_xml('benchmark', media_items, extents, main_ids, soundtrack_ids, text_ids)
+
+def resolve_timeline(project): # resolves every clip and its successor like the renderer does
+    resolved = 0
+    for placeholder_id in ('Main', 'SoundTrack', 'Text'):
+        extent_ids = project.placeholders[placeholder_id]
+        for i, extent_id in enumerate(extent_ids):
+            extent = project.extents[extent_id]
+            if i < len(extent_ids) - 1:
+                extent = project.extents[extent_ids[i + 1]]
+            resolved += 1
+    return resolved
+
+def main():
+    parser = ArgumentParser(description='Benchmark parsing of generated Movie Maker projects')
+    parser.add_argument('--clips', type=int, default=10000, help='Number of clips in the generated project (default: 10000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of measured runs, the best run is reported (default: 3)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        project_file = os.path.join(temp_dir, 'benchmark.wlmp')
+        with open(project_file, 'w', encoding='utf-8') as file:
+            file.write(generate_project_xml(args.clips))
+        print(f'Generated project with {args.clips} clips ({os.path.getsize(project_file) / 1e6:.1f} MB)')
+
+        parse_times, resolve_times = [], []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            project = load_project(project_file)
+            parse_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            resolved = resolve_timeline(project)
+            resolve_times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        load_project(project_file)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    print(f'Parse: {min(parse_times) * 1000:.1f} ms ({len(project.extents) / min(parse_times):.0f} extents/s)')
+    print(f'Resolve {resolved} clips: {min(resolve_times) * 1000:.2f} ms')
+    print(f'Peak parse memory: {peak_memory / 1e6:.1f} MB')
+
+if __name__ == '__main__':
+    main()
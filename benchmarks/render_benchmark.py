@@ -0,0 +1,157 @@
+# Render benchmark: renders synthetic projects (see synthetic.py) at 720p, 1080p and 4k, reports frames/s, peak memory and time to the first frame and compares them with the stored baselines of this machine
+# usage: python benchmarks/render_benchmark.py [SCENARIO ...] [--repeat 1] [--jobs 1] [--tolerance 0.15] [--update-baseline] [--report results.json]
+# exits with code 1 when a scenario is slower, needs more memory or takes longer to the first frame than its baseline allows
+import os
+import sys
+import json
+import shutil
+import platform
+import tempfile
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # make the renderer modules importable when run from any directory
+from synthetic import FONT_DIR, DEFAULT_CONFIG, generate_project
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+DEFAULT_TOLERANCE = 0.15 # relative change of a metric that is reported as regression
+FIRST_FRAME_SLACK = 0.1 # seconds, time to the first frame is short and varies more than the other metrics
+
+SCENARIOS = { # the project config (see synthetic.DEFAULT_CONFIG) and output of every scenario
+    '720p': {'config': {'media_size': (1280, 720)}, 'size': (1280, 720), 'fps': 30},
+    '1080p': {'config': {'media_size': (1920, 1080)}, 'size': (1920, 1080), 'fps': 30},
+    '4k': {'config': {'media_size': (1920, 1080), 'clip_duration': 1.5}, 'size': (3840, 2160), 'fps': 30} # 1080p media is scaled up like in most 4k projects, shorter clips keep the run time reasonable
+}
+
+def get_machine(): # baselines are only compared on the machine they were measured on
+    from batch import get_total_memory
+    return f'{platform.system()}-{platform.machine()}-{os.cpu_count()}cpu-{round(get_total_memory() / 1024)}gb-python{platform.python_version()}'
+
+def run_scenario(project_file, output_file, scenario, jobs, report_file, log_file): # runs in a new process, so the peak memory is the one of this render only
+    from renderer import render
+    with open(log_file, 'w', encoding='utf-8') as file: # everything the render prints (also ffmpeg)
+        os.dup2(file.fileno(), 1)
+        os.dup2(file.fileno(), 2)
+        render(project_file, [output_file], *scenario['size'], scenario['fps'], overwrite_existing_file=True, jobs=jobs, font_dirs=[FONT_DIR], interactive=False, profile_file=report_file)
+
+def measure(name, scenario, media_dir, jobs): # renders the scenario with empty caches, returns its metrics
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    with tempfile.TemporaryDirectory() as temp_dir:
+        project_file = os.path.join(temp_dir, f'{name}.wlmp')
+        generate_project(project_file, media_dir, scenario['config'])
+        output_file = os.path.join(temp_dir, f'{name}.mp4')
+        report_file = os.path.join(temp_dir, 'profile.json')
+        log_file = os.path.join(temp_dir, 'render.log')
+        os.environ['MOVIE_MAKER_RENDERER_CACHE_DIR'] = os.path.join(temp_dir, 'cache') # no font index, probe infos, title sprites or segments of earlier runs
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor: # spawned, a forked process would start with the memory of this one
+                executor.submit(run_scenario, project_file, output_file, scenario, jobs, report_file, log_file).result()
+        except Exception:
+            with open(log_file, 'r', encoding='utf-8', errors='replace') as file:
+                print(file.read()[-4000:])
+            raise
+        finally:
+            del os.environ['MOVIE_MAKER_RENDERER_CACHE_DIR']
+        with open(report_file, 'r', encoding='utf-8') as file:
+            report = json.load(file)
+        frame_count = ffmpeg_parse_infos(output_file)['video_n_frames']
+    return {
+        'frames': frame_count,
+        'seconds': report['duration'],
+        'fps': round(frame_count / report['duration'], 2),
+        'peak_rss_mb': max(report['memory']['peak_rss_mb'] or 0, report['memory']['workers_peak_rss_mb'] or 0),
+        'time_to_first_frame': report['time_to_first_frame'],
+        'stages': {stage: values['seconds'] for stage, values in report['stages'].items()}
+    }
+
+def get_definition(scenario, jobs): # everything a baseline depends on besides the code and the machine, a baseline of a changed scenario is not compared
+    return json.loads(json.dumps({**scenario, 'config': {**DEFAULT_CONFIG, **scenario['config']}, 'jobs': jobs}))
+
+def find_regressions(result, baseline, tolerance): # returns a description of every metric that is worse than the baseline allows
+    regressions = []
+    if result['fps'] < baseline['fps'] * (1 - tolerance):
+        regressions.append(f'{result["fps"]:.2f} frames/s, baseline {baseline["fps"]:.2f}')
+    if result['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + tolerance):
+        regressions.append(f'peak memory {result["peak_rss_mb"]:.0f} MB, baseline {baseline["peak_rss_mb"]:.0f} MB')
+    if result['time_to_first_frame'] is not None and baseline['time_to_first_frame'] is not None and result['time_to_first_frame'] > baseline['time_to_first_frame'] * (1 + tolerance) + FIRST_FRAME_SLACK:
+        regressions.append(f'first frame after {result["time_to_first_frame"]:.2f}s, baseline {baseline["time_to_first_frame"]:.2f}s')
+    return regressions
+
+def load_baselines(baseline_file): # structure is { 'machine': { 'scenario': { 'definition': {...}, 'fps': ..., ... }, ... }, ... }
+    if not os.path.isfile(baseline_file):
+        return {}
+    with open(baseline_file, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def save_baselines(baseline_file, baselines):
+    temp_file = f'{baseline_file}.tmp'
+    with open(temp_file, 'w', encoding='utf-8') as file:
+        json.dump(baselines, file, indent=2, sort_keys=True)
+        file.write('\n')
+    os.replace(temp_file, baseline_file)
+
+def main():
+    parser = ArgumentParser(description='Benchmarks rendering of synthetic projects and compares the results with stored baselines')
+    parser.add_argument('scenarios', nargs='*', default=list(SCENARIOS), help=f'Scenarios to run (default: all of {", ".join(SCENARIOS)})')
+    parser.add_argument('--repeat', type=int, default=1, help='Renders per scenario, the best run is reported (default: 1)')
+    parser.add_argument('--jobs', type=int, default=1, help='Render processes (default: 1)')
+    parser.add_argument('--media-dir', help='Directory of the generated media, kept for later runs (default: in the cache directory of the renderer)')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='Baseline file (default: benchmarks/baselines.json)')
+    parser.add_argument('--update-baseline', action='store_true', help='Store the results as the baselines of this machine instead of comparing them')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help=f'Relative change of a metric that is a regression (default: {DEFAULT_TOLERANCE})')
+    parser.add_argument('--report', help='Write the results to this json file')
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(unknown)}')
+
+    from utils import get_cache_dir
+    media_dir = args.media_dir or os.path.join(get_cache_dir(), 'benchmark_media')
+    if not shutil.which('ffmpeg') and not os.environ.get('FFMPEG_BINARY'):
+        print('Warning: ffmpeg was not found on the path, the ffmpeg binary of imageio is used')
+
+    machine = get_machine()
+    baselines = load_baselines(args.baseline)
+    machine_baselines = baselines.get(machine, {})
+    print(f'Machine: {machine}')
+    results = {}
+    failed = False
+    for name in args.scenarios:
+        definition = get_definition(SCENARIOS[name], args.jobs)
+        runs = [measure(name, SCENARIOS[name], media_dir, args.jobs) for _ in range(args.repeat)]
+        result = {
+            'definition': definition,
+            **max(runs, key=lambda run: run['fps']), # the best run has the least noise from other processes
+            'peak_rss_mb': min(run['peak_rss_mb'] for run in runs),
+            'time_to_first_frame': min((run['time_to_first_frame'] for run in runs if run['time_to_first_frame'] is not None), default=None)
+        }
+        results[name] = result
+        first_frame = f'{result["time_to_first_frame"]:.2f}s' if result['time_to_first_frame'] is not None else '-'
+        line = f'{name}: {result["frames"]} frames in {result["seconds"]:.2f}s, {result["fps"]:.2f} frames/s, peak memory {result["peak_rss_mb"]:.0f} MB, first frame after {first_frame}'
+
+        baseline = machine_baselines.get(name)
+        if args.update_baseline:
+            print(line)
+        elif baseline is None:
+            print(f'{line} (no baseline)')
+        elif baseline['definition'] != definition:
+            print(f'{line} (scenario changed since its baseline, update it with --update-baseline)')
+        else:
+            regressions = find_regressions(result, baseline, args.tolerance)
+            print(f'{line} ({result["fps"] / baseline["fps"] - 1:+.0%} frames/s against the baseline)')
+            for regression in regressions:
+                print(f'REGRESSION {name}: {regression}')
+            failed = failed or bool(regressions)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as file:
+            json.dump({'machine': machine, 'scenarios': results}, file, indent=2)
+    if args.update_baseline:
+        baselines[machine] = {**machine_baselines, **{name: {key: value for key, value in result.items() if key != 'stages'} for name, result in results.items()}}
+        save_baselines(args.baseline, baselines)
+        print(f'Baselines of {", ".join(results)} stored in "{args.baseline}"')
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
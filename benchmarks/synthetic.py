@@ -0,0 +1,205 @@
+# Generates synthetic Movie Maker projects and the media they use (lavfi test sources of ffmpeg, the bundled open font), so renders can be benchmarked offline and reproduced on every machine
+# usage: python benchmarks/synthetic.py OUTPUT_DIR [--video-clips 6] [--color-clips 2] [--crossfades 3] [--speed-changes 2] [--soundtrack-clips 2] [--scrolling-titles 1] [--fading-titles 2] [--clip-duration 3] [--media-size 1280x720]
+import os
+import sys
+import subprocess
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # make the renderer modules importable when run from any directory
+from moviepy.config import FFMPEG_BINARY
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts') # pass as font dir to the renderer
+FONT_FAMILY = 'Lato' # fonts/Lato-Regular.ttf, SIL Open Font License (see fonts/OFL.txt)
+VIDEO_SOURCES = ['testsrc2', 'smptehdbars', 'testsrc', 'rgbtestsrc', 'yuvtestsrc'] # lavfi sources the video files cycle through
+SPEED_CHANGES = [2.0, 0.5] # speeds of the clips with a speed change, alternating
+CROSSFADE_DURATION = 0.75
+TITLE_GAP_SHARE = 0.3 # part of the time per title that is a gap before the title
+SOUNDTRACK_OVERLAP = 1.0 # seconds every soundtrack clip after the first is shifted into the previous one (negative gapBefore)
+
+DEFAULT_CONFIG = {
+    'video_clips': 6,
+    'color_clips': 2,
+    'crossfades': 3, # video clips with a crossfade into the previous clip
+    'speed_changes': 2, # video clips played faster or slower
+    'soundtrack_clips': 2,
+    'scrolling_titles': 1,
+    'fading_titles': 2,
+    'clip_duration': 3.0, # seconds of every clip on the timeline
+    'media_files': 3, # different video files the video clips cycle through
+    'media_size': (1280, 720),
+    'media_fps': 30
+}
+
+def spread(count, total): # indices of count items spread evenly over total items
+    count = min(count, total)
+    return {int((i + 0.5) * total / count) for i in range(count)} if count > 0 else set()
+
+def get_media_duration(config): # the fastest clip with a crossfade needs the longest part of its media file
+    return (config['clip_duration'] + CROSSFADE_DURATION) * max([1.0] + SPEED_CHANGES) + 1
+
+def get_timeline_duration(config): # clips with a crossfade are longer by the crossfade, so every clip adds clip_duration
+    return (config['video_clips'] + config['color_clips']) * config['clip_duration']
+
+def get_music_duration(config): # the soundtrack clips are cut from one music file
+    return get_timeline_duration(config) + SOUNDTRACK_OVERLAP * config['soundtrack_clips']
+
+def get_media_files(media_dir, config): # returns the video files and the soundtrack file, named by their settings so generated media can be shared by several projects
+    width, height = config['media_size']
+    duration = get_media_duration(config)
+    videos = [os.path.join(media_dir, f'{VIDEO_SOURCES[i % len(VIDEO_SOURCES)]}_{i}_{width}x{height}_{config["media_fps"]}fps_{duration:g}s.mp4') for i in range(config['media_files'])]
+    music = os.path.join(media_dir, f'music_{get_music_duration(config):g}s.mp3')
+    return videos, music
+
+def run_ffmpeg(args, file):
+    temp_file = f'{file}.tmp{os.path.splitext(file)[1]}' # renamed when complete, an interrupted run does not leave a broken file behind
+    subprocess.run([FFMPEG_BINARY, '-y', '-hide_banner', '-loglevel', 'error'] + args + ['-map_metadata', '-1', '-fflags', '+bitexact', '-flags', '+bitexact', temp_file], check=True)
+    os.replace(temp_file, file)
+
+def generate_media(media_dir, config): # generates the missing media files of the config, returns the video files and the soundtrack file
+    os.makedirs(media_dir, exist_ok=True)
+    width, height = config['media_size']
+    duration = get_media_duration(config)
+    videos, music = get_media_files(media_dir, config)
+    for i, file in enumerate(videos):
+        if not os.path.isfile(file):
+            run_ffmpeg([
+                '-f', 'lavfi', '-i', f'{VIDEO_SOURCES[i % len(VIDEO_SOURCES)]}=size={width}x{height}:rate={config["media_fps"]}:duration={duration}',
+                '-f', 'lavfi', '-i', f'sine=frequency={330 + 110 * i}:duration={duration}',
+                '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-shortest'
+            ], file)
+    if not os.path.isfile(music):
+        run_ffmpeg(['-f', 'lavfi', '-i', f'sine=frequency=220:beep_factor=4:duration={get_music_duration(config)}'], music)
+    return videos, music
+
+def bound_properties(volume=1.0, rotation_steps=0):
+    return f'<BoundProperties><BoundPropertyBool Name="Mute" Value="false"/><BoundPropertyFloat Name="Volume" Value="{volume}"/><BoundPropertyInt Name="rotateStepNinety" Value="{rotation_steps}"/></BoundProperties>'
+
+def audio_fades(fade_in, fade_out):
+    return f'<Effects><AudioEffect effectTemplateID="AudioFadeEffectTemplate"><BoundProperties><BoundPropertyFloat Name="AudioFadeInDuration" Value="{fade_in}"/><BoundPropertyFloat Name="AudioFadeOutDuration" Value="{fade_out}"/></BoundProperties></AudioEffect></Effects>'
+
+def color(values):
+    return ''.join(f'<BoundPropertyFloatElement Value="{value}"/>' for value in values)
+
+def text_effect(lines, scrolling, family=FONT_FAMILY, size=None):
+    template = 'TextEffectScrollTemplate' if scrolling else 'TextEffectFadeZoomTemplate'
+    strings = ''.join(f'<BoundPropertyStringElement Value="{line}"/>' for line in lines)
+    return (
+        f'<Effects><TextEffect effectTemplateID="{template}" TextScriptId="0"><BoundProperties>'
+        f'<BoundPropertyFloatSet Name="color">{color([1, 1, 1])}</BoundPropertyFloatSet>'
+        f'<BoundPropertyFloatSet Name="outlineColor">{color([0, 0, 0])}</BoundPropertyFloatSet>'
+        '<BoundPropertyInt Name="outlineSizeIndex" Value="1"/>'
+        f'<BoundPropertyStringSet Name="family"><BoundPropertyStringElement Value="{family}"/></BoundPropertyStringSet>'
+        '<BoundPropertyStringSet Name="justify"><BoundPropertyStringElement Value="MIDDLE"/></BoundPropertyStringSet>'
+        f'<BoundPropertyStringSet Name="string">{strings}</BoundPropertyStringSet>'
+        f'<BoundPropertyFloat Name="size" Value="{size or (0.4 if scrolling else 0.6)}"/>'
+        '</BoundProperties></TextEffect></Effects>'
+    )
+
+def crossfade(duration):
+    return f'<Transitions><ShaderTransition effectTemplateID="CrossFadeTransitionTemplate" duration="{duration}"><BoundProperties/></ShaderTransition></Transitions>'
+
+def media_item(item_id, file, item_type): # item_type 1 is a video, 2 an audio file and 3 an image
+    return f'<MediaItem id="{item_id}" filePath="{file}" mediaItemType="{item_type}"/>'
+
+def color_clip(extent_id, duration, values):
+    return f'<TitleClip extentID="{extent_id}" gapBefore="0" duration="{duration}"><Effects/><Transitions/><BoundProperties><BoundPropertyFloatSet Name="diffuseColor">{color(values)}</BoundPropertyFloatSet></BoundProperties></TitleClip>'
+
+def title_clip(extent_id, gap_before, duration, effects): # effects is a text_effect()
+    return f'<TitleClip extentID="{extent_id}" gapBefore="{gap_before}" duration="{duration}">{effects}<Transitions/><BoundProperties/></TitleClip>'
+
+def video_clip(extent_id, media_item_id, in_time, out_time, speed=1, effects='<Effects/>', transitions='<Transitions/>', properties=None):
+    return f'<VideoClip extentID="{extent_id}" gapBefore="0" mediaItemID="{media_item_id}" inTime="{in_time}" outTime="{out_time}" speed="{speed}">{effects}{transitions}{properties or bound_properties()}</VideoClip>'
+
+def audio_clip(extent_id, gap_before, media_item_id, in_time, out_time, effects, properties):
+    return f'<AudioClip extentID="{extent_id}" gapBefore="{gap_before}" mediaItemID="{media_item_id}" inTime="{in_time}" outTime="{out_time}" speed="1">{effects}{properties}</AudioClip>'
+
+def extent_selector(extent_id, extent_ids):
+    extent_refs = ''.join(f'<ExtentRef id="{id}"/>' for id in extent_ids)
+    return f'<ExtentSelector extentID="{extent_id}" gapBefore="0" primaryTrack="true"><Effects/><Transitions/><BoundProperties/><ExtentRefs>{extent_refs}</ExtentRefs></ExtentSelector>'
+
+def project_xml(name, media_items, extents, main_ids=(), soundtrack_ids=(), text_ids=()): # the extent selectors of the 'Main', 'SoundTrack' and 'Text' tracks are appended to the extents
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        f'<Project name="{name}" themeId="0" version="65540" templateID="SimpleProjectTemplate">'
+        f'<MediaItems>{"".join(media_items)}</MediaItems>'
+        f'<Extents>{"".join(extents)}{extent_selector(1, main_ids)}{extent_selector(2, soundtrack_ids)}{extent_selector(3, text_ids)}</Extents>'
+        '<BoundPlaceholders><BoundPlaceholder placeholderID="SingleExtentView" extentID="0"/><BoundPlaceholder placeholderID="Main" extentID="1"/><BoundPlaceholder placeholderID="SoundTrack" extentID="2"/><BoundPlaceholder placeholderID="Text" extentID="3"/></BoundPlaceholders>'
+        '</Project>'
+    )
+
+def generate_project_xml(videos, music, config): # color clips are spread over the 'Main' sequence, crossfades and speed changes over its video clips, the titles over the whole timeline
+    clip_duration = config['clip_duration']
+    media_items = [media_item(i + 1, file, 1) for i, file in enumerate(videos)]
+    media_items.append(media_item(len(videos) + 1, music, 2))
+    extents = []
+    main_ids, soundtrack_ids, text_ids = [], [], []
+
+    clip_count = config['video_clips'] + config['color_clips']
+    color_indices = spread(config['color_clips'], clip_count)
+    after_video = [i for i in range(1, clip_count) if i not in color_indices and i - 1 not in color_indices] # crossfades are only added between two video clips
+    crossfade_indices = {after_video[i] for i in spread(config['crossfades'], len(after_video))}
+    speed_indices = sorted(spread(config['speed_changes'], config['video_clips']))
+    video_index = 0
+    for i in range(clip_count):
+        extent_id = 100 + i
+        main_ids.append(extent_id)
+        if i in color_indices:
+            extents.append(color_clip(extent_id, clip_duration, [0.1 * (i % 10), 0.4, 0.8]))
+            continue
+        speed = SPEED_CHANGES[speed_indices.index(video_index) % len(SPEED_CHANGES)] if video_index in speed_indices else 1.0
+        has_crossfade = i in crossfade_indices
+        duration = clip_duration + (CROSSFADE_DURATION if has_crossfade else 0) # the timeline stays get_timeline_duration() long
+        in_time = round((video_index * 0.5) % max(0.0, get_media_duration(config) - duration * speed - 0.5), 3)
+        transitions = crossfade(CROSSFADE_DURATION) if has_crossfade else '<Transitions/>'
+        effects = audio_fades(0.25, 0.25) if video_index % 2 else '<Effects/>'
+        extents.append(video_clip(extent_id, video_index % len(videos) + 1, in_time, round(in_time + duration * speed, 3), speed, effects, transitions, bound_properties(volume=0.8)))
+        video_index += 1
+    timeline_duration = get_timeline_duration(config)
+
+    soundtrack_count = config['soundtrack_clips']
+    for i in range(soundtrack_count): # every clip after the first is shifted into the previous one, which cuts off its end
+        extent_id = 200 + i
+        soundtrack_ids.append(extent_id)
+        duration = timeline_duration / soundtrack_count + (SOUNDTRACK_OVERLAP if i < soundtrack_count - 1 else 0)
+        in_time = round(i * timeline_duration / soundtrack_count, 3)
+        extents.append(audio_clip(extent_id, -SOUNDTRACK_OVERLAP if i > 0 else 0, len(videos) + 1, in_time, round(in_time + duration, 3), audio_fades(1, 1), bound_properties(volume=0.5)))
+
+    title_count = config['scrolling_titles'] + config['fading_titles']
+    scrolling_indices = spread(config['scrolling_titles'], title_count)
+    for i in range(title_count):
+        extent_id = 300 + i
+        text_ids.append(extent_id)
+        time_per_title = timeline_duration / title_count
+        scrolling = i in scrolling_indices
+        lines = [f'Benchmark title {i + 1}'] + ([f'Scrolling credits line {line + 1}' for line in range(8)] if scrolling else ['Synthetic project'])
+        extents.append(title_clip(extent_id, round(time_per_title * TITLE_GAP_SHARE, 3), round(time_per_title * (1 - TITLE_GAP_SHARE), 3), text_effect(lines, scrolling)))
+
+    return project_xml('synthetic benchmark', media_items, extents, main_ids, soundtrack_ids, text_ids)
+
+def generate_project(project_file, media_dir, config=None): # writes the project of the config (see DEFAULT_CONFIG) and generates its missing media in media_dir, returns the full config
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    videos, music = generate_media(media_dir, config)
+    with open(project_file, 'w', encoding='utf-8') as file:
+        file.write(generate_project_xml([os.path.abspath(video) for video in videos], os.path.abspath(music), config))
+    return config
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+def main():
+    parser = ArgumentParser(description='Generates a synthetic Movie Maker project and its media for benchmarks')
+    parser.add_argument('output_dir', help='Directory of the project (synthetic.wlmp) and its media')
+    for name, value in DEFAULT_CONFIG.items():
+        if name != 'media_size':
+            parser.add_argument('--' + name.replace('_', '-'), type=type(value), default=value, help=f'(default: {value})')
+    parser.add_argument('--media-size', type=parse_size, default=DEFAULT_CONFIG['media_size'], help='WIDTHxHEIGHT of the video files (default: 1280x720)')
+    args = parser.parse_args()
+
+    project_file = os.path.join(args.output_dir, 'synthetic.wlmp')
+    os.makedirs(args.output_dir, exist_ok=True)
+    config = generate_project(project_file, args.output_dir, {name: getattr(args, name) for name in DEFAULT_CONFIG})
+    print(f'Generated "{project_file}" ({get_timeline_duration(config):g}s timeline), render it with --font-dir "{FONT_DIR}"')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import time
+import numpy as np
+import profiling
+from defaults import DEFAULT_MAX_MEMORY
+
+# In-place compositing of the timeline: every output frame is blended into one of a fixed set of preallocated buffers
+# in 8 bit fixed point (uint16 intermediates), so no full-size float frames or masks are created per frame.
+
+BLEND_BAND_ROWS = 64 # rows blended at once, keeps the uint16 scratch buffers small and in the cpu cache
+
+class FramePool: # ring of preallocated output frames, a buffer is reused after count - 1 further frames, so at most count - 2 frames may wait for the encoder (see write_video)
+    def __init__(self, size, count):
+        self.count = max(3, int(count))
+        self.buffers = [np.zeros((size[1], size[0], 3), dtype=np.uint8) for _ in range(self.count)]
+        self.next_index = 0
+
+    def next(self):
+        frame = self.buffers[self.next_index]
+        self.next_index = (self.next_index + 1) % self.count
+        return frame
+
+def get_frame_pool_size(size, max_memory=DEFAULT_MAX_MEMORY): # number of output frames that fit into max_memory MB, more than the encoder queue can hold are not needed
+    from pipeline import ENCODER_QUEUE_SIZE # imported here because pipeline imports moviepy, batch jobs are planned without it
+    frame_bytes = size[0] * size[1] * 3
+    return max(3, min(ENCODER_QUEUE_SIZE + 2, int(max_memory * 2**20 // frame_bytes)))
+
+def with_crossfades(clip, fade_in=0, fade_out=0): # like .with_effects([vfx.CrossFadeIn(fade_in), vfx.CrossFadeOut(fade_out)]) but faded by the compositor with one opacity per frame instead of a float mask
+    clip = clip.copy()
+    clip.crossfade_in = fade_in
+    clip.crossfade_out = fade_out
+    return clip
+
+def get_opacity(clip, t): # linear fades like moviepy's CrossFadeIn/CrossFadeOut, t is the time in the clip
+    opacity = 1.0
+    fade_in, fade_out = getattr(clip, 'crossfade_in', 0), getattr(clip, 'crossfade_out', 0)
+    if fade_in > 0 and t < fade_in:
+        opacity *= t / fade_in
+    if fade_out > 0 and clip.duration - t < fade_out:
+        opacity *= (clip.duration - t) / fade_out
+    return min(max(opacity, 0.0), 1.0)
+
+def divide_by_255(values, temp): # values = round(values / 255) in place for uint16 values <= 255 * 255, without a division
+    values += 128
+    np.right_shift(values, 8, out=temp)
+    values += temp
+    values >>= 8
+
+def blend(dst, src, alpha, scratch): # dst = (src * alpha + dst * (255 - alpha)) / 255 in place, alpha is an int or an uint16 array (h, w, 1) of 0-255 values
+    product, inverse, temp, inverse_alpha = scratch
+    for row in range(0, dst.shape[0], BLEND_BAND_ROWS):
+        band = slice(row, row + BLEND_BAND_ROWS)
+        d, s = dst[band], src[band]
+        p, i, tmp = product[:d.shape[0], :d.shape[1]], inverse[:d.shape[0], :d.shape[1]], temp[:d.shape[0], :d.shape[1]]
+        if isinstance(alpha, np.ndarray):
+            a = alpha[band]
+            ia = inverse_alpha[:d.shape[0], :d.shape[1]]
+            np.subtract(np.uint16(255), a, out=ia)
+        else:
+            a, ia = np.uint16(alpha), np.uint16(255 - alpha)
+        np.multiply(s, a, out=p)
+        np.multiply(d, ia, out=i)
+        p += i
+        divide_by_255(p, tmp)
+        np.copyto(d, p, casting='unsafe')
+
+class LayerCache: # uint8 frame and alpha of every clip, converted again only when the clip returns a different array (color and text clips return the same array for every frame)
+    def __init__(self):
+        self.entries = {} # { (id(clip), kind): (array, converted), ... } one entry per clip and kind, so decoded video frames are not kept
+
+    def get(self, clip, kind, array, convert):
+        entry = self.entries.get((id(clip), kind))
+        if entry is None or entry[0] is not array:
+            entry = (array, convert(array))
+            self.entries[(id(clip), kind)] = entry
+        return entry[1]
+
+    def keep(self, clips): # forgets the clips that are not playing anymore, so their last frames (e.g. decoded images) can be freed
+        ids = {id(clip) for clip in clips}
+        if any(key[0] not in ids for key in self.entries):
+            self.entries = {key: entry for key, entry in self.entries.items() if key[0] in ids}
+
+def to_uint8(frame):
+    return frame if frame.dtype == np.uint8 else frame.astype(np.uint8)
+
+def to_alpha(mask): # float mask (0-1) to uint16 alpha (0-255) of shape (h, w, 1), truncated like moviepy's blit
+    return (mask * 255).astype(np.uint16)[:, :, np.newaxis]
+
+def make_scratch(width): # uint16 buffers for blend() of one band of rows
+    return (
+        np.empty((BLEND_BAND_ROWS, width, 3), dtype=np.uint16),
+        np.empty((BLEND_BAND_ROWS, width, 3), dtype=np.uint16),
+        np.empty((BLEND_BAND_ROWS, width, 3), dtype=np.uint16),
+        np.empty((BLEND_BAND_ROWS, width, 1), dtype=np.uint16)
+    )
+
+def composite_layers(frame, layers, t, cache, scratch): # blends the clips playing at timeline time t onto frame (black) in layer order
+    frame.fill(0)
+    height, width = frame.shape[:2]
+    profile = profiling.active
+    for clip in layers:
+        ct = t - clip.start
+        opacity = int(get_opacity(clip, ct) * 255) # truncated like moviepy's blit of a float mask
+        if opacity == 0:
+            continue
+        if profile is not None:
+            fetch_start = time.perf_counter()
+        src = cache.get(clip, 'frame', clip.get_frame(ct), to_uint8)
+        alpha = cache.get(clip, 'alpha', clip.mask.get_frame(ct), to_alpha) if clip.mask is not None else None
+        x, y = (int(value) for value in clip.pos(ct))
+        if profile is not None:
+            profile.frame['fetch'] += time.perf_counter() - fetch_start # decoding and effects of the clip
+
+        # part of the clip inside the frame
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + src.shape[1], width), min(y + src.shape[0], height)
+        if left >= right or top >= bottom:
+            continue
+        dst = frame[top:bottom, left:right]
+        src = src[top - y:bottom - y, left - x:right - x]
+        if alpha is not None:
+            alpha = alpha[top - y:bottom - y, left - x:right - x]
+            if opacity < 255:
+                alpha = (alpha * opacity + 127) // 255 # uint16, only while fading
+            blend(dst, src, alpha, scratch)
+        elif opacity < 255:
+            blend(dst, src, opacity, scratch)
+        else:
+            dst[...] = src
+    return frame
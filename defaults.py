@@ -0,0 +1,5 @@
+# Default values of the command line options, without imports so that main.py can show them in --help without loading numpy, moviepy or fontTools
+
+DEFAULT_MAX_MEMORY = 256 # MB of output frame buffers (composited frames waiting for the encoder included)
+DEFAULT_SEGMENT_CACHE_SIZE = 0 # MB of encoded segments that are kept, least recently used segments are deleted first; off by default because every cached render is split into segments and joined again
+DEFAULT_MEMORY_SHARE = 0.75 # of the physical memory that all running batch jobs may use together when no limit is given
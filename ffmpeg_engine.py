@@ -0,0 +1,299 @@
+import os
+import math
+import subprocess
+import tempfile
+from PIL import Image
+from moviepy.config import FFMPEG_BINARY
+from planner import plan_timeline
+from mixer import get_audio_codec
+from pipeline import get_video_codec, get_scale_filter
+from media_pool import get_geometry_filters, get_source_size
+import profiling
+from titles import get_title_sprite, get_scroll_speed, TITLE_FADE_DURATION
+from images import load_image
+from segments import get_cut_frame
+
+# Renders the project with a single ffmpeg call, all clips are mapped to filters of one filter graph so the video data never enters python.
+# Requires ffmpeg 4.4 or newer (xfade and amix normalize option).
+
+SEEK_MARGIN = 0.5 # seconds of a clip starting before the rendered part of the timeline that are decoded before it, so the source frame shown at the start is decoded too (for sources with at least 2 fps)
+
+def get_codecs(output_file): # same codecs as moviepy's write_videofile infers from the file extension
+    return get_video_codec(output_file), get_audio_codec(output_file)
+
+def get_fit_filters(size, output_settings): # scale to the output width (aspect ratio is maintained) and place at the top left of the frame like the moviepy compositor does
+    width, height = output_settings['width'], output_settings['height']
+    scaled_height = int(size[1] * width / size[0])
+    filters = [f'scale={width}:{scaled_height}:flags=lanczos'] if size[0] != width else []
+    filters.append('setsar=1')
+    if scaled_height < height:
+        filters.append(f'pad={width}:{height}:0:0:black')
+    elif scaled_height > height:
+        filters.append(f'crop={width}:{height}:0:0')
+    return filters
+
+def get_frame_range(clip, fps): # first output frame and number of frames that show the clip, frame n shows the clips with start <= n/fps < end like in the moviepy timeline
+    first_frame = get_cut_frame(max(0.0, clip['start']), fps)
+    return first_frame, get_cut_frame(clip['end'], fps) - first_frame
+
+def get_frame_count_filters(frame_count): # pads with the last frame and cuts the stream to exactly frame_count frames, so every hard cut lands on the same frame as in the moviepy engine
+    return ['tpad=stop_mode=clone:stop=-1', f'trim=end_frame={frame_count}']
+
+def get_seek(clip, skip_start): # source time after the in time of the clip that is not decoded, skip_start is the part of the clip before the start of the rendered timeline
+    return max(0.0, skip_start * clip['speed'] - SEEK_MARGIN)
+
+def get_input_args(clip, skip_start): # seeks the input to the in time of the clip plus get_seek()
+    seek = get_seek(clip, skip_start)
+    return ['-ss', f'{clip["in_time"] + seek:.6f}', '-t', f'{clip["out_time"] - clip["in_time"] - seek:.6f}', '-i', clip['file']]
+
+def get_audio_filters(clip, skip_start): # speed, volume and fades of an audio source (seeked by get_input_args), then delayed to its position on the timeline
+    seek = get_seek(clip, skip_start)
+    filters = ['asetpts=PTS-STARTPTS' + (f'+{seek:.6f}/TB' if seek > 0 else ''), 'aresample=44100', 'aformat=sample_fmts=fltp:channel_layouts=stereo'] # the timestamps start at the seeked time of the source, so the fades are at the same time as without seeking
+    if clip['speed'] != 1: # moviepy changes speed by resampling, so the pitch changes as well
+        filters += [f'asetrate={44100 * clip["speed"]:.6f}', 'aresample=44100']
+    filters.append(f'volume={clip["volume"]:.6f}')
+    if clip['audio_fade_in'] > 0:
+        filters.append(f'afade=t=in:st=0:d={clip["audio_fade_in"]:.6f}')
+    if clip['audio_fade_out'] > 0:
+        filters.append(f'afade=t=out:st={max(0, clip["duration"] - clip["audio_fade_out"]):.6f}:d={clip["audio_fade_out"]:.6f}')
+    if skip_start > 0:
+        filters += [f'atrim=start={skip_start:.6f}', 'asetpts=PTS-STARTPTS']
+    delay = int(round(max(0, clip['start']) * 1000))
+    if delay > 0:
+        filters.append(f'adelay=delays={delay}:all=1')
+    return filters
+
+def get_title_fade_filters(duration): # fades the alpha channel of a title like the compositor fades its opacity
+    return [f'fade=t=in:st=0:d={TITLE_FADE_DURATION}:alpha=1', f'fade=t=out:st={max(0, duration - TITLE_FADE_DURATION):.6f}:d={TITLE_FADE_DURATION}:alpha=1']
+
+def get_range_plan(plan, time_range, fps): # returns the plan restricted to the clips and titles intersecting time_range (start, end) with times relative to the start of the filter graph, and the number of frames before the start of the range; when the range starts in a crossfade, the graph starts with the crossfade (on a frame of the range) because xfade can not start halfway
+    start, end = time_range
+    main = [clip for clip in plan['main'] if clip['start'] < end and clip['end'] > start]
+    skip_frames = 0
+    for clip in main[1:]: # the first clip of the range has no transition in it
+        if clip['crossfade_duration'] > 0 and clip['start'] < start:
+            skip_frames = math.ceil((start - clip['start']) * fps - 1e-6)
+    graph_start = start - skip_frames / fps
+
+    def shift(clips):
+        return [{**clip, 'start': clip['start'] - graph_start, 'end': clip['end'] - graph_start} for clip in clips if clip['start'] < end and clip['end'] > graph_start]
+
+    return {
+        'main': shift(main),
+        'soundtrack': shift(plan['soundtrack']),
+        'titles': shift(plan['titles']),
+        'video_duration': min(plan['video_duration'], end) - graph_start,
+        'duration': end - graph_start
+    }, skip_frames
+
+def build_filter_graph(plan, title_images, output_settings, images=None): # returns input arguments and the filter graph for the planned timeline, images are the decoded image clips (see write_images)
+    width, height, fps = output_settings['width'], output_settings['height'], output_settings['fps']
+    input_args = []
+    filters = []
+    audio_labels = []
+
+    def add_input(args):
+        input_args.extend(args)
+        return input_args.count('-i') - 1
+
+    # main sequence: every clip becomes a stream of output size and fps, clips joined by hard cuts are concatenated and crossfades are mapped to xfade
+    groups = [] # [[(label, clip), ...], ...] clips of a group are joined without transition
+    for i, clip in enumerate(plan['main']):
+        label = f'm{i}'
+        skip_start = max(0, -clip['start']) # only the first clip can start before zero (when it has a transition or starts before a time range)
+        first_frame, frame_count = get_frame_range(clip, fps)
+        if clip['type'] == 'color':
+            color = '0x%02x%02x%02x' % tuple(clip['color'][:3])
+            filters.append(f'color=c={color}:s={width}x{height}:r={fps}:d={clip["duration"]:.6f},' + ','.join(get_frame_count_filters(frame_count)) + f',format=yuv420p,settb=AVTB[{label}]')
+        elif clip['type'] == 'image': # already rotated and scaled to the output width, looped for the duration of the clip
+            image_file, size = images[clip['extent_id']]
+            input_index = add_input(['-loop', '1', '-framerate', str(fps), '-t', f'{clip["duration"]:.6f}', '-i', image_file])
+            video_filters = get_frame_count_filters(frame_count) + get_fit_filters(size, output_settings) + ['format=yuv420p', 'settb=AVTB']
+            filters.append(f'[{input_index}:v]' + ','.join(video_filters) + f'[{label}]')
+        else:
+            input_index = add_input(get_input_args(clip, skip_start))
+            shift = first_frame / fps - clip['start'] - get_seek(clip, skip_start) / clip['speed'] # time in the seeked clip of its first output frame, like the moviepy timeline the frames are taken at n/fps - start
+            video_filters = [f'setpts=PTS/{clip["speed"]:.6f}-{shift:.6f}/TB', f'fps={fps}:start_time=0:round=up'] + get_frame_count_filters(frame_count) # the timestamps of an input seeked with -ss start at the seek time, frames decoded before the start of the clip keep their time and only the last of them is kept by fps
+            geometry_filters, size = get_geometry_filters(get_source_size(clip), clip['rotation_steps'], width, height) # same geometry as the readers of the moviepy engine
+            video_filters += geometry_filters + get_fit_filters(size, output_settings) + ['format=yuv420p', 'settb=AVTB']
+            filters.append(f'[{input_index}:v]' + ','.join(video_filters) + f'[{label}]')
+            if clip['has_audio'] and clip['volume'] > 0:
+                filters.append(f'[{input_index}:a]' + ','.join(get_audio_filters(clip, skip_start)) + f'[a{label}]')
+                audio_labels.append(f'a{label}')
+        if clip['crossfade_duration'] > 0 and groups:
+            groups.append([(label, clip)])
+        elif groups:
+            groups[-1].append((label, clip))
+        else:
+            groups.append([(label, clip)])
+
+    video_label = None
+    for g, group in enumerate(groups):
+        group_label = group[0][0]
+        if len(group) > 1:
+            group_label = f'g{g}'
+            filters.append(''.join(f'[{label}]' for label, clip in group) + f'concat=n={len(group)}:v=1:a=0,settb=AVTB[{group_label}]') # concat changes the time base, xfade needs the same on both inputs and rounds its offset and duration to it, so all streams use the microsecond time base instead of 1/fps
+        if video_label is None:
+            video_label = group_label
+        else:
+            first_clip = group[0][1]
+            filters.append(f'[{video_label}][{group_label}]xfade=transition=fade:duration={first_clip["crossfade_duration"]:.6f}:offset={first_clip["start"]:.6f}[x{g}]')
+            video_label = f'x{g}'
+
+    if video_label is None: # no clips in the main sequence
+        filters.append(f'color=c=black:s={width}x{height}:r={fps}:d={plan["duration"]:.6f},format=yuv420p[base]')
+        video_label = 'base'
+    elif plan['duration'] > plan['video_duration']: # titles go on after the last clip
+        filters.append(f'[{video_label}]tpad=stop_mode=add:stop_duration={plan["duration"] - plan["video_duration"]:.6f}:color=black[padded]')
+        video_label = 'padded'
+
+    # titles are pre-rasterized images that are faded in their alpha channel and overlaid at their time
+    for i, title in enumerate(plan['titles']):
+        image_file, clip_size, (offset_x, offset_y), should_scroll = title_images[title['extent_id']]
+        input_index = add_input(['-loop', '1', '-framerate', str(fps), '-t', f'{title["duration"]:.6f}', '-i', image_file])
+        title_filters = ['format=rgba']
+        if not should_scroll:
+            title_filters += get_title_fade_filters(title['duration'])
+        if title['start'] < 0: # title started before the time range
+            title_filters += [f'trim=start={-title["start"]:.6f}', 'setpts=PTS-STARTPTS']
+        else:
+            title_filters.append(f'setpts=PTS-STARTPTS+{title["start"]:.6f}/TB')
+        filters.append(f'[{input_index}:v]' + ','.join(title_filters) + f'[t{i}]')
+        y = str(offset_y)
+        overlay_format = '' # yuv420p, the sprite offsets are even
+        if should_scroll: # the text moves by single rows, overlay on yuv420p frames would round them down to even rows
+            y = f'{offset_y}+trunc({height}-{get_scroll_speed(clip_size, output_settings, title["duration"]):.6f}*(t-{title["start"]:.6f}))'
+            overlay_format = ':format=yuv444,format=yuv420p'
+        filters.append(f"[{video_label}][t{i}]overlay=x={offset_x}:y='{y}':eval=frame:eof_action=pass:enable='between(t,{title['start']:.6f},{title['end']:.6f})'{overlay_format}[o{i}]")
+        video_label = f'o{i}'
+
+    for i, clip in enumerate(plan['soundtrack']):
+        if clip['volume'] == 0 or clip['duration'] <= 0:
+            continue
+        skip_start = max(0, -clip['start']) # soundtrack clips only start before zero in a time range
+        input_index = add_input(get_input_args(clip, skip_start))
+        filters.append(f'[{input_index}:a]' + ','.join(get_audio_filters(clip, skip_start)) + f'[s{i}]')
+        audio_labels.append(f's{i}')
+
+    audio_label = None
+    if len(audio_labels) == 1:
+        audio_label = audio_labels[0]
+    elif audio_labels:
+        filters.append(''.join(f'[{label}]' for label in audio_labels) + f'amix=inputs={len(audio_labels)}:duration=longest:dropout_transition=0:normalize=0[aout]') # plain sum like moviepy's audio compositing
+        audio_label = 'aout'
+
+    return input_args, ';\n'.join(filters), video_label, audio_label
+
+def rasterize_titles(project, plan, output_settings, temp_dir, font_dirs=None): # returns { 'extent_id': (image file, title clip size, offset of the image in the title clip, should scroll), ... } for every title, the images are cropped to the visible text
+    title_images = {}
+    for title in plan['titles']:
+        title_extent = project.extents[title['extent_id']]
+        sprite = get_title_sprite(title_extent, output_settings, font_dirs)
+        image_file = os.path.join(temp_dir, f'title_{title["extent_id"]}.png')
+        Image.fromarray(sprite['image'], 'RGBA').save(image_file)
+        title_images[title['extent_id']] = (image_file, sprite['size'], sprite['offset'], title_extent.should_scroll)
+    return title_images
+
+def write_images(plan, output_settings, temp_dir): # decodes every image of the image clips once in the same geometry as the moviepy engine, returns { 'extent_id': (image file, (width, height)), ... }
+    images = {}
+    written = {} # { (file, rotation_steps): (image file, size), ... } images used by several clips are written once
+    for clip in plan['main']:
+        if clip['type'] != 'image':
+            continue
+        key = (clip['file'], clip['rotation_steps'] % 4)
+        if key not in written:
+            image = load_image(clip['file'], clip['rotation_steps'], output_settings['width'], output_settings['height'])
+            image_file = os.path.join(temp_dir, f'image_{len(written)}.png')
+            Image.fromarray(image, 'RGB').save(image_file, compress_level=1) # fast compression, the file is only read once by ffmpeg
+            written[key] = (image_file, (image.shape[1], image.shape[0]))
+        images[clip['extent_id']] = written[key]
+    return images
+
+def render_ffmpeg(project, output_file, output_settings, probe, font_dirs=None, log=print, time_range=None): # renders the project (or only time_range (start, end)) with one ffmpeg process, probe(file) returns the ffmpeg infos of a media file
+    plan = plan_timeline(project, probe)
+    fps = output_settings['fps']
+    start, end = time_range if time_range is not None else (0.0, plan['duration'])
+    skip_frames = 0
+    if time_range is not None: # only the clips and titles of the range are decoded and rasterized
+        plan, skip_frames = get_range_plan(plan, time_range, fps)
+    video_codec, audio_codec = get_codecs(output_file)
+    with tempfile.TemporaryDirectory(prefix='movie-maker-renderer-') as temp_dir:
+        log('Rasterizing title clips...')
+        title_images = rasterize_titles(project, plan, output_settings, temp_dir, font_dirs)
+        log('Rasterizing title clips done!')
+        images = write_images(plan, output_settings, temp_dir)
+
+        input_args, filter_graph, video_label, audio_label = build_filter_graph(plan, title_images, output_settings, images)
+        filter_script = os.path.join(temp_dir, 'filter_graph.txt') # graph is written to a file because it can exceed the maximum command line length
+        with open(filter_script, 'w', encoding='utf-8') as file:
+            file.write(filter_graph)
+
+        cmd = [FFMPEG_BINARY, '-y', '-hide_banner', '-loglevel', 'error', '-stats'] + input_args
+        cmd += ['-filter_complex_script', filter_script, '-map', f'[{video_label}]']
+        if audio_label is not None:
+            cmd += ['-map', f'[{audio_label}]', '-c:a', audio_codec, '-ar', '44100']
+        if skip_frames > 0:
+            cmd += ['-ss', f'{skip_frames / fps:.6f}'] # the frames of a crossfade before the range
+        cmd += ['-c:v', video_codec, '-preset', output_settings['preset'], '-r', str(fps), '-frames:v', str(int((end - start) * fps))] # moviepy rounds the frame count down
+        if video_codec == 'libx264':
+            cmd += ['-pix_fmt', 'yuv420p']
+        cmd.append(output_file)
+
+        log(f'Running ffmpeg with {len(plan["main"])} main, {len(plan["titles"])} title and {len(plan["soundtrack"])} soundtrack clips...')
+        process = subprocess.run(cmd, stdin=subprocess.DEVNULL)
+        if process.returncode:
+            raise IOError(f'ffmpeg exited with code {process.returncode} while writing "{output_file}", filter graph:\n{filter_graph}')
+
+@profiling.timed('still_spans')
+def render_still_span(project, span, outputs, output_settings, start_time, temp_dir, font_dirs=None): # renders the frames of a still span (see segments.plan_still_spans) from ffmpeg's color source and the looped title sprites into every output [(output_file, (width, height)), ...] at once, frames are scaled from the output settings size like the composited parts; no frame passes through python
+    width, height, fps = output_settings['width'], output_settings['height'], output_settings['fps']
+    frame_count = span['end_frame'] - span['first_frame']
+    span_start = start_time + span['first_frame'] / fps
+    color = '0x%02x%02x%02x' % tuple(span['color'])
+    input_args = ['-f', 'lavfi', '-i', f'color=c={color}:s={width}x{height}:r={fps}']
+    filters = []
+    video_label = '0:v'
+    for i, title in enumerate(span['titles']):
+        sprite = get_title_sprite(project.extents[title['extent_id']], output_settings, font_dirs)
+        image_file = os.path.join(temp_dir, f'title_{title["extent_id"]}.png')
+        if not os.path.isfile(image_file):
+            Image.fromarray(sprite['image'], 'RGBA').save(image_file)
+        input_args += ['-loop', '1', '-framerate', str(fps), '-t', f'{title["duration"]:.6f}', '-i', image_file]
+        title_filters = ['format=rgba'] + get_title_fade_filters(title['duration'])
+        offset = title['start'] - span_start # time of the title in the span
+        if offset < 0: # title started before the span
+            title_filters += [f'trim=start={-offset:.6f}', 'setpts=PTS-STARTPTS']
+        else:
+            title_filters.append(f'setpts=PTS-STARTPTS+{offset:.6f}/TB')
+        filters.append(f'[{i + 1}:v]' + ','.join(title_filters) + f'[t{i}]')
+        offset_x, offset_y = sprite['offset']
+        filters.append(f"[{video_label}][t{i}]overlay=x={offset_x}:y={offset_y}:eof_action=pass:enable='between(t,{max(0, offset):.6f},{offset + title['duration']:.6f})'[o{i}]")
+        video_label = f'o{i}'
+
+    output_labels = [] # [(filter graph label or None for the unfiltered color source, output_file), ...]
+    if len(outputs) == 1 and tuple(outputs[0][1]) == (width, height):
+        output_labels.append((video_label if filters else None, outputs[0][0]))
+    else: # one copy of the frames per output, scaled to its size
+        filters.append(f'[{video_label}]split={len(outputs)}' + ''.join(f'[s{i}]' for i in range(len(outputs))))
+        for i, (output_file, size) in enumerate(outputs):
+            if tuple(size) != (width, height):
+                filters.append(f'[s{i}]{get_scale_filter(size)}[v{i}]')
+                output_labels.append((f'v{i}', output_file))
+            else:
+                output_labels.append((f's{i}', output_file))
+
+    cmd = [FFMPEG_BINARY, '-y', '-hide_banner', '-loglevel', 'error'] + input_args
+    if filters:
+        cmd += ['-filter_complex', ';'.join(filters)]
+    for label, output_file in output_labels:
+        video_codec = get_video_codec(output_file)
+        if label is not None:
+            cmd += ['-map', f'[{label}]']
+        cmd += ['-frames:v', str(frame_count), '-c:v', video_codec, '-preset', output_settings['preset'], '-r', str(fps)] # same encoder settings as the composited parts, so they can be joined without re-encoding
+        if video_codec == 'libx264':
+            cmd += ['-pix_fmt', 'yuv420p']
+        cmd.append(output_file)
+    process = subprocess.run(cmd, stdin=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if process.returncode:
+        output_files = ', '.join(f'"{output_file}"' for output_file, _ in outputs)
+        raise IOError(f'ffmpeg exited with code {process.returncode} while rendering a still span to {output_files}:\n{process.stderr.decode("utf-8", errors="replace")}')
@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import glob
+import xml.etree.ElementTree as ElementTree
+from utils import get_cache_dir
+
+FONT_EXTENSIONS = ('.ttf', '.otf') # only TrueType/OpenType fonts are supported
+FONT_INDEX_VERSION = 1
+
+_font_names = {} # in-memory lookup table per combination of extra font dirs, checked before any file system access, structure is { (extra_font_dir, ...): { 'font name': 'font path', ... } }
+
+def get_font_index_file():
+    return os.path.join(get_cache_dir(), 'font_index.json')
+
+def get_fontconfig_dirs(): # reads the font directories configured for fontconfig (used on most linux systems)
+    font_dirs = []
+    data_home = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+    for config_file in ['/etc/fonts/fonts.conf'] + sorted(glob.glob('/etc/fonts/conf.d/*.conf')):
+        try:
+            config = ElementTree.parse(config_file)
+        except (OSError, ElementTree.ParseError):
+            continue
+        for dir_element in config.iter('dir'):
+            font_dir = (dir_element.text or '').strip()
+            if not font_dir:
+                continue
+            if dir_element.get('prefix') == 'xdg':
+                font_dir = os.path.join(data_home, font_dir)
+            font_dirs.append(os.path.expanduser(font_dir))
+    return font_dirs
+
+def get_font_dirs(extra_font_dirs=None): # returns existing font directories in lookup order, user supplied directories come first
+    font_dirs = list(extra_font_dirs or [])
+    if sys.platform == 'win32':
+        font_dirs.append(os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts'))
+        font_dirs.append(os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~\\AppData\\Local')), 'Microsoft', 'Windows', 'Fonts'))
+    elif sys.platform == 'darwin':
+        font_dirs += ['/System/Library/Fonts', '/Library/Fonts', os.path.expanduser('~/Library/Fonts')]
+    else:
+        font_dirs += ['/usr/share/fonts', '/usr/local/share/fonts', os.path.join(os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share'), 'fonts'), os.path.expanduser('~/.fonts')]
+        font_dirs += get_fontconfig_dirs()
+
+    unique_font_dirs = []
+    for font_dir in font_dirs:
+        font_dir = os.path.normcase(os.path.abspath(font_dir))
+        if font_dir not in unique_font_dirs and os.path.isdir(font_dir):
+            unique_font_dirs.append(font_dir)
+    return unique_font_dirs
+
+def read_font_names(font_path): # returns family and full name of the font or None if the file is not a readable font
+    from fontTools import ttLib # imported here because fonts are only parsed when the font index is built or updated
+    try:
+        font = ttLib.TTFont(font_path, lazy=True)
+        try:
+            return [font['name'].getDebugName(1), font['name'].getDebugName(4)]
+        finally:
+            font.close()
+    except Exception:
+        return None
+
+def is_font_dir_up_to_date(font_dir_entry): # a directory mtime changes when files are added, removed or renamed in it
+    for directory, mtime in font_dir_entry['dirs'].items():
+        try:
+            if os.stat(directory).st_mtime != mtime:
+                return False
+        except OSError:
+            return False
+    return True
+
+def scan_font_dir(font_dir, previous_entry=None): # indexes all fonts below font_dir, fonts with unchanged size and mtime are not parsed again
+    previous_files = previous_entry['files'] if previous_entry else {}
+    font_dir_entry = {'dirs': {}, 'files': {}}
+    for directory, subdirectories, filenames in os.walk(font_dir):
+        subdirectories.sort()
+        font_dir_entry['dirs'][directory] = os.stat(directory).st_mtime
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() not in FONT_EXTENSIONS:
+                continue
+            font_path = os.path.join(directory, filename)
+            try:
+                stat = os.stat(font_path)
+            except OSError:
+                continue
+            previous_file = previous_files.get(font_path)
+            if previous_file and previous_file['size'] == stat.st_size and previous_file['mtime'] == stat.st_mtime:
+                font_dir_entry['files'][font_path] = previous_file
+                continue
+            names = read_font_names(font_path)
+            if names is not None:
+                font_dir_entry['files'][font_path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'names': names}
+    return font_dir_entry
+
+def load_font_index(): # returns the index saved on disk, structure is { 'version': 1, 'font_dirs': { 'font dir': { 'dirs': { 'dir': mtime, ... }, 'files': { 'font path': { 'size': 0, 'mtime': 0.0, 'names': ['family', 'full name'] }, ... } }, ... } }
+    try:
+        with open(get_font_index_file(), 'r', encoding='utf-8') as file:
+            font_index = json.load(file)
+        if font_index.get('version') == FONT_INDEX_VERSION:
+            return font_index
+    except (OSError, ValueError):
+        pass
+    return {'version': FONT_INDEX_VERSION, 'font_dirs': {}}
+
+def save_font_index(font_index):
+    font_index_file = get_font_index_file()
+    temp_file = f'{font_index_file}.{os.getpid()}.tmp' # write to a temporary file first so parallel renders never read a half written index
+    try:
+        with open(temp_file, 'w', encoding='utf-8') as file:
+            json.dump(font_index, file)
+        os.replace(temp_file, font_index_file)
+    except OSError as e:
+        print(f'Warning: font index could not be saved to "{font_index_file}": {e}')
+
+def get_font_names(extra_font_dirs=None): # returns the lookup table of font names to font paths, the index on disk is only updated for changed font dirs; resolved once per process and combination of extra font dirs
+    key = tuple(extra_font_dirs or ())
+    if key in _font_names:
+        return _font_names[key]
+
+    font_dirs = get_font_dirs(extra_font_dirs)
+    font_index = load_font_index()
+    is_changed = False
+    for font_dir in font_dirs:
+        font_dir_entry = font_index['font_dirs'].get(font_dir)
+        if font_dir_entry is None or not is_font_dir_up_to_date(font_dir_entry):
+            font_index['font_dirs'][font_dir] = scan_font_dir(font_dir, font_dir_entry)
+            is_changed = True
+    if is_changed:
+        save_font_index(font_index)
+
+    font_names = {}
+    for font_dir in font_dirs: # first match wins like in the directory lookup order
+        for font_path, font_file in font_index['font_dirs'][font_dir]['files'].items():
+            for name in font_file['names']:
+                if name:
+                    font_names.setdefault(name, font_path)
+    _font_names[key] = font_names
+    return font_names
+
+def find_font(font_name, extra_font_dirs=None): # returns the font path for the given family or full name or None if not found
+    return get_font_names(extra_font_dirs).get(font_name)
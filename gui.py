@@ -1,8 +1,7 @@
 import tkinter as tk
-from tkinter import ttk, filedialog
+from tkinter import ttk, filedialog, messagebox
 import os
-from renderer import render
-from utils import print_banner
+from utils import print_banner, parse_time_range
 
 print_banner()
 print('Choose render settings in gui, then click "Start rendering"...')
@@ -50,12 +49,18 @@ def choose_project():
         render_button.config(state="normal")
 
 def start_rendering():
+    try:
+        time_range = parse_time_range(range_entry_var.get()) if range_entry_var.get().strip() else None # empty field renders the whole timeline
+    except ValueError as e:
+        messagebox.showerror("Invalid time range", str(e))
+        return
     save_path = filedialog.asksaveasfilename(defaultextension=".mp4", filetypes=[("MP4 files", "*.mp4")])
     if save_path:
         root.destroy() # close tkinter window
         try:
+            from renderer import render # imported here because importing moviepy takes a while, the window opens without waiting for it
             # note: running this file from windows explorer causes a permission denied error from ffmpeg here; to fix this start this script from a batch file instead
-            render(project_filepath, save_path, width_entry_var.get(), height_entry_var.get(), fps_entry_var.get(), overwrite_existing_file=True) # overwrite existing file because file chooser already asks user
+            render(project_filepath, save_path, width_entry_var.get(), height_entry_var.get(), fps_entry_var.get(), overwrite_existing_file=True, time_range=time_range, preview=preview_var.get()) # overwrite existing file because file chooser already asks user
         except Exception as e:
             print('\n\nError:', e)
         finally:
@@ -104,10 +109,17 @@ fps_entry_var = tk.StringVar(value="30")
 fps_entry = ttk.Entry(root, textvariable=fps_entry_var, validate="key", validatecommand=(root.register(validate_numeric_input), "%P"))
 fps_entry.grid(row=8, column=1, padx=5, pady=5, sticky="ew")
 
-ttk.Separator(root, orient="horizontal").grid(row=9, column=0, columnspan=2, pady=5, sticky="ew")
+create_label("Time range:", row=9, column=0)
+range_entry_var = tk.StringVar(value="") # e.g. "12-20" or "1:05-1:20", empty for the whole timeline
+ttk.Entry(root, textvariable=range_entry_var).grid(row=9, column=1, padx=5, pady=5, sticky="ew")
+
+preview_var = tk.BooleanVar(value=False)
+ttk.Checkbutton(root, text="Preview (fast draft render)", variable=preview_var).grid(row=10, column=1, padx=5, pady=5, sticky="w")
+
+ttk.Separator(root, orient="horizontal").grid(row=11, column=0, columnspan=2, pady=5, sticky="ew")
 
 render_button_frame = tk.Frame(root)
-render_button_frame.grid(row=10, column=0, columnspan=2, pady=10, sticky="ew")
+render_button_frame.grid(row=12, column=0, columnspan=2, pady=10, sticky="ew")
 render_button_frame.grid_columnconfigure(0, weight=0)
 render_button = ttk.Button(render_button_frame, text="▶ Start Rendering!", command=start_rendering, state="disabled", padding=(10, 2))
 render_button.pack(pady=(0, 10))
@@ -0,0 +1,87 @@
+import math
+import numpy as np
+from collections import OrderedDict
+from PIL import Image, ImageOps
+import profiling
+
+DEFAULT_IMAGE_CACHE_SIZE = 512 # MB of decoded images kept in memory, least recently used images are dropped first (only the images of the playing clips are needed)
+EXIF_ORIENTATION_TAG = 0x0112
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8) # exif orientations that swap width and height
+
+def get_shown_size(image): # (width, height) of the opened image as it is shown (exif orientation applied)
+    width, height = image.size
+    if image.getexif().get(EXIF_ORIENTATION_TAG) in TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    return [width, height]
+
+def get_image_size(file): # only the file header is read
+    with Image.open(file) as image:
+        return get_shown_size(image)
+
+def get_fit_geometry(size, rotation_steps=0, width=None, height=None): # returns the picture size, the frame size and the (x, y) position of the picture in the frame of a video or image of size rotated by rotation_steps * 90 degrees counterclockwise
+    # upright and upside down clips are scaled to width (aspect ratio is maintained), clips turned on their side are fit into width x height and centered between black bars
+    if rotation_steps % 2:
+        size = [size[1], size[0]]
+        if width is not None and height is not None:
+            scale = min(width / size[0], height / size[1])
+            picture = [min(width, round(size[0] * scale)), min(height, round(size[1] * scale))]
+            return picture, [width, height], ((width - picture[0]) // 4 * 2, (height - picture[1]) // 4 * 2) # even position, ffmpeg pads yuv420 frames at even positions only
+    if width is None or width == size[0]:
+        return list(size), list(size), (0, 0)
+    picture = [width, int(size[1] * width / size[0])]
+    return picture, picture, (0, 0)
+
+def to_rgb(image): # transparent parts are black like the background of the timeline
+    if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (0, 0, 0))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+@profiling.timed('image_decode')
+def load_image(file, rotation_steps=0, width=None, height=None): # returns the image as rgb uint8 frame in output geometry: exif orientation, rotated counterclockwise and scaled like videos (see get_fit_geometry)
+    with Image.open(file) as image:
+        size = get_shown_size(image)
+        picture, frame, position = get_fit_geometry(size, rotation_steps, width, height)
+        scale = picture[0] / size[rotation_steps % 2] # of the picture, which is turned on its side for odd rotation_steps
+        if scale < 1: # large jpegs are decoded at 1/2, 1/4 or 1/8 of their size (the smallest that is still larger than the output), much faster than decoding all pixels and scaling them down
+            image.draft('RGB', (math.ceil(image.size[0] * scale), math.ceil(image.size[1] * scale)))
+        image = to_rgb(ImageOps.exif_transpose(image))
+    rotation_steps = rotation_steps % 4
+    if rotation_steps:
+        image = image.transpose({1: Image.Transpose.ROTATE_90, 2: Image.Transpose.ROTATE_180, 3: Image.Transpose.ROTATE_270}[rotation_steps]) # counterclockwise
+    if list(image.size) != picture:
+        image = image.resize(picture, Image.Resampling.LANCZOS)
+    if frame != picture:
+        framed = Image.new('RGB', frame, (0, 0, 0))
+        framed.paste(image, position)
+        image = framed
+    return np.asarray(image)
+
+class ImageCache: # decoded images in output geometry shared by all clips of the same file, bounded to max_size MB; every frame of an image clip returns the same array, so it is never decoded or scaled again while it is cached
+    def __init__(self, max_size=DEFAULT_IMAGE_CACHE_SIZE):
+        self.max_size = max_size
+        self.images = OrderedDict() # { (file, rotation_steps, width, height): frame, ... } in order of last use
+        self.size = 0 # bytes
+        self.decode_count = 0
+        self.hit_count = 0
+
+    def get(self, file, rotation_steps=0, width=None, height=None):
+        key = (file, rotation_steps % 4, width, height if rotation_steps % 2 else None) # the height only changes clips turned on their side
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+            self.hit_count += 1
+            return image
+        image = load_image(file, rotation_steps, width, height)
+        self.decode_count += 1
+        self.images[key] = image
+        self.size += image.nbytes
+        while self.size > self.max_size * 2**20 and len(self.images) > 2: # the two images of a crossfade are always kept
+            self.size -= self.images.popitem(last=False)[1].nbytes
+        return image
+
+    def clear(self):
+        self.images.clear()
+        self.size = 0
@@ -1,18 +1,56 @@
+import os
+import sys
+import json
 from argparse import ArgumentParser
-from renderer import render
-from utils import print_banner
+from utils import print_banner, parse_time_range, parse_output
+from defaults import DEFAULT_MAX_MEMORY, DEFAULT_SEGMENT_CACHE_SIZE, DEFAULT_MEMORY_SHARE
 
 def main():
     parser = ArgumentParser(description='Movie Maker Renderer: Render Windows Movie Maker projects with arbitrary output formats (e.g. HD, Full HD, 2K, 4K, etc.)')
-    parser.add_argument('-p', '--project', type=str, required=True, help='Path to the Windows Movie Maker project file (.wlmp)')
-    parser.add_argument('-o', '--output', type=str, required=True, help='Path to the output file. The video codec in inferred from the file extension. Program will ask before overwriting existing file (except when setting --overwrite-existing)')
+    parser.add_argument('-p', '--project', type=str, help='Path to the Windows Movie Maker project file (.wlmp)')
+    parser.add_argument('-o', '--output', type=parse_output, nargs='+', metavar='FILE[:WIDTHxHEIGHT[@FPS]]', help='Path to the output file. The video codec in inferred from the file extension. Program will ask before overwriting existing file (except when setting --overwrite-existing). Several output files can be given, each with its own size and fps (default: --width, --height and --fps), e.g. "-o movie_4k.mp4 movie_1080p.mp4:1920x1080 movie_720p.webm:1280x720". Outputs with the same fps and aspect ratio are decoded and composited only once at the size of the largest one and scaled down by their encoders')
     parser.add_argument('--overwrite-existing-file', type=bool, default=False, help='Explicitly overwrites any preexisting output file with the same name without asking. Useful for batch processing. ')
     parser.add_argument('--width', type=int, default=3840, help='Width of the render output in pixels (default: 3840)')
     parser.add_argument('--height', type=int, default=2160, help='Height of the render output in pixels (default: 2160)')
     parser.add_argument('--fps', type=int, default=30, help='FPS (frames per second) of the render output (default: 30)')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of processes to render with. The timeline is split at hard cuts (no transition or title across the cut) into segments that are rendered in parallel and joined without re-encoding (default: 1)')
+    parser.add_argument('--font-dir', type=str, action='append', dest='font_dirs', help='Additional directory with TrueType/OpenType fonts for title clips, searched before the system font directories. Can be given multiple times')
+    parser.add_argument('--max-readers', type=int, default=8, help='Maximum number of media decoders that are open at the same time. Decoders are opened shortly before a clip is played and closed after it ended, one decoder is shared by all clips of the same file (default: 8)')
+    parser.add_argument('--max-memory', type=int, default=DEFAULT_MAX_MEMORY, help=f'Memory in MB for the preallocated output frame buffers that frames are composited into, limits how many composited frames can wait for the encoder (default: {DEFAULT_MAX_MEMORY})')
+    parser.add_argument('--segment-cache-size', type=int, default=DEFAULT_SEGMENT_CACHE_SIZE, help=f'Size in MB of the cache of encoded timeline segments (split at hard cuts). Segments whose clips, titles, media files and output settings did not change since an earlier render are reused instead of rendered again, least recently used segments are deleted first. Segments are stored in the "segments" directory of the cache directory (%%LOCALAPPDATA%%\\movie-maker-renderer on Windows, ~/.cache/movie-maker-renderer elsewhere, can be changed with the MOVIE_MAKER_RENDERER_CACHE_DIR environment variable). With the cache, renders with --jobs 1 are split into segments too. 0 disables the cache (default: {DEFAULT_SEGMENT_CACHE_SIZE})')
+    parser.add_argument('--engine', type=str, default='moviepy', choices=['moviepy', 'ffmpeg'], help='Render engine. "moviepy" composites every frame in python, "ffmpeg" compiles the project into a single ffmpeg filter graph so no video data passes through python (much faster, requires ffmpeg 4.4 or newer, output can differ slightly) (default: moviepy)')
+    parser.add_argument('--audio-only', action='store_true', help='Only mixes the audio of the project (video and soundtrack clips) into the output file, e.g. to quickly check the timing of the soundtrack. The codec is inferred from the file extension (.mp3, .wav, .flac, .ogg, .m4a)')
+    parser.add_argument('--range', type=parse_time_range, dest='time_range', metavar='START-END', help='Only renders this part of the timeline, e.g. "12-20" or "1:05-1:20" (seconds or minutes:seconds, start or end can be left out). Only the clips intersecting the range are opened')
+    parser.add_argument('--preview', action='store_true', help='Fast draft render: resolution is scaled down to a width of at most 640 px, at most 15 fps and the fastest encoder preset. Combine with --range to check a single title or transition')
+    parser.add_argument('--profile', type=str, dest='profile_file', metavar='REPORT.json', help='Writes a json report of the render: time of every stage (project parsing, font lookup, media probing, title rasterization, audio mixing, encoding, ...), histograms of the per-frame times split into decode, effects, composite and encoder wait/write, open media readers and peak memory. Reports of different runs can be compared to find regressions')
+    parser.add_argument('--profile-stats', type=str, dest='profile_stats_file', metavar='FILE.pstats', help='With --profile, also writes a cProfile dump of the render loop (read with python -m pstats FILE.pstats)')
+    parser.add_argument('--plan', '--dry-run', action='store_true', dest='plan', help='Only validates the project (tracks, clips, media files, fonts) and prints its resolved timeline as json: start and end of every clip after crossfade overlaps, soundtrack clips cut by negative gaps and title placement. Nothing is rendered, moviepy is not imported and no decoder is opened, media infos are read from the probe cache (files probed for the first time are read once with ffmpeg). Exits with code 1 when the project has problems')
+    parser.add_argument('--batch', type=str, metavar='MANIFEST_OR_DIR', help='Renders many projects instead of --project: a json manifest with a list of jobs, e.g. [{"project": "holiday.wlmp", "output": ["holiday.mp4", "holiday_720p.mp4:1280x720"], "fps": 25}], or a directory whose .wlmp files are rendered to .mp4 files next to them. Options that a job does not set are taken from the command line (e.g. --width, --jobs, --overwrite-existing-file). Existing output files are never overwritten without --overwrite-existing-file, those jobs are skipped instead of asking')
+    parser.add_argument('--batch-summary', type=str, help='Path of the json summary of a batch with the timings and errors of every job, the logs of the jobs are written next to it (default: batch_summary.json in the directory of the manifest)')
+    parser.add_argument('--batch-cpus', type=int, help='Maximum number of render processes of all batch jobs running at the same time, a job rendered with --jobs N counts N times (default: number of cpus)')
+    parser.add_argument('--batch-memory', type=int, help=f'Maximum estimated memory in MB of all batch jobs running at the same time, the memory of a job is estimated from its output resolution (default: {int(DEFAULT_MEMORY_SHARE * 100)}%% of the physical memory)')
     args = parser.parse_args()
+    if args.plan:
+        if args.project is None:
+            parser.error('the following arguments are required: -p/--project')
+        from planner import plan_project # imported here because only --plan needs it, --help and invalid arguments return quickly
+        result = plan_project(args.project, args.font_dirs)
+        print(json.dumps(result, indent=2))
+        sys.exit(1 if result['problems'] else 0)
+    if args.batch is None and (args.project is None or args.output is None):
+        parser.error('the following arguments are required: -p/--project, -o/--output (or --batch)')
     print_banner()
-    render(args.project, args.output, args.width, args.height, args.fps, args.overwrite_existing_file)
+    if args.batch is not None:
+        from batch import load_batch, run_batch # imported here because batch imports numpy and the planner
+        defaults = {
+            'width': args.width, 'height': args.height, 'fps': args.fps, 'overwrite_existing_file': args.overwrite_existing_file, 'jobs': args.jobs, 'font_dirs': args.font_dirs, 'max_readers': args.max_readers,
+            'engine': args.engine, 'audio_only': args.audio_only, 'range': args.time_range, 'preview': args.preview, 'max_memory': args.max_memory, 'segment_cache_size': args.segment_cache_size
+        }
+        summary_file = args.batch_summary or os.path.join(args.batch if os.path.isdir(args.batch) else os.path.dirname(os.path.abspath(args.batch)), 'batch_summary.json')
+        failed_count = run_batch(load_batch(args.batch, defaults), summary_file, args.batch_cpus, args.batch_memory)
+        sys.exit(1 if failed_count else 0)
+    from renderer import render # moviepy is only imported when rendering starts, --plan and invalid arguments return quickly
+    render(args.project, args.output, args.width, args.height, args.fps, args.overwrite_existing_file, args.jobs, args.font_dirs, args.max_readers, args.engine, args.audio_only, args.time_range, args.preview, args.max_memory, args.segment_cache_size, profile_file=args.profile_file, profile_stats_file=args.profile_stats_file)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,253 @@
+import time
+import numpy as np
+import queue
+import threading
+import subprocess
+from collections import OrderedDict
+from functools import partial
+from moviepy import VideoClip
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import FFMPEG_VideoReader
+from probe_cache import ProbeCache
+from images import ImageCache, get_image_size, get_fit_geometry
+from pipeline import QueueStats, put, get
+import profiling
+
+READER_LOOKAHEAD = 1.0 # seconds before a clip starts and after it ends in which its reader is kept open, avoids reopening readers for back to back extents of the same file; readers of clips starting within this time are opened in advance
+READER_PREFETCH_FRAMES = 8 # decoded frames each reader buffers ahead of the compositor
+
+def get_source_size(infos): # size of the decoded frames, ffmpeg rotates the frames of videos with rotation metadata automatically
+    size = list(infos.get('video_size', (1, 1)))
+    if abs(infos.get('video_rotation', 0)) in [90, 270]:
+        size = size[::-1]
+    return size
+
+def get_rotation_filters(rotation_steps): # counterclockwise like moviepy's rotated(), clips turned on their side are transposed (width and height are swapped)
+    return [[], ['transpose=cclock'], ['hflip', 'vflip'], ['transpose=clock']][rotation_steps % 4]
+
+def get_geometry_filters(size, rotation_steps=0, width=None, height=None): # returns the ffmpeg filters and the frame size for rotating and then scaling to the output geometry (see images.get_fit_geometry), images are decoded into the same geometry
+    picture, frame, (x, y) = get_fit_geometry(size, rotation_steps, width, height)
+    filters = get_rotation_filters(rotation_steps)
+    if picture != list(size[::-1] if rotation_steps % 2 else size):
+        filters.append(f'scale={picture[0]}:{picture[1]}:flags=lanczos')
+    if frame != picture:
+        filters.append(f'pad={frame[0]}:{frame[1]}:{x}:{y}:black')
+    return filters, frame
+
+class PooledVideoReader(FFMPEG_VideoReader): # same as the moviepy reader but uses the already probed infos instead of running ffmpeg again, rotates/scales the frames in ffmpeg and decodes ahead in a prefetch thread
+    def __init__(self, filename, infos, filters=None, size=None, start_time=0, pixel_format='rgb24', resize_algo='bicubic'):
+        self.filename = filename
+        self.proc = None
+        self.fps = infos.get('video_fps', 1.0)
+        self.size = size or get_source_size(infos)
+        self.rotation = abs(infos.get('video_rotation', 0))
+        self.filters = filters or []
+        self.resize_algo = resize_algo
+        self.duration = infos.get('video_duration', 0.0)
+        self.ffmpeg_duration = infos.get('duration', 0.0)
+        self.n_frames = infos.get('video_n_frames', 0)
+        self.bitrate = infos.get('video_bitrate', 0)
+        self.infos = infos
+        self.pixel_format = pixel_format
+        self.depth = 4 if pixel_format[-1] == 'a' else 3
+        self.bufsize = self.depth * self.size[0] * self.size[1] + 100
+        self.stats = QueueStats('Decoder queues')
+        self.last_read = None
+        self.initialize(start_time)
+
+    def initialize(self, start_time=0): # seeks before the input (accurate since ffmpeg 2.1) so the decoder starts at the in point of the clip and frames arrive in output geometry, returns without waiting for the first frame
+        self.close()
+        cmd = [FFMPEG_BINARY, '-loglevel', 'error']
+        if start_time != 0:
+            cmd += ['-ss', '%.06f' % max(0, self.get_frame_number(start_time) / self.fps - 0.001)] # slightly before the requested frame, so that ffmpeg starts exactly with it
+        cmd += ['-i', self.filename, '-f', 'image2pipe']
+        cmd += ['-vf', ','.join(self.filters + [f'scale={self.size[0]}:{self.size[1]}'])] # last scale is a no-op when the size is already right
+        cmd += ['-sws_flags', self.resize_algo, '-pix_fmt', self.pixel_format, '-vcodec', 'rawvideo', '-']
+        self.proc = subprocess.Popen(cmd, bufsize=self.bufsize, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL)
+        self.pos = self.get_frame_number(start_time) # number of the next frame, nothing was read yet
+        self.is_finished = False
+        self.frame_queue = queue.Queue(maxsize=READER_PREFETCH_FRAMES)
+        self.stop_event = threading.Event()
+        self.prefetch_thread = threading.Thread(target=self.prefetch, args=(self.proc, self.frame_queue, self.stop_event), name=f'decoder {self.filename}', daemon=True)
+        self.prefetch_thread.start()
+
+    def prefetch(self, proc, frame_queue, stop_event): # decoding stage, blocks while the queue is full and puts None after the last frame
+        w, h = self.size
+        nbytes = self.depth * w * h
+        while not stop_event.is_set():
+            data = proc.stdout.read(nbytes)
+            frame = np.frombuffer(data, dtype='uint8').reshape((h, w, self.depth)) if len(data) == nbytes else None
+            if not put(frame_queue, frame, self.stats, stop_event) or frame is None:
+                break
+
+    def get_frame(self, t): # same as moviepy's get_frame, but the first frame after (re)initializing is read like any other
+        pos = self.get_frame_number(t) + 1
+        if pos == self.pos and self.last_read is not None:
+            return self.last_read
+        if self.proc is None or pos <= self.pos or pos > self.pos + 100: # seeking back or far ahead restarts the decoder, small gaps are skipped
+            self.initialize(t)
+        self.skip_frames(pos - self.pos - 1)
+        return self.read_frame()
+
+    def read_frame(self): # returns the next prefetched frame, or the last frame again after the end of the video
+        if not self.is_finished:
+            frame = get(self.frame_queue, self.stats)
+            if frame is None:
+                self.is_finished = True
+            else:
+                self.last_read = frame
+        if self.last_read is None:
+            raise IOError(f'MoviePy error: failed to read the first frame of video file {self.filename} at {self.pos / self.fps:.2f} s. That might mean that the file is corrupted.')
+        self.pos += 1
+        return self.last_read
+
+    def skip_frames(self, n=1):
+        for i in range(n):
+            self.read_frame()
+
+    def close(self, delete_lastread=True):
+        if self.proc:
+            self.stop_event.set()
+            self.proc.terminate()
+            self.prefetch_thread.join()
+            self.proc.stdout.close()
+            self.proc.wait()
+            self.proc = None
+        if delete_lastread:
+            self.last_read = None
+
+class ReaderPool: # keeps at most max_readers decoders open, one per media file, geometry and slot (see add_window), least recently used readers are closed first
+    def __init__(self, max_readers):
+        self.max_readers = max(1, int(max_readers))
+        self.readers = OrderedDict() # { 'key': reader, ... } in order of last use, key is the file, the geometry filters and the slot
+        self.windows = {} # { 'key': [(start, end), ...], ... } times in which the reader of the key is played on the timeline
+        self.upcoming = [] # [(start, prepare), ...] clips whose readers are opened with prepare() shortly before they start, in order of start
+        self.opened_count = 0
+        self.peak_count = 0
+        self.stats = QueueStats('Decoder queues') # of all closed readers
+
+    def add_window(self, key, start, end, prepare=None): # returns the reader key of the window, windows of the same file and geometry that overlap (e.g. in a crossfade) are played by readers of their own, a reader is only reused for windows that do not overlap its earlier ones
+        slot = 0
+        while any(start < window_end and window_start < end for window_start, window_end in self.windows.get(f'{key}|{slot}', [])):
+            slot += 1
+        key = f'{key}|{slot}'
+        self.windows.setdefault(key, []).append((start, end))
+        if prepare is not None:
+            self.upcoming.append((start, prepare))
+            self.upcoming.sort(key=lambda item: item[0])
+        return key
+
+    def get_reader(self, key, open_reader): # returns the open reader for the key or opens a new one with open_reader()
+        reader = self.readers.get(key)
+        if reader is not None:
+            self.readers.move_to_end(key)
+            return reader
+        while len(self.readers) >= self.max_readers:
+            self.close_reader(self.readers.popitem(last=False)[1])
+        reader = open_reader()
+        self.readers[key] = reader
+        self.opened_count += 1
+        self.peak_count = max(self.peak_count, len(self.readers))
+        return reader
+
+    def update(self, t_start, t_end): # closes readers that are not played in (or shortly around) the given timeline time range
+        for key, reader in list(self.readers.items()):
+            if not any(start - READER_LOOKAHEAD <= t_end and t_start <= end + READER_LOOKAHEAD for start, end in self.windows.get(key, [])):
+                self.close_reader(self.readers.pop(key))
+        while self.upcoming and self.upcoming[0][0] - READER_LOOKAHEAD <= t_end: # the decoders of upcoming clips already fill their queues while the current clips are played
+            start, prepare = self.upcoming.pop(0)
+            if start > t_end and len(self.readers) < self.max_readers: # never closes a reader that is still needed
+                prepare()
+
+    def close_reader(self, reader):
+        reader.close()
+        self.stats.add(reader.stats)
+
+    def close(self):
+        while self.readers:
+            self.close_reader(self.readers.popitem()[1])
+
+    def clear(self): # closes all readers and forgets the play windows, e.g. before the clips of the timeline are built again
+        self.close()
+        self.windows.clear()
+        self.upcoming.clear()
+
+class MediaPool: # creates clips for media files whose decoders are only opened while the clip is played
+    def __init__(self, max_readers=8):
+        self.video = ReaderPool(max_readers)
+        self.infos = {} # { 'file': ffmpeg infos, ... } so every file is only looked up once
+        self.probe_cache = ProbeCache() # infos of files probed in earlier runs
+        self.images = ImageCache() # decoded photos of image clips
+        self.is_planning = True # while building the clips, moviepy requests a frame after every transform only to read its size, so a blank frame of the right size is returned instead of opening a decoder
+
+    def probe(self, file):
+        if file not in self.infos:
+            self.infos[file] = self.probe_cache.get(file)
+        return self.infos[file]
+
+    def open_video(self, file, rotation_steps=0, width=None, height=None): # returns a clip like VideoFileClip(file, audio=False) rotated by rotation_steps * 90 degrees and scaled to the output geometry (see images.get_fit_geometry) without opening a decoder, the audio is mixed seperately (see mixer.py)
+        infos = self.probe(file)
+        filters, size = get_geometry_filters(get_source_size(infos), rotation_steps, width, height)
+        key = '|'.join([file] + filters)
+        reader_key = key # of the slot assigned by add_window()
+        clip = VideoClip()
+        clip.filename = file
+        clip.fps = infos.get('video_fps', 1.0)
+        clip.size = size
+        clip.rotation = abs(infos.get('video_rotation', 0))
+        clip.duration = infos.get('video_duration', 0.0)
+        clip.end = clip.duration
+        def frame_function(t):
+            if self.is_planning:
+                return np.zeros((clip.size[1], clip.size[0], 3), dtype=np.uint8)
+            if profiling.active is None:
+                return self.video.get_reader(reader_key, lambda: PooledVideoReader(file, infos, filters, size, start_time=t)).get_frame(t) # decoding starts at the first requested frame
+            start = time.perf_counter()
+            frame = self.video.get_reader(reader_key, lambda: PooledVideoReader(file, infos, filters, size, start_time=t)).get_frame(t)
+            profiling.active.frame['decode'] += time.perf_counter() - start # waiting for the prefetch thread (or opening the reader)
+            return frame
+        def prepare(t): # opens the reader at time t of the file before the clip is played, unless the reader of its slot is open already
+            if reader_key not in self.video.readers:
+                self.video.get_reader(reader_key, lambda: PooledVideoReader(file, infos, filters, size, start_time=t))
+        def add_window(start, end, in_time): # the clip is played from start to end on the timeline, its reader is opened at in_time shortly before
+            nonlocal reader_key
+            reader_key = self.video.add_window(key, start, end, partial(prepare, in_time))
+        clip.frame_function = frame_function
+        clip.add_window = add_window
+        return clip
+
+    def open_image(self, file, rotation_steps=0, width=None, height=None): # returns a clip like ImageClip(file) in the same geometry as open_video(), the image is decoded when the clip is played and every frame returns the same cached array
+        clip = VideoClip()
+        clip.filename = file
+        clip.size = get_fit_geometry(get_image_size(file), rotation_steps, width, height)[1]
+        def frame_function(t):
+            if self.is_planning:
+                return np.zeros((clip.size[1], clip.size[0], 3), dtype=np.uint8)
+            if profiling.active is None:
+                return self.images.get(file, rotation_steps, width, height)
+            start = time.perf_counter()
+            frame = self.images.get(file, rotation_steps, width, height)
+            profiling.active.frame['decode'] += time.perf_counter() - start # only when the image is not cached
+            return frame
+        clip.frame_function = frame_function
+        return clip
+
+    def finish_planning(self): # has to be called after all clips are built and before frames are rendered
+        self.is_planning = False
+
+    def start_planning(self): # before the clips are built again (e.g. at another output size), the readers and images of the previous clips are closed and the probed infos are kept
+        self.video.clear()
+        self.images.clear()
+        self.is_planning = True
+
+    def track_video(self, video_clip): # returns the timeline clip that releases the video readers of clips which are not played anymore
+        def frame_function(get_frame, t):
+            self.video.update(t, t)
+            if profiling.active is not None:
+                profiling.active.add_readers(len(self.video.readers))
+            return get_frame(t)
+        return video_clip.transform(frame_function)
+
+    def close(self):
+        self.video.close()
+        self.probe_cache.close()
@@ -0,0 +1,102 @@
+import os
+import subprocess
+import numpy as np
+from moviepy.config import FFMPEG_BINARY
+from timeline import IntervalIndex
+
+MIX_FPS = 44100 # same sample rate as moviepy writes audio with
+MIX_BLOCK_SIZE = 65536 # samples per channel that are mixed and sent to the encoder at once (~1.5 s)
+AUDIO_CODECS = { # codecs of audio-only exports, other extensions are written as mp3
+    'wav': 'pcm_s16le',
+    'flac': 'flac',
+    'ogg': 'libvorbis',
+    'm4a': 'aac',
+    'aac': 'aac'
+}
+
+def get_audio_codec(output_file): # audio codec for the file extension, same as moviepy's write_videofile chooses for video files
+    extension = os.path.splitext(output_file)[1][1:].lower()
+    if extension in ['ogv', 'webm']:
+        return 'libvorbis'
+    return AUDIO_CODECS.get(extension, 'libmp3lame')
+
+def get_audio_sources(plan): # audio of the planned main and soundtrack clips, muted clips and video clips without audio track are left out instead of mixing silence
+    sources = [clip for clip in plan['main'] if clip['type'] == 'video' and clip['has_audio']]
+    sources += plan['soundtrack']
+    return [source for source in sources if source['volume'] > 0 and source['duration'] > 0]
+
+def get_gain_envelope(source, t): # volume and linear fades (like moviepy's AudioFadeIn/AudioFadeOut) combined into one gain per sample, t is the time in the clip
+    gain = np.full(len(t), source['volume'], dtype=np.float32)
+    if source['audio_fade_in'] > 0:
+        gain *= np.minimum(t / source['audio_fade_in'], 1)
+    if source['audio_fade_out'] > 0:
+        gain *= np.clip((source['duration'] - t) / source['audio_fade_out'], 0, 1)
+    return gain
+
+class PCMReader: # decodes the cropped part of a source as stereo float samples in one sequential pass, starting offset samples (at MIX_FPS) after the start of the clip
+    def __init__(self, source, offset=0):
+        sample_rate = int(round(MIX_FPS / source['speed'])) # decoded at a sample rate changed by the speed and played at MIX_FPS, so the speed and the pitch change like in moviepy
+        in_time = source['in_time'] + offset / MIX_FPS * source['speed']
+        self.proc = subprocess.Popen([
+            FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error',
+            '-ss', f'{in_time:.6f}', '-t', f'{source["out_time"] - in_time:.6f}', '-i', source['file'],
+            '-vn', '-f', 'f32le', '-acodec', 'pcm_f32le', '-ac', '2', '-ar', str(sample_rate), '-'
+        ], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def read(self, sample_count): # returns the next samples as array of shape (sample_count, 2), padded with silence after the end of the source
+        data = self.proc.stdout.read(sample_count * 8)
+        samples = np.frombuffer(data[:len(data) - len(data) % 8], dtype=np.float32).reshape(-1, 2)
+        if len(samples) < sample_count:
+            samples = np.concatenate([samples, np.zeros((sample_count - len(samples), 2), dtype=np.float32)])
+        return samples
+
+    def close(self):
+        self.proc.kill()
+        self.proc.wait()
+
+def mix_audio(plan, output_file, log=print, time_range=None): # mixes the audio of the planned timeline (or only of time_range (start, end)) and streams it to the encoder block by block, returns False when the timeline has no audio
+    sources = get_audio_sources(plan)
+    if not sources:
+        return False
+    starts = [int(round(source['start'] * MIX_FPS)) for source in sources]
+    ends = [start + int(round(source['duration'] * MIX_FPS)) for start, source in zip(starts, sources)]
+    first_sample, total_samples = 0, max(ends)
+    if time_range is not None:
+        first_sample, total_samples = int(round(time_range[0] * MIX_FPS)), int(round(min(time_range[1], total_samples / MIX_FPS) * MIX_FPS))
+    index = IntervalIndex(list(zip(starts, ends)))
+
+    codec = get_audio_codec(output_file)
+    log(f'Mixing {len(sources)} audio sources ({max(0, total_samples - first_sample) / MIX_FPS:.2f} s) with {codec}...')
+    encoder = subprocess.Popen([
+        FFMPEG_BINARY, '-y', '-hide_banner', '-loglevel', 'error',
+        '-f', 'f32le', '-ar', str(MIX_FPS), '-ac', '2', '-i', '-',
+        '-acodec', codec, output_file
+    ], stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    readers = {} # { source index: reader, ... } only for the sources playing in the current block
+    try:
+        for block_start in range(first_sample, total_samples, MIX_BLOCK_SIZE):
+            block_end = min(block_start + MIX_BLOCK_SIZE, total_samples)
+            block = np.zeros((block_end - block_start, 2), dtype=np.float32)
+            for i in index.overlapping(block_start, block_end - 1):
+                first, last = max(block_start, starts[i]), min(block_end, ends[i])
+                if first >= last:
+                    continue
+                if i not in readers: # decoding starts at the first mixed sample, e.g. when the clip starts before the time range or before zero (when the first clip has a transition)
+                    readers[i] = PCMReader(sources[i], first - starts[i])
+                samples = readers[i].read(last - first)
+                t = (np.arange(first, last) - starts[i]) / MIX_FPS
+                block[first - block_start:last - block_start] += samples * get_gain_envelope(sources[i], t)[:, np.newaxis]
+            for i in [i for i in readers if ends[i] <= block_end]: # decoder is closed as soon as its source has ended
+                readers.pop(i).close()
+            encoder.stdin.write(block.tobytes())
+    finally:
+        for reader in readers.values():
+            reader.close()
+        encoder.stdin.close()
+        error = encoder.stderr.read().decode('utf-8', errors='replace')
+        encoder.wait()
+    if encoder.returncode:
+        raise IOError(f'ffmpeg error while writing audio file "{output_file}":\n{error}')
+    log('Mixing audio done!')
+    return True
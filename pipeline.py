@@ -0,0 +1,162 @@
+import os
+import time
+import queue
+import threading
+import numpy as np
+import proglog
+from moviepy.tools import extensions_dict
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+import profiling
+
+# Threaded render pipeline: decoding runs in the prefetch threads of the video readers (see media_pool.py),
+# frames are composited in the calling thread and written to the encoders by one writer thread per output file, the stages are connected by bounded queues.
+
+ENCODER_QUEUE_SIZE = 8 # composited frames waiting for the encoder, the compositor blocks when the queue is full (back-pressure)
+
+class QueueStats: # how full a bounded queue was and how long its producer and consumer had to wait
+    def __init__(self, name):
+        self.name = name
+        self.depth_sum = 0
+        self.depth_max = 0
+        self.count = 0
+        self.producer_stalls = 0 # queue was full
+        self.producer_stall_time = 0.0
+        self.consumer_stalls = 0 # queue was empty
+        self.consumer_stall_time = 0.0
+
+    def add_depth(self, depth):
+        self.depth_sum += depth
+        self.depth_max = max(self.depth_max, depth)
+        self.count += 1
+
+    def add(self, other): # adds the numbers of another queue of the same stage
+        self.depth_sum += other.depth_sum
+        self.depth_max = max(self.depth_max, other.depth_max)
+        self.count += other.count
+        self.producer_stalls += other.producer_stalls
+        self.producer_stall_time += other.producer_stall_time
+        self.consumer_stalls += other.consumer_stalls
+        self.consumer_stall_time += other.consumer_stall_time
+
+    def __str__(self):
+        average_depth = self.depth_sum / self.count if self.count else 0
+        return (f'{self.name}: average depth {average_depth:.1f}, max depth {self.depth_max}, '
+            f'{self.producer_stalls} producer stalls ({self.producer_stall_time:.2f} s), {self.consumer_stalls} consumer stalls ({self.consumer_stall_time:.2f} s)')
+
+def put(frame_queue, item, stats, stop_event): # blocks while the queue is full, returns False when the pipeline was stopped
+    stats.add_depth(frame_queue.qsize())
+    if not frame_queue.full():
+        frame_queue.put(item)
+        return True
+    stats.producer_stalls += 1
+    stall_start = time.perf_counter()
+    while not stop_event.is_set():
+        try:
+            frame_queue.put(item, timeout=0.1)
+            stats.producer_stall_time += time.perf_counter() - stall_start
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def get(frame_queue, stats): # blocks while the queue is empty
+    try:
+        return frame_queue.get_nowait()
+    except queue.Empty:
+        pass
+    stats.consumer_stalls += 1
+    stall_start = time.perf_counter()
+    item = frame_queue.get()
+    stats.consumer_stall_time += time.perf_counter() - stall_start
+    return item
+
+def get_video_codec(output_file): # same codec as moviepy's write_videofile infers from the file extension
+    extension = os.path.splitext(output_file)[1][1:].lower()
+    try:
+        return extensions_dict[extension]['codec'][0]
+    except KeyError:
+        raise ValueError(f'No video codec is known for the file extension ".{extension}" of the output file')
+
+def get_scale_filter(size): # ffmpeg filter that scales the frames down to size, area averaging keeps thin lines and small text sharp when downscaling
+    return f'scale={size[0]}:{size[1]}:flags=area'
+
+@profiling.timed('write_video')
+def write_video(video_clip, outputs, fps, preset='medium', logger='bar', frame_pool=None): # replaces video_clip.write_videofile(), frames are composited while the encoders are still busy with the previous ones; outputs are [(output_file, (width, height), audio_file or None), ...] that all get the same frames, scaled by their encoder when the size differs from the clip; returns the queue stats of every encoder
+    pixel_format = 'rgba' if video_clip.mask is not None else 'rgb24' # same frames as write_videofile sends to ffmpeg
+    frame_count = int(video_clip.duration * fps)
+    queue_size = frame_pool.count - 2 if frame_pool is not None else ENCODER_QUEUE_SIZE # a buffer of the pool must not be composited again while it is queued or written (by any encoder)
+    stop_event = threading.Event()
+    errors = []
+
+    profile = profiling.active
+    encoders = [] # [(writer, queue, stats, thread), ...]
+    write_times = [] # histograms of the writer threads when profiling
+    def write_frames(writer, encoder_queue, stats): # encoder stage, one thread per output
+        write_time = profiling.Histogram() if profile is not None else None
+        try:
+            while True:
+                frame = get(encoder_queue, stats)
+                if frame is None:
+                    break
+                if write_time is not None:
+                    write_start = time.perf_counter()
+                try:
+                    writer.proc.stdin.write(np.ascontiguousarray(frame).data) # memoryview of the frame, write_frame() would copy it with tobytes()
+                except IOError:
+                    writer.write_frame(frame) # fails again and raises with the error message of ffmpeg
+                if write_time is not None:
+                    write_time.add((time.perf_counter() - write_start) * 1000) # blocks while the encoder is busy
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+        finally:
+            if write_time is not None:
+                write_times.append(write_time)
+    try:
+        for output_file, size, audio_file in outputs:
+            ffmpeg_params = ['-vf', get_scale_filter(size)] if tuple(size) != tuple(video_clip.size) else None
+            writer = FFMPEG_VideoWriter(output_file, video_clip.size, fps, codec=get_video_codec(output_file), audiofile=audio_file, preset=preset, pixel_format=pixel_format, ffmpeg_params=ffmpeg_params)
+            encoder_queue = queue.Queue(maxsize=queue_size)
+            stats = QueueStats('Encoder queue' if len(outputs) == 1 else f'Encoder queue of "{os.path.basename(output_file)}"')
+            writer_thread = threading.Thread(target=write_frames, args=(writer, encoder_queue, stats), name='encoder', daemon=True)
+            encoders.append((writer, encoder_queue, stats, writer_thread))
+            writer_thread.start()
+
+        logger = proglog.default_bar_logger(logger)
+        logger(message=f'Writing video {", ".join(output_file for output_file, _, _ in outputs)}')
+        if profile is not None and profile.stats is not None:
+            profile.stats.enable() # cProfile of the render loop (this thread only)
+        for frame_index in logger.iter_bar(frame_index=range(frame_count)): # compositing stage
+            t = frame_index / fps
+            if profile is not None:
+                profile.begin_frame()
+                frame_start = time.perf_counter()
+            frame = video_clip.get_frame(t)
+            if frame.dtype != 'uint8':
+                frame = frame.astype('uint8')
+            if video_clip.mask is not None:
+                frame = np.dstack([frame, (255 * video_clip.mask.get_frame(t)).astype('uint8')])
+            if profile is not None:
+                put_start = time.perf_counter()
+            if not all(put(encoder_queue, frame, stats, stop_event) for _, encoder_queue, stats, _ in encoders):
+                break
+            if profile is not None:
+                profile.end_frame(put_start - frame_start, time.perf_counter() - put_start)
+    finally:
+        if profile is not None and profile.stats is not None:
+            profile.stats.disable()
+        for writer, encoder_queue, stats, writer_thread in encoders:
+            while writer_thread.is_alive(): # end marker, the writer thread is not alive anymore when it stopped because of an error
+                try:
+                    encoder_queue.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+        for writer, encoder_queue, stats, writer_thread in encoders:
+            writer_thread.join()
+            writer.close()
+        for write_time in write_times:
+            profile.frames['encoder_write'].merge(write_time.to_dict())
+    if errors:
+        raise errors[0]
+    return [stats for _, _, stats, _ in encoders]
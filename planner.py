@@ -0,0 +1,183 @@
+import os
+from project import load_project, VideoExtent, AudioExtent, ImageExtent, TitleExtent
+from probe_cache import ProbeCache
+from font_index import find_font
+
+PLACEHOLDER_EXTENT_TYPES = {'Main': (VideoExtent, ImageExtent, TitleExtent), 'SoundTrack': (AudioExtent,), 'Text': (TitleExtent,)} # clips each track can contain, title clips in 'Main' are background color clips
+
+def plan_titles(project): # returns start and duration of every title clip without building the (expensive) text clips
+    text_ids = project.placeholders['Text']
+
+    title_timings = []
+    previous_clip_end = 0.0
+    for i, extent_id in enumerate(text_ids):
+        title_extent = project.extents[extent_id]
+        gap_before = title_extent.gap_before
+        duration = title_extent.duration
+
+        # title clips can be shifted into each other like audio clips, so make sure they dont overlap:
+        is_last = i == len(text_ids) - 1
+        if not is_last:
+            next_gap_before = project.extents[text_ids[i + 1]].gap_before
+            if next_gap_before < 0: # when negative crop end of current title clip, because next title would overlap
+                duration = duration + next_gap_before
+
+        title_timings.append({
+            'extent_id': extent_id,
+            'start': previous_clip_end + max(0, gap_before),
+            'duration': duration,
+            'should_scroll': title_extent.should_scroll
+        })
+        previous_clip_end += duration + max(0, gap_before)
+
+    return title_timings
+
+def plan_timeline(project, probe): # resolves clip times the same way the moviepy renderer does, but only from the media infos returned by probe(file) (ffmpeg infos dict)
+    main_clips = []
+    previous_clip_end = 0.0
+    for extent_id in project.placeholders['Main']:
+        extent = project.extents[extent_id]
+        if isinstance(extent, TitleExtent): # background color clip
+            main_clips.append({
+                'extent_id': extent_id,
+                'type': 'color',
+                'color': extent.background_color,
+                'start': previous_clip_end,
+                'duration': extent.duration,
+                'crossfade_duration': 0.0
+            })
+            previous_clip_end += extent.duration
+        elif isinstance(extent, ImageExtent): # photo, not probed because its duration is set in the project
+            main_clips.append({
+                'extent_id': extent_id,
+                'type': 'image',
+                'file': project.get_file(extent),
+                'rotation_steps': extent.rotation_steps,
+                'start': previous_clip_end - extent.crossfade_duration, # shifted into previous clip for transition effect
+                'duration': extent.duration,
+                'crossfade_duration': extent.crossfade_duration
+            })
+            previous_clip_end += extent.duration - extent.crossfade_duration
+        else:
+            file = project.get_file(extent)
+            infos = probe(file)
+            crop_end = extent.out_time if extent.out_time != 0 else infos.get('video_duration', 0.0) # crop end is zero when the clip was not cropped in movie maker
+            duration = (crop_end - extent.in_time) / extent.speed
+            main_clips.append({
+                'extent_id': extent_id,
+                'type': 'video',
+                'file': file,
+                'has_audio': bool(infos.get('audio_found')),
+                'video_size': list(infos.get('video_size', (1, 1))),
+                'video_rotation': abs(infos.get('video_rotation', 0)),
+                'in_time': extent.in_time,
+                'out_time': crop_end,
+                'speed': extent.speed,
+                'volume': extent.volume,
+                'rotation_steps': extent.rotation_steps,
+                'audio_fade_in': extent.audio_fade_in,
+                'audio_fade_out': extent.audio_fade_out,
+                'start': previous_clip_end - extent.crossfade_duration, # shifted into previous clip for transition effect
+                'duration': duration,
+                'crossfade_duration': extent.crossfade_duration
+            })
+            previous_clip_end += duration - extent.crossfade_duration
+    total_video_duration = previous_clip_end
+
+    soundtrack_clips = []
+    soundtrack_ids = project.placeholders['SoundTrack']
+    previous_clip_end = 0.0
+    for i, extent_id in enumerate(soundtrack_ids):
+        extent = project.extents[extent_id]
+        file = project.get_file(extent)
+        crop_start = extent.in_time
+        crop_end = extent.out_time if extent.out_time != 0 else probe(file).get('duration', 0.0)
+        if i == len(soundtrack_ids) - 1: # cut end of audio clip so that audio does not go on beyond video
+            crop_end = crop_end - (previous_clip_end + (crop_end - crop_start) - total_video_duration)
+        elif project.extents[soundtrack_ids[i + 1]].gap_before < 0: # next clip cuts off the end of this clip
+            crop_end = crop_end + project.extents[soundtrack_ids[i + 1]].gap_before
+        duration = (crop_end - crop_start) / extent.speed
+        soundtrack_clips.append({
+            'extent_id': extent_id,
+            'file': file,
+            'in_time': crop_start,
+            'out_time': crop_end,
+            'speed': extent.speed,
+            'volume': extent.volume,
+            'audio_fade_in': extent.audio_fade_in,
+            'audio_fade_out': extent.audio_fade_out,
+            'start': previous_clip_end + max(0, extent.gap_before),
+            'duration': duration
+        })
+        previous_clip_end += duration + max(0, extent.gap_before)
+
+    titles = plan_titles(project)
+    for clip in main_clips + soundtrack_clips + titles:
+        clip['end'] = clip['start'] + clip['duration']
+
+    return {
+        'main': main_clips,
+        'soundtrack': soundtrack_clips,
+        'titles': titles,
+        'video_duration': total_video_duration,
+        'duration': max([total_video_duration] + [title['end'] for title in titles]) # titles can go on after the last video clip
+    }
+
+def check_project(project, font_dirs=None): # returns the problems that would stop a render, found without probing or decoding any media file
+    problems = []
+    for placeholder_id, extent_types in PLACEHOLDER_EXTENT_TYPES.items():
+        for extent_id in project.placeholders[placeholder_id]:
+            extent = project.extents.get(extent_id)
+            if extent is None:
+                problems.append(f'{placeholder_id}: clip {extent_id} was not found in the project or is not supported')
+            elif not isinstance(extent, extent_types):
+                problems.append(f'{placeholder_id}: clip {extent_id} can not be a {type(extent).__name__}')
+            elif isinstance(extent, TitleExtent):
+                if extent.duration <= 0:
+                    problems.append(f'{placeholder_id}: clip {extent_id} has no duration')
+                if placeholder_id == 'Main' and extent.background_color is None:
+                    problems.append(f'Main: color clip {extent_id} has no background color')
+                if placeholder_id == 'Text' and extent.text is None:
+                    problems.append(f'Text: title {extent_id} has no text')
+                elif placeholder_id == 'Text' and find_font(extent.font_family, font_dirs) is None:
+                    problems.append(f'Text: font "{extent.font_family}" of title {extent_id} was not found (only TrueType/OpenType fonts, see --font-dir)')
+            else:
+                media_item = project.media_items.get(extent.media_item_id)
+                if media_item is None:
+                    problems.append(f'{placeholder_id}: media item {extent.media_item_id} of clip {extent_id} was not found in the project')
+                elif not os.path.isfile(media_item.file_path):
+                    problems.append(f'{placeholder_id}: media file "{media_item.file_path}" of clip {extent_id} was not found')
+                if isinstance(extent, ImageExtent):
+                    if extent.duration <= 0:
+                        problems.append(f'{placeholder_id}: image clip {extent_id} has no duration')
+                    continue
+                if extent.speed <= 0:
+                    problems.append(f'{placeholder_id}: clip {extent_id} has speed {extent.speed}')
+                if extent.out_time != 0 and extent.out_time <= extent.in_time:
+                    problems.append(f'{placeholder_id}: clip {extent_id} ends before it starts (in time {extent.in_time}s, out time {extent.out_time}s)')
+    return problems
+
+def plan_project(project_file, font_dirs=None): # dry run (--plan): validates the project and resolves its timeline from the probe cache without importing moviepy or opening a decoder (files missing in the cache are probed once), returns { 'project': file, 'problems': [...], 'plan': plan_timeline() or None when there are problems }
+    result = {'project': project_file, 'problems': [], 'plan': None}
+    try:
+        project = load_project(project_file)
+    except Exception as e: # unreadable or malformed xml, missing tracks
+        result['problems'].append(f'{type(e).__name__}: {e}')
+        return result
+    result['problems'] = check_project(project, font_dirs)
+    if result['problems']:
+        return result
+
+    probe_cache = ProbeCache()
+    try:
+        plan = plan_timeline(project, probe_cache.get)
+    except Exception as e: # media file that ffmpeg can not read
+        result['problems'].append(f'{type(e).__name__}: {e}')
+        return result
+    finally:
+        probe_cache.close()
+    for clip in plan['main'] + plan['soundtrack']:
+        if clip.get('in_time') is not None and clip['duration'] <= 0: # video and audio clips
+            result['problems'].append(f'Clip {clip["extent_id"]} is not played, its in time {clip["in_time"]}s is after the end of "{clip["file"]}" ({clip["out_time"]}s)')
+    result['plan'] = plan
+    return result
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+from utils import get_cache_dir
+
+PROBE_CACHE_VERSION = 1 # increase when the stored infos change, older entries are probed again
+
+COLUMNS = ( # (column, type) of the stored ffmpeg infos, video_size is stored as video_width and video_height
+    ('duration', 'REAL'),
+    ('video_found', 'INTEGER'),
+    ('video_width', 'INTEGER'),
+    ('video_height', 'INTEGER'),
+    ('video_fps', 'REAL'),
+    ('video_duration', 'REAL'),
+    ('video_n_frames', 'INTEGER'),
+    ('video_bitrate', 'INTEGER'),
+    ('video_rotation', 'INTEGER'),
+    ('audio_found', 'INTEGER'),
+    ('audio_fps', 'INTEGER'),
+    ('audio_bitrate', 'INTEGER')
+)
+
+def get_probe_cache_file():
+    return os.path.join(get_cache_dir(), 'probe_cache.sqlite')
+
+def get_file_key(file): # a file is probed again when its size or modification time changed
+    stat = os.stat(file)
+    return os.path.normcase(os.path.abspath(file)), stat.st_size, stat.st_mtime_ns
+
+def infos_to_row(infos):
+    row = {column: infos.get(column) for column, _ in COLUMNS}
+    if infos.get('video_size'):
+        row['video_width'], row['video_height'] = infos['video_size']
+    return row
+
+def row_to_infos(row):
+    infos = {column: row[column] for column, _ in COLUMNS if row[column] is not None}
+    infos['video_found'] = bool(infos.get('video_found'))
+    infos['audio_found'] = bool(infos.get('audio_found'))
+    if 'video_width' in infos:
+        infos['video_size'] = [infos.pop('video_width'), infos.pop('video_height')]
+    return infos
+
+def probe_file(file): # runs ffmpeg once to read the media infos
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos # imported here because importing moviepy takes a second, cached infos are read without it (e.g. by --plan)
+    return ffmpeg_parse_infos(file, check_duration=True, fps_source='fps', decode_file=False)
+
+class ProbeCache: # persistent media infos keyed by path, size and mtime, shared by all runs (and worker processes) in a local sqlite database
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file or get_probe_cache_file()
+        self.connection = None
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.cache_file, timeout=30) # parallel render processes can write at the same time
+            self.connection.row_factory = sqlite3.Row
+            columns = ', '.join(f'{column} {type}' for column, type in COLUMNS)
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS probes (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, version INTEGER, {columns})')
+        return self.connection
+
+    def get(self, file): # returns the cached or freshly probed infos of the file, the cache is skipped when it can not be read or written
+        path, size, mtime_ns = get_file_key(file)
+        try:
+            row = self.connect().execute('SELECT * FROM probes WHERE path = ? AND size = ? AND mtime_ns = ? AND version = ?', (path, size, mtime_ns, PROBE_CACHE_VERSION)).fetchone()
+        except sqlite3.Error as e:
+            print(f'Warning: Media probe cache "{self.cache_file}" could not be read ({e})')
+            row = None
+        if row is not None:
+            self.hit_count += 1
+            return row_to_infos(row)
+
+        self.miss_count += 1
+        infos = probe_file(file)
+        row = infos_to_row(infos)
+        try:
+            with self.connect():
+                self.connection.execute(
+                    f'INSERT OR REPLACE INTO probes (path, size, mtime_ns, version, {", ".join(row)}) VALUES (?, ?, ?, ?, {", ".join("?" * len(row))})',
+                    (path, size, mtime_ns, PROBE_CACHE_VERSION, *row.values())
+                )
+        except sqlite3.Error as e:
+            print(f'Warning: Media probe cache "{self.cache_file}" could not be written ({e})')
+        return row_to_infos(row) # same infos as a cache hit returns
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,183 @@
+import os
+import sys
+import json
+import time
+import ctypes
+import functools
+import cProfile
+import pstats
+from contextlib import contextmanager, nullcontext
+
+# Structured profiling of a render (--profile): wall time of every stage, histograms of the per-frame times of the render loop,
+# open decoders and peak memory, written to a json report. The hot paths only take times while a profile is active.
+
+PROFILE_REPORT_VERSION = 2 # increase when the structure of the report changes
+FRAME_STAGES = ('decode', 'effects', 'composite', 'encoder_wait', 'encoder_write') # per-frame times: waiting for decoded frames, moviepy transforms of the clips (speed, position, ...), blending, compositor waiting for a full encoder queue, writing a frame into the encoder pipe (writer threads)
+HISTOGRAM_BOUNDS = (0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000) # ms, upper bounds of the histogram buckets, the last bucket has no bound
+
+active = None # Profile of this process while profiling, hot paths check it before taking times
+
+class Histogram: # distribution of durations in fixed buckets, so histograms of several processes can be added
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0 # ms
+        self.max = 0.0
+
+    def add(self, ms):
+        bucket = 0
+        while bucket < len(HISTOGRAM_BOUNDS) and ms > HISTOGRAM_BOUNDS[bucket]:
+            bucket += 1
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def merge(self, report): # adds a histogram of to_dict()
+        self.counts = [count + other for count, other in zip(self.counts, report['histogram'].values())]
+        self.count += report['count']
+        self.total += report['total_ms']
+        self.max = max(self.max, report['max_ms'])
+
+    def to_dict(self):
+        labels = [f'<={bound}ms' for bound in HISTOGRAM_BOUNDS] + [f'>{HISTOGRAM_BOUNDS[-1]}ms']
+        return {
+            'count': self.count,
+            'total_ms': round(self.total, 3),
+            'mean_ms': round(self.total / self.count, 4) if self.count else 0.0,
+            'max_ms': round(self.max, 3),
+            'histogram': dict(zip(labels, self.counts))
+        }
+
+class Profile:
+    def __init__(self, with_stats=False): # with_stats also records a cProfile of the render loop
+        self.start_time = time.perf_counter()
+        self.start_timestamp = time.time() # wall clock, comparable between processes
+        self.first_frame_timestamp = None # wall clock when the first composited frame was handed to the encoder
+        self.stages = {} # { 'stage': [seconds, count], ... } stages can be nested and entered several times
+        self.frames = {stage: Histogram() for stage in FRAME_STAGES}
+        self.frame = {'decode': 0.0, 'fetch': 0.0} # seconds of the current frame, decode is part of fetch (getting the frames of the clips)
+        self.reader_samples = 0
+        self.reader_sum = 0
+        self.reader_max = 0
+        self.segment_readers_opened = 0 # decoders opened by the segments rendered in this process, their readers are not part of the reader pool of the render
+        self.workers = [] # reports of the worker processes of a parallel render
+        self.stats = cProfile.Profile() if with_stats else None
+        self.worker_stats = [] # pstats.Stats of the worker processes
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, [0.0, 0])
+            entry[0] += time.perf_counter() - start
+            entry[1] += 1
+
+    def begin_frame(self):
+        self.frame['decode'] = 0.0
+        self.frame['fetch'] = 0.0
+
+    def end_frame(self, frame_time, encoder_wait): # frame_time is the time of get_frame() of the composited frame
+        self.frames['decode'].add(self.frame['decode'] * 1000)
+        self.frames['effects'].add(max(0.0, self.frame['fetch'] - self.frame['decode']) * 1000)
+        self.frames['composite'].add(max(0.0, frame_time - self.frame['fetch']) * 1000)
+        self.frames['encoder_wait'].add(encoder_wait * 1000)
+        if self.first_frame_timestamp is None:
+            self.first_frame_timestamp = time.time()
+
+    def add_readers(self, count): # open decoders, sampled once per frame
+        self.reader_samples += 1
+        self.reader_sum += count
+        self.reader_max = max(self.reader_max, count)
+
+    def add_segment_readers(self, count): # decoders opened by a segment rendered in this process
+        self.segment_readers_opened += count
+
+    def add_worker(self, report, stats_file=None): # report (and cProfile dump) of a worker process
+        self.workers.append(report)
+        for stage, histogram in report['frames'].items():
+            self.frames[stage].merge(histogram)
+        if stats_file is not None:
+            self.worker_stats.append(pstats.Stats(stats_file)) # loaded now, the dump is in a temporary directory
+
+    def to_dict(self, readers=None, settings=None): # readers is the ReaderPool of the render, settings are the render settings the report is compared by
+        opened = ([readers.opened_count + self.segment_readers_opened] if readers is not None else []) + [worker['readers']['opened'] for worker in self.workers] # summed over the processes like the frame times
+        first_frame = min([timestamp for timestamp in [self.first_frame_timestamp] + [worker['first_frame_timestamp'] for worker in self.workers] if timestamp is not None], default=None)
+        return {
+            'version': PROFILE_REPORT_VERSION,
+            'settings': settings,
+            'pid': os.getpid(),
+            'duration': round(time.perf_counter() - self.start_time, 3),
+            'first_frame_timestamp': first_frame,
+            'time_to_first_frame': round(first_frame - self.start_timestamp, 3) if first_frame is not None else None, # None when no frame was composited (ffmpeg engine, only cached segments or still spans)
+            'stages': {name: {'seconds': round(seconds, 4), 'count': count} for name, (seconds, count) in self.stages.items()},
+            'frames': {stage: histogram.to_dict() for stage, histogram in self.frames.items()},
+            'readers': {
+                'opened': sum(opened) if opened and None not in opened else None, # None when a process did not count its decoders
+                'peak_open': max([self.reader_max] + [worker['readers']['peak_open'] for worker in self.workers]),
+                'mean_open': round(self.reader_sum / self.reader_samples, 2) if self.reader_samples else 0.0
+            },
+            'memory': {
+                'peak_rss_mb': get_peak_rss(),
+                'workers_peak_rss_mb': max([worker['memory']['peak_rss_mb'] or 0 for worker in self.workers], default=None)
+            },
+            'workers': self.workers
+        }
+
+    def write(self, report_file, readers=None, settings=None, stats_file=None):
+        report = self.to_dict(readers, settings)
+        with open(report_file, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        if stats_file is not None and self.stats is not None:
+            self.write_stats(stats_file)
+        return report
+
+    def write_stats(self, stats_file): # cProfile of the render loop of this process and the worker processes, read with pstats.Stats(stats_file)
+        stats = None
+        for source in ([self.stats] if self.stats.getstats() else []) + self.worker_stats: # the render loop of a parallel render only runs in the workers
+            if stats is None:
+                stats = source if isinstance(source, pstats.Stats) else pstats.Stats(source)
+            else:
+                stats.add(source)
+        if stats is not None:
+            stats.dump_stats(stats_file)
+
+def stage(name): # times the stage when profiling
+    return active.stage(name) if active is not None else nullcontext()
+
+def timed(name): # decorator that times every call of the function as the stage name when profiling
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def start(with_stats=False): # profiles the rest of the render in this process
+    global active
+    active = Profile(with_stats)
+    return active
+
+def stop():
+    global active
+    profile, active = active, None
+    return profile
+
+def get_peak_rss(): # MB of this process
+    try:
+        if sys.platform == 'win32':
+            class MemoryCounters(ctypes.Structure):
+                _fields_ = [('cb', ctypes.c_ulong), ('PageFaultCount', ctypes.c_ulong)] + [(name, ctypes.c_size_t) for name in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage',
+                    'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+            counters = MemoryCounters(cb=ctypes.sizeof(MemoryCounters))
+            if ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+                return round(counters.PeakWorkingSetSize / 2**20, 1)
+            return None
+        import resource
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10), 1) # bytes on macos, KB on linux
+    except (ImportError, AttributeError, OSError):
+        return None
@@ -0,0 +1,215 @@
+import xml.etree.ElementTree as ElementTree
+
+PLACEHOLDER_IDS = ('Main', 'SoundTrack', 'Text') # 'Main' contains order of video, image and background color clips, 'SoundTrack' contains only audio clips, 'Text' contains only text clips that are above video/background color clips
+
+class MediaItem:
+    __slots__ = ('id', 'file_path', 'media_item_type')
+
+    def __init__(self, id: str, file_path: str, media_item_type: str):
+        self.id = id
+        self.file_path = file_path
+        self.media_item_type = media_item_type
+
+class VideoExtent:
+    __slots__ = ('extent_id', 'media_item_id', 'in_time', 'out_time', 'speed', 'crossfade_duration', 'audio_fade_in', 'audio_fade_out', 'volume', 'rotation_steps')
+
+    def __init__(self, extent_id: str, media_item_id: str, in_time: float, out_time: float, speed: float, crossfade_duration: float, audio_fade_in: float, audio_fade_out: float, volume: float, rotation_steps: int):
+        self.extent_id = extent_id
+        self.media_item_id = media_item_id
+        self.in_time = in_time
+        self.out_time = out_time # zero when the clip was not cropped in movie maker
+        self.speed = speed
+        self.crossfade_duration = crossfade_duration # zero when the clip has no transition
+        self.audio_fade_in = audio_fade_in
+        self.audio_fade_out = audio_fade_out
+        self.volume = volume # float factor, zero when muted
+        self.rotation_steps = rotation_steps # multiply with 90 for degrees
+
+class AudioExtent:
+    __slots__ = ('extent_id', 'media_item_id', 'gap_before', 'in_time', 'out_time', 'speed', 'audio_fade_in', 'audio_fade_out', 'volume')
+
+    def __init__(self, extent_id: str, media_item_id: str, gap_before: float, in_time: float, out_time: float, speed: float, audio_fade_in: float, audio_fade_out: float, volume: float):
+        self.extent_id = extent_id
+        self.media_item_id = media_item_id
+        self.gap_before = gap_before # can be negative
+        self.in_time = in_time
+        self.out_time = out_time
+        self.speed = speed
+        self.audio_fade_in = audio_fade_in
+        self.audio_fade_out = audio_fade_out
+        self.volume = volume
+
+class ImageExtent: # photo in the 'Main' sequence
+    __slots__ = ('extent_id', 'media_item_id', 'duration', 'crossfade_duration', 'rotation_steps')
+
+    def __init__(self, extent_id: str, media_item_id: str, duration: float, crossfade_duration: float, rotation_steps: int):
+        self.extent_id = extent_id
+        self.media_item_id = media_item_id
+        self.duration = duration
+        self.crossfade_duration = crossfade_duration # zero when the clip has no transition
+        self.rotation_steps = rotation_steps # multiply with 90 for degrees
+
+class TitleExtent: # used for text clips and for background color clips in the 'Main' sequence
+    __slots__ = ('extent_id', 'gap_before', 'duration', 'background_color', 'text', 'text_color', 'outline_color', 'outline_size_index', 'font_family', 'justify', 'font_size', 'should_scroll')
+
+    def __init__(self, extent_id: str, gap_before: float, duration: float, background_color: list, text: str, text_color: list, outline_color: list, outline_size_index: int, font_family: str, justify: str, font_size: float, should_scroll: bool):
+        self.extent_id = extent_id
+        self.gap_before = gap_before
+        self.duration = duration
+        self.background_color = background_color # rgb 0 - 255 values, only set for background color clips
+        self.text = text # lines joined with line breaks, None when the title has no text effect
+        self.text_color = text_color # rgb 0 - 255 values
+        self.outline_color = outline_color # rgb 0 - 255 values
+        self.outline_size_index = outline_size_index
+        self.font_family = font_family
+        self.justify = justify # movie maker name: 'BEGIN', 'MIDDLE' or 'END'
+        self.font_size = font_size # movie maker size, relative to the video height
+        self.should_scroll = should_scroll # default other effect is a fade
+
+class Project:
+    __slots__ = ('media_items', 'extents', 'extents_by_media_item', 'placeholders')
+
+    def __init__(self, media_items: dict, extents: dict, placeholders: dict):
+        self.media_items = media_items # { 'mediaItemID': MediaItem, ... }, dict instead of list because there can be number gaps in media items
+        self.extents = extents # { 'extentID': VideoExtent/AudioExtent/ImageExtent/TitleExtent, ... }
+        self.placeholders = placeholders # { 'Main': ['extentID', ...], 'SoundTrack': [...], 'Text': [...] }
+        self.extents_by_media_item = {} # { 'mediaItemID': [extent, ...], ... }
+        for extent in extents.values():
+            media_item_id = getattr(extent, 'media_item_id', None)
+            if media_item_id is not None:
+                self.extents_by_media_item.setdefault(media_item_id, []).append(extent)
+
+    def get_file(self, extent): # returns the path of the media file of a video/audio/image extent
+        return self.media_items[extent.media_item_id].file_path
+
+def get_bound_properties(element): # returns the direct BoundProperties of an element as dict, sets are returned as list of values
+    bound_properties = {}
+    properties_element = element.find('BoundProperties')
+    if properties_element is None:
+        return bound_properties
+    for property_element in properties_element:
+        if property_element.tag.endswith('Set'): # e.g. BoundPropertyFloatSet with BoundPropertyFloatElement entries
+            bound_properties[property_element.get('Name')] = [entry.get('Value') for entry in property_element]
+        else:
+            bound_properties[property_element.get('Name')] = property_element.get('Value')
+    return bound_properties
+
+def parse_color(values): # parse rgb color entries to 0 - 255 values
+    return [int(round(float(value) * 255)) for value in values] if values is not None else None
+
+def parse_volume(bound_properties): # returns volume as a float factor
+    if bound_properties.get('Mute') == 'true': # when 'Mute' property is set to 'true' the volume is 0
+        return 0.0
+    return float(bound_properties.get('Volume', 1.0)) # when no property is set the volume remains unaltered
+
+def parse_audio_fades(element): # returns fade in and fade out duration of the audio fade effect (zero when not set)
+    effects = element.find('Effects')
+    if effects is not None:
+        for audio_effect in effects.findall('AudioEffect'):
+            if audio_effect.get('effectTemplateID') == 'AudioFadeEffectTemplate':
+                bound_properties = get_bound_properties(audio_effect)
+                return float(bound_properties.get('AudioFadeInDuration', 0)), float(bound_properties.get('AudioFadeOutDuration', 0))
+    return 0.0, 0.0
+
+def parse_crossfade_duration(element): # called 'Transitions' but every clip can only have one transition, for simplicity every transition is a cross fade with the given duration
+    transitions = element.find('Transitions')
+    if transitions is not None and len(transitions) > 0:
+        return float(transitions[0].get('duration', 0))
+    return 0.0
+
+def parse_video_extent(element):
+    bound_properties = get_bound_properties(element)
+    audio_fade_in, audio_fade_out = parse_audio_fades(element)
+    return VideoExtent(
+        extent_id=element.get('extentID'),
+        media_item_id=element.get('mediaItemID'),
+        in_time=float(element.get('inTime', 0)),
+        out_time=float(element.get('outTime', 0)),
+        speed=float(element.get('speed', 1)),
+        crossfade_duration=parse_crossfade_duration(element),
+        audio_fade_in=audio_fade_in,
+        audio_fade_out=audio_fade_out,
+        volume=parse_volume(bound_properties),
+        rotation_steps=int(bound_properties.get('rotateStepNinety', 0))
+    )
+
+def parse_audio_extent(element):
+    audio_fade_in, audio_fade_out = parse_audio_fades(element)
+    return AudioExtent(
+        extent_id=element.get('extentID'),
+        media_item_id=element.get('mediaItemID'),
+        gap_before=float(element.get('gapBefore', 0)),
+        in_time=float(element.get('inTime', 0)),
+        out_time=float(element.get('outTime', 0)),
+        speed=float(element.get('speed', 1)),
+        audio_fade_in=audio_fade_in,
+        audio_fade_out=audio_fade_out,
+        volume=parse_volume(get_bound_properties(element))
+    )
+
+def parse_image_extent(element):
+    return ImageExtent(
+        extent_id=element.get('extentID'),
+        media_item_id=element.get('mediaItemID'),
+        duration=float(element.get('duration', 0)),
+        crossfade_duration=parse_crossfade_duration(element),
+        rotation_steps=int(get_bound_properties(element).get('rotateStepNinety', 0))
+    )
+
+def parse_title_extent(element):
+    text_effect = element.find('Effects/TextEffect')
+    text_properties = get_bound_properties(text_effect) if text_effect is not None else {}
+    return TitleExtent(
+        extent_id=element.get('extentID'),
+        gap_before=float(element.get('gapBefore', 0)),
+        duration=float(element.get('duration', 0)),
+        background_color=parse_color(get_bound_properties(element).get('diffuseColor')),
+        text='\n'.join(text_properties['string']) if 'string' in text_properties else None, # concat text string entries to string with line breaks
+        text_color=parse_color(text_properties.get('color')),
+        outline_color=parse_color(text_properties.get('outlineColor')),
+        outline_size_index=int(text_properties.get('outlineSizeIndex', 0)),
+        font_family=text_properties['family'][0] if 'family' in text_properties else None, # array but only 1 element
+        justify=text_properties['justify'][0] if 'justify' in text_properties else 'MIDDLE',
+        font_size=float(text_properties.get('size', 0)),
+        should_scroll=text_effect is not None and text_effect.get('effectTemplateID') == 'TextEffectScrollTemplate'
+    )
+
+EXTENT_PARSERS = {
+    'VideoClip': parse_video_extent,
+    'AudioClip': parse_audio_extent,
+    'ImageClip': parse_image_extent,
+    'TitleClip': parse_title_extent
+}
+
+def load_project(project_file: str) -> Project: # stream-parses the movie maker file, every extent is converted to a record and its xml is freed right away
+    media_items = {}
+    extents = {}
+    extent_refs = {} # { 'extentID of ExtentSelector': ['extentID', ...], ... }
+    placeholder_extent_ids = {} # { 'placeholderID': 'extentID of ExtentSelector', ... }
+    depth = 0
+    for event, element in ElementTree.iterparse(project_file, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 2: # records are always direct children of MediaItems, Extents and BoundPlaceholders
+            continue
+        if element.tag == 'MediaItem':
+            media_items[element.get('id')] = MediaItem(element.get('id'), element.get('filePath'), element.get('mediaItemType'))
+        elif element.tag in EXTENT_PARSERS:
+            extent = EXTENT_PARSERS[element.tag](element)
+            extents[extent.extent_id] = extent
+        elif element.tag == 'ExtentSelector':
+            extent_refs[element.get('extentID')] = [extent_ref.get('id') for extent_ref in element.iterfind('ExtentRefs/ExtentRef')]
+        elif element.tag == 'BoundPlaceholder':
+            placeholder_extent_ids[element.get('placeholderID')] = element.get('extentID')
+        element.clear()
+
+    # read order of clips in each category ('Main', 'SoundTrack', 'Text'):
+    placeholders = {}
+    for placeholder_id in PLACEHOLDER_IDS:
+        if placeholder_id not in placeholder_extent_ids:
+            raise ValueError(f"extentID for placeholderID '{placeholder_id}' was not found in Movie Maker file \"{project_file}\"")
+        placeholders[placeholder_id] = extent_refs.get(placeholder_extent_ids[placeholder_id], [])
+
+    return Project(media_items, extents, placeholders)
@@ -1,7 +1,25 @@
 from moviepy import *
-import xmltodict
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pprint import pprint
 from utils import *
+from project import load_project, ImageExtent, TitleExtent
+from media_pool import MediaPool
+from timeline import TimelineVideoClip
+from planner import plan_titles, plan_timeline
+from mixer import mix_audio, get_audio_codec
+from titles import get_title_sprite, get_scroll_speed, TITLE_FADE_DURATION
+from segments import plan_segments, plan_still_spans, concat_segments, mux_audio
+from pipeline import write_video
+from compositor import FramePool, get_frame_pool_size, with_crossfades
+import profiling
+from segment_cache import SegmentCache, get_segment_key, SEGMENT_CACHE_MIN_DURATION
+from defaults import DEFAULT_MAX_MEMORY, DEFAULT_SEGMENT_CACHE_SIZE
+
+PREVIEW_MAX_WIDTH = 640 # preview renders are scaled down to at most this width
+PREVIEW_MAX_FPS = 15 # and render at most this many frames per second, the other frames are skipped
+PREVIEW_PRESET = 'ultrafast' # ffmpeg encoder preset of preview renders
+OUTPUT_ASPECT_RATIO_TOLERANCE = 0.01 # outputs whose aspect ratios differ less are scaled from the same composited frames (e.g. 854x480 from 3840x2160)
 
 debug = False
 if(debug is True):
@@ -15,325 +33,438 @@ if(debug is True):
 def log(text):
     print(f'[{str(get_current_datetime())}] {text}')
 
-def render(project_file: str, output_file: str, output_width: int, output_height: int, output_fps: int, overwrite_existing_file=False):
-    output_settings = {
-        'width': int(output_width),
-        'height': int(output_height),
-        'fps': int(output_fps)
-    }
-
-    log('Rendering with the following settings:')
-    log('--------------------------------------')
-    log(f'Project file: "{project_file}"')
-    log(f'Output file: "{output_file}"')
-    log(f'Output width: {output_width} px')
-    log(f'Output height: {output_height} px')
-    log(f'Output fps: {output_file}')
-    log(f'Overwrite pre-existing output file: {overwrite_existing_file}')
-    log('--------------------------------------')
-
-    log('Start time: ' + str(get_current_datetime()))
-
-    # TODO add image rendering
-
-    if not overwrite_existing_file:
-        prevent_file_overwrite(output_file)
-    elif os.path.exists(output_file):
-        log(f'File "{output_file}" already exists and will be overwritten (--overwrite-existing-file)')
-
-    movie_maker_file = project_file
-    with open(movie_maker_file, 'r', encoding='utf-8') as file:
-        xml_string = file.read()
-    log('Reading project file done!')
-
-    movie_maker_dict = xmltodict.parse(xml_string, force_list=('BoundPropertyBool', 'BoundPropertyFloat', 'BoundPropertyInt', 'BoundPropertyString', 'BoundPropertyFloatSet', 'BoundPropertyStringSet', 'BoundPropertyStringElement', 'ExtentRef', 'TitleClip', 'VideoClip', 'AudioClip'))
-    log('Parsing project file done!')
-
-    media_items_array = movie_maker_dict['Project']['MediaItems']['MediaItem']
-    media_items = {} # using dict instead of array because there can be number gaps in media items
-    for media_item in media_items_array:
-        file = media_item['@filePath']
-        media_items[media_item['@id']] = file
-
-    # read order of clips from the movie maker file:
-
-    # read under which ids the orders are stored in the movie maker file: 
-    bound_placeholders = movie_maker_dict['Project']['BoundPlaceholders']['BoundPlaceholder']
-    placeholder_ids = {     # structure of dict is { 'placeholderID': 'extentID', ... }
-        'Main': None,       # 'Main' BoundPlaceholder contains order of video and background color clips
-        'SoundTrack': None, # 'SoundTrack' BoundPlaceholder contains only audio clips
-        'Text': None        # 'Text' BoundPlaceholder contains only text clips that are above video/background color clips
-    }
-    for placeholder_id in placeholder_ids:
-        try:
-            placeholder_ids[placeholder_id] = next(filter(lambda bound_placeholder: bound_placeholder['@placeholderID'] == placeholder_id, bound_placeholders))['@extentID']
-            # print(placeholder_id, placeholder_ids[placeholder_id])
-        except StopIteration as e:
-            print(f"Error: extentID for placeholderID '{placeholder_id}' was not found in Movie Maker file! " + repr(e))
-            exit()
-
-    # then read the order of the clips in each category ('Main', 'SoundTrack', 'Text'):
-    extent_selectors = movie_maker_dict['Project']['Extents']['ExtentSelector']
-    for placeholder_id, extent_id in placeholder_ids.items():
-        media_extent_ids = [] # empty by default
-        extent_refs = next(filter(lambda extent_selector: extent_selector['@extentID'] == extent_id, extent_selectors))['ExtentRefs']
-        if(extent_refs is not None):
-            media_extent_ids = extent_refs['ExtentRef']
-            media_extent_ids = list(map(lambda id: id['@id'], media_extent_ids))
-        else:
+@profiling.timed('parse_project')
+def read_project(project_file): # reads the movie maker file and returns the project with the media items, clip orders and extents needed to build the clips
+    project = load_project(project_file)
+    log('Reading and parsing project file done!')
+    for placeholder_id, extent_ids in project.placeholders.items():
+        if not extent_ids:
             log(f"Info: Clip category '{placeholder_id}' has no entries. ")
-        placeholder_ids[placeholder_id] = media_extent_ids
-        # not try catch here because entry for referenced extent is always in the file (probably)
-
     log('Reading order of clips done!')
+    return project
 
-    # prepare extent categories for later:
-    title_extents = movie_maker_dict['Project']['Extents'].get('TitleClip', []) # empty if key not present in extents
-    video_extents = movie_maker_dict['Project']['Extents'].get('VideoClip', [])
-    audio_extents = movie_maker_dict['Project']['Extents'].get('AudioClip', [])
+@profiling.timed('build_video_clips')
+def build_video_clips(project, output_settings, media_pool, extent_ids=None, start_time=0.0): # builds the 'Main' sequence (or only the given part of it starting at start_time), returns the clips and the end time of the sequence
+    extent_ids = project.placeholders['Main'] if extent_ids is None else extent_ids
 
-    log('Start building video clips.')
-    # then build main video sequence:
     video_clips = []
-    previous_clip_end = 0.0
-    for i, extent_id in enumerate(placeholder_ids['Main']):
-        log(f'Adding video/title clip {i+1}/{len(placeholder_ids["Main"])} (ID {extent_id}):')
-        is_title_clip = any(extent['@extentID'] == extent_id for extent in title_extents)
-        if(is_title_clip): # when its a title clip then it must be a background color clip because movie maker saves these under title clips for some reason
-            title_extent = get_extent(extent_id, title_extents)
-            colors = next(filter(lambda entry: entry['@Name'] == 'diffuseColor', title_extent['BoundProperties']['BoundPropertyFloatSet']))['BoundPropertyFloatElement'] # get rgb color entries
-            colors = list(map(lambda entry: int(round(float(entry['@Value']) * 255)), colors)) # parse rgb color entries to 0 - 255 values
-            duration = int(title_extent['@duration'])
+    previous_clip_end = start_time
+    for i, extent_id in enumerate(extent_ids):
+        log(f'Adding video/title clip {i+1}/{len(extent_ids)} (ID {extent_id}):')
+        extent = project.extents[extent_id]
+        if isinstance(extent, TitleExtent): # when its a title clip then it must be a background color clip because movie maker saves these under title clips for some reason
+            duration = extent.duration
             color_clip = (
-                ColorClip(size=(output_settings['width'], output_settings['height']), color=colors)
+                ColorClip(size=(output_settings['width'], output_settings['height']), color=extent.background_color)
                     .with_start(previous_clip_end)
                     .with_duration(duration)
-                    .with_audio(AudioClip(lambda t: 0, duration=duration, fps=44100)) # add "null" audio to color clip to avoid audio compositing error later on # TODO less fps possible?
             )
             video_clips.append(color_clip)
             previous_clip_end += color_clip.duration # always append next video/color clip to end of previous one
             log(f'Added color clip (ID {extent_id})!')
+        elif isinstance(extent, ImageExtent): # photo, decoded once in output geometry when it is played (see images.py)
+            crossfade_duration = extent.crossfade_duration
+            file = project.get_file(extent)
+            check_file_exists(file)
+            image_clip = (
+                media_pool.open_image(file, extent.rotation_steps, output_settings['width'], output_settings['height'])
+                    .with_start(previous_clip_end - crossfade_duration) # shift clip into previous one for transition effect
+                    .with_duration(extent.duration)
+            )
+            image_clip = with_crossfades(image_clip, crossfade_duration) # faded in by the compositor
+            video_clips.append(image_clip)
+            previous_clip_end += image_clip.duration - crossfade_duration # always append next video/color clip to end of previous one
+            log(f'Added image clip "{file}" (ID {extent_id})!')
         else: # must be video extent
-            video_extent = get_extent(extent_id, video_extents)
-            crop_start = float(video_extent['@inTime'])
-            crop_end = float(video_extent['@outTime'])
-
-            crossfade_duration = 0
-            crossfade_effects = []
-            if video_extent['Transitions'] is not None: # called 'Transitions' but every clip can only have one transition
-                # for simplicity make every transition into a cross fade transiton with the given duration
-                crossfade_duration = float(next(iter(video_extent['Transitions'].values()))['@duration'])
-                crossfade_effects = [vfx.CrossFadeIn(duration=crossfade_duration)] if crossfade_duration > 0 else [] # prevent division by zero error in moviepy
-
-            audiofade_effects = []
-            if video_extent['Effects'] and video_extent['Effects']['AudioEffect'] and video_extent['Effects']['AudioEffect']['@effectTemplateID'] == 'AudioFadeEffectTemplate': # if has correct audio effect
-                fade_duration_entries = video_extent['Effects']['AudioEffect']['BoundProperties']['BoundPropertyFloat']
-                fade_in_duration = float(next(filter(lambda entry: entry['@Name'] == 'AudioFadeInDuration', fade_duration_entries))['@Value'])
-                fade_out_duration = float(next(filter(lambda entry: entry['@Name'] == 'AudioFadeOutDuration', fade_duration_entries))['@Value'])
-                if fade_in_duration > 0: # prevent division by zero error in moviepy
-                    audiofade_effects.append(afx.AudioFadeIn(fade_in_duration))
-                if fade_out_duration > 0:
-                    audiofade_effects.append(afx.AudioFadeOut(fade_out_duration))
-
-            file = media_items[video_extent['@mediaItemID']]
+            crossfade_duration = extent.crossfade_duration
+
+            file = project.get_file(extent)
             check_file_exists(file) # check if media file exists to avoid strange moviepy errors later on when rendering
-            log(f'Preloading video clip "{file}" (ID {extent_id})...')
-            video_clip = VideoFileClip(file) # on seperate line so video duration/end attributes can be read
+            log(f'Probing video clip "{file}" (ID {extent_id})...')
+            video_file_clip = media_pool.open_video(file, extent.rotation_steps, output_settings['width'], output_settings['height']) # on seperate line so video duration/end attributes can be read, the decoder is only opened when the clip is played and already rotates and scales to the output geometry (aspect ratio is maintained)
             video_clip = (
-                video_clip
+                video_file_clip
                     .with_start(previous_clip_end - crossfade_duration) # shift clip into previous one for transition effect
-                    .subclipped(crop_start, crop_end if crop_end != 0 else video_clip.end) # when clip was not cropped in movie maker then crop_start and crop_end are both zero but as soon as crop_start is modified in movie maker, crop_end is set to the duration of the clip (if not changed manually to a different value); so manually set to clip end in the case of crop_end is zero
-                    .with_effects([
-                        vfx.MultiplySpeed(float(video_extent['@speed'])),
-                        *crossfade_effects,
-                        *audiofade_effects
-                    ])
-                    # .with_speed_scaled(float(video_extent['@speed'])) # TODO use this instead of speed effect
-                    .with_volume_scaled(get_volume(video_extent))
-                    .rotated(get_rotation_steps(video_extent) * 90)
-                    .resized(width=output_settings["width"]) # always scale to width of render setting, aspect ratio is maintained
+                    .subclipped(extent.in_time, extent.out_time if extent.out_time != 0 else video_file_clip.end) # when clip was not cropped in movie maker then crop_start and crop_end are both zero but as soon as crop_start is modified in movie maker, crop_end is set to the duration of the clip (if not changed manually to a different value); so manually set to clip end in the case of crop_end is zero
+                    .with_effects([vfx.MultiplySpeed(extent.speed)])
+                    # .with_speed_scaled(extent.speed) # TODO use this instead of speed effect
                     # .with_fps(output_settings['fps']) # necessary if given in write_videofile?
             )
+            video_clip = with_crossfades(video_clip, crossfade_duration) # faded in by the compositor
             video_clips.append(video_clip)
+            video_file_clip.add_window(video_clip.start, video_clip.end, extent.in_time) # opens the decoder at the in point shortly before the clip starts, clips of the same file that overlap in a crossfade get a decoder of their own
             previous_clip_end += video_clip.duration - crossfade_duration # always append next video/color clip to end of previous one
             log(f'Added video clip "{file}" (ID {extent_id})!')
 
-    total_video_duration = previous_clip_end # renamed for better understanding in audio part
-    log('Building video clips done!')
-
-    log('Start building audio clips.')
-    # then build audio clips (similar to video clips):
-    audio_clips = []
-    previous_clip_end = 0.0
-    for i, extent_id in enumerate(placeholder_ids['SoundTrack']): # also access to index to detect last element
-        log(f'Adding audio clip {i+1}/{len(placeholder_ids["SoundTrack"])} (ID {extent_id}):')
-        audio_extent = get_extent(extent_id, audio_extents)
-
-        file = media_items[audio_extent['@mediaItemID']]
-        check_file_exists(file) # check if media file exists to avoid moviepy errors when rendering
-        log(f'Preloading audio clip "{file}" (ID {extent_id})...')
-        audio_clip = AudioFileClip(file) # on seperate line so video duration/end attributes can be read
-
-        gap_before = float(audio_extent['@gapBefore']) # can be negative
-        crop_start = float(audio_extent['@inTime'])
-        crop_end = float(audio_extent['@outTime'])
-        crop_end = crop_end if crop_end != 0 else audio_clip.end # make value length of clip when it is zero
-
-        is_last = i == len(placeholder_ids['SoundTrack']) - 1
-        if is_last: # cut end of audio clip so that audio does not go on beyond video
-            crop_end = crop_end - (previous_clip_end + (crop_end - crop_start) - total_video_duration)
-        else:
-            next_extent_id = placeholder_ids['SoundTrack'][i + 1]
-            next_audio_extent = get_extent(next_extent_id, audio_extents)
-            next_gap_before = float(next_audio_extent['@gapBefore']) # when negative crop end of current clip, because next clip cuts it off
-            if next_gap_before < 0:
-                crop_end = crop_end + next_gap_before
-
-        audiofade_effects = []
-        if audio_extent['Effects'] and audio_extent['Effects']['AudioEffect'] and audio_extent['Effects']['AudioEffect']['@effectTemplateID'] == 'AudioFadeEffectTemplate': # if has correct audio effect
-            fade_duration_entries = audio_extent['Effects']['AudioEffect']['BoundProperties']['BoundPropertyFloat']
-            fade_in_duration = float(next(filter(lambda entry: entry['@Name'] == 'AudioFadeInDuration', fade_duration_entries))['@Value'])
-            fade_out_duration = float(next(filter(lambda entry: entry['@Name'] == 'AudioFadeOutDuration', fade_duration_entries))['@Value'])
-            if fade_in_duration > 0: # prevent division by zero error in moviepy
-                audiofade_effects.append(afx.AudioFadeIn(fade_in_duration))
-            if fade_out_duration > 0:
-                audiofade_effects.append(afx.AudioFadeOut(fade_out_duration))
-
-        audio_clip = (
-            audio_clip
-                .with_start(previous_clip_end + max(0, gap_before)) # audio clips can have a pause before they start (in contrast to video clips), when gapBefore is negative it was already subtracted from the previous clip end in the previous iteration of the loop so make zero here; the first audio clip cant (should not) have a negative gapBefore
-                .subclipped(crop_start, crop_end) # same as with video clips
-                .with_effects([
-                    vfx.MultiplySpeed(float(audio_extent['@speed'])),
-                    *audiofade_effects
-                ])
-                # .with_speed_scaled(float(v['@speed'])) # TODO use this instead of speed effect
-                .with_volume_scaled(get_volume(audio_extent))
-        )
-
-        # print(crop_start, crop_end, gap_before, audio_clip.duration)
-        audio_clips.append(audio_clip)
-        previous_clip_end += audio_clip.duration + max(0, gap_before) # always append next audio clip to end of previous one with added (positive) gapBefore
-        log(f'Added audio clip "{file}" (ID {extent_id})!')
+    return video_clips, previous_clip_end
 
-    log('Building audio clips done!')
-
-    log('Start building title clips.')
-    # then build title/text clips (are rendered transparently above main video clips)
+@profiling.timed('build_title_clips')
+def build_title_clips(project, output_settings, time_range=None, font_dirs=None): # only builds the title clips overlapping time_range (start, end) if given
     title_clips = []
-    previous_clip_end = 0.0
-    for i, extent_id in enumerate(placeholder_ids['Text']):
-        log(f'Adding title clip {i+1}/{len(placeholder_ids["Text"])} (ID {extent_id}):')
-        title_extent = get_extent(extent_id, title_extents)
-        gap_before = float(title_extent['@gapBefore'])
-        duration = float(title_extent['@duration'])
-
-        text_color = next(filter(lambda entry: entry['@Name'] == 'color', title_extent['Effects']['TextEffect']['BoundProperties']['BoundPropertyFloatSet']))['BoundPropertyFloatElement'] # get rgb color entries
-        text_color = list(map(lambda entry: int(round(float(entry['@Value']) * 255)), text_color)) # parse rgb color entries to 0 - 255 values
-        
-        text_outline_color = next(filter(lambda entry: entry['@Name'] == 'outlineColor', title_extent['Effects']['TextEffect']['BoundProperties']['BoundPropertyFloatSet']))['BoundPropertyFloatElement'] # get rgb color entries
-        text_outline_color = list(map(lambda entry: int(round(float(entry['@Value']) * 255)), text_outline_color)) # parse rgb color entries to 0 - 255 values
-
-        text_outline_size = next(filter(lambda entry: entry['@Name'] == 'outlineSizeIndex', title_extent['Effects']['TextEffect']['BoundProperties']['BoundPropertyInt'])) # get text outline size index
-        text_outline_size = int(text_outline_size['@Value']) * 4 # convert outline index value to pixels, must be integer!
-
-        font_family = next(filter(lambda entry: entry['@Name'] == 'family', title_extent['Effects']['TextEffect']['BoundProperties']['BoundPropertyStringSet']))['BoundPropertyStringElement'] # get font family entries (array but only 1 element)
-        font_family = font_family[0]['@Value'] # parse font family string from first entry (only 1 entry)
-
-        text_align = next(filter(lambda entry: entry['@Name'] == 'justify', title_extent['Effects']['TextEffect']['BoundProperties']['BoundPropertyStringSet']))['BoundPropertyStringElement'] # get text align entries (array but only 1 element)
-        text_align = text_align[0]['@Value'] # parse text align string from first entry (only 1 entry)
-        text_align = {'MIDDLE': 'center', 'BEGIN': 'left', 'END': 'right'}.get(text_align, 'center') # map movie maker names to moviepy names, 'center' is default
-
-        text_strings = next(filter(lambda entry: entry['@Name'] == 'string', title_extent['Effects']['TextEffect']['BoundProperties']['BoundPropertyStringSet']))['BoundPropertyStringElement'] # get string entries
-        text_string = '\n'.join(list(map(lambda entry: entry['@Value'], text_strings))) # concat text string entries to string with line breaks
-
-        font_size = next(filter(lambda entry: entry['@Name'] == 'size', title_extent['Effects']['TextEffect']['BoundProperties']['BoundPropertyFloat'])) # get font size entry
-        font_size = int(float(font_size['@Value']) * 110) # calculate approximate font size in point unit, factor is approx 110 (in combination with font_scale_factor)
-        
-        font_scale_factor = output_settings['width'] / 1280 # scale font size to output resolution to always appear roughly the same size (like it would in HD = width 1280 px), otherwise the text would be too small in higher resolutions
-        font_size = int(font_size * font_scale_factor)
-        text_outline_size = int(text_outline_size * font_scale_factor)
-
-        # OPTIONAL: add text transparency
-
-        should_scroll = title_extent['Effects'] and title_extent['Effects']['TextEffect'] and title_extent['Effects']['TextEffect']['@effectTemplateID'] == 'TextEffectScrollTemplate' # default other effect: 'TextEffectFadeZoomTemplate'
-
-        # title clips can be shifted into each other like audio clips, so make sure they dont overlap:
-        is_last = i == len(placeholder_ids['Text']) - 1
-        if not is_last:
-            next_extent_id = placeholder_ids['Text'][i + 1]
-            next_title_extent = get_extent(next_extent_id, title_extents)
-            next_gap_before = float(next_title_extent['@gapBefore'])
-            if next_gap_before < 0: # when negative crop end of current title clip, because next title would overlap
-                duration = duration + next_gap_before
-
-        title_clip_size_tolerance_margin = 50 # tolerance margin for calculated title clip size e.g. if scrolled text is slighly cut off how many pixels the clip should be bigger on the y-axis
-        title_clip_size = ( # tuple (x, y) for title clip size
-            output_settings['width'], 
-            output_settings['height'] if not should_scroll 
-            else TextClip(
-                font=find_font_file(font_family), 
-                text=text_string, font_size=font_size, 
-                stroke_color=tuple(text_outline_color), 
-                stroke_width=int(text_outline_size), 
-                text_align=text_align
-            ).size[1] + title_clip_size_tolerance_margin # calculate title clip height when scrolling to not cut off text
-        )
-        
+    title_timings = plan_titles(project)
+    for i, title_timing in enumerate(title_timings):
+        extent_id = title_timing['extent_id']
+        start = title_timing['start']
+        duration = title_timing['duration']
+        if time_range is not None and (start >= time_range[1] or start + duration <= time_range[0]):
+            continue
+        log(f'Adding title clip {i+1}/{len(title_timings)} (ID {extent_id}):')
+        title_extent = project.extents[extent_id]
+        should_scroll = title_extent.should_scroll # default other effect: 'TextEffectFadeZoomTemplate'
+
         log(f'Preloading title clip (ID {extent_id})...')
+        sprite = get_title_sprite(title_extent, output_settings, font_dirs) # rasterized once (or loaded from the cache) and cropped to the visible text, so only its bounding box is blended
+        offset_x, offset_y = sprite['offset']
         title_clip = (
-            TextClip(font=find_font_file(font_family), 
-                    text=text_string, 
-                    font_size=font_size, 
-                    size=title_clip_size, 
-                    method='caption', 
-                    color=tuple(text_color), 
-                    stroke_color=tuple(text_outline_color), 
-                    stroke_width=int(text_outline_size), 
-                    text_align=text_align, 
-                    horizontal_align='center', 
-                    vertical_align='center', 
-                    duration=duration
-            )
-            .with_start(previous_clip_end +  max(0, gap_before))
-            .with_effects([
-                vfx.CrossFadeIn(duration=1.5), # the default title texts in movie maker have a fade transition
-                vfx.CrossFadeOut(duration=1.5)
-            ] if not should_scroll else []) # only fade when not scrolling
+            ImageClip(sprite['image'], duration=duration) # alpha channel becomes the mask
+            .with_start(start)
             .with_fps(output_settings['fps'])
+            .with_position((offset_x, offset_y))
         )
+        if not should_scroll: # only fade when not scrolling
+            title_clip = with_crossfades(title_clip, TITLE_FADE_DURATION, TITLE_FADE_DURATION)
 
         if should_scroll:
-            scroll_speed = (title_clip_size[1] + output_settings['height'])/duration # optimal scroll speed so that all text is displayed within duration
-            title_clip = title_clip.with_position(lambda t: (0, output_settings['height'] - scroll_speed*t)) # add scroll effect
+            scroll_speed = get_scroll_speed(sprite['size'], output_settings, duration)
+            title_clip = title_clip.with_position(lambda t, scroll_speed=scroll_speed, offset_x=offset_x, offset_y=offset_y: (offset_x, offset_y + int(output_settings['height'] - scroll_speed*t))) # add scroll effect, the text moves like the full title clip would
 
         title_clips.append(title_clip)
-
-        previous_clip_end += title_clip.duration + max(0, gap_before)
         log(f'Added title clip (ID {extent_id})!')
 
-    log('Building title clips done!')
+    return title_clips
 
+def composite_video(video_clips, title_clips, output_settings, frame_pool=None):
+    # video_composited = CompositeVideoClip([TextClip(font='segoeui.ttf', text="Test", duration=5, font_size=30).with_fps(30).with_duration(10)])
+    return TimelineVideoClip(video_clips + title_clips, size=(output_settings['width'], output_settings['height']), frame_pool=frame_pool) # put title clips on top of video clips, only the clips playing at a frame are composited
+
+def make_frame_pool(output_settings, max_memory=DEFAULT_MAX_MEMORY):
+    size = (output_settings['width'], output_settings['height'])
+    return FramePool(size, get_frame_pool_size(size, max_memory))
+
+@profiling.timed('join')
+def join_video(video_files, output_file, audio_file, temp_dir): # joins the video files without re-encoding and adds the audio track if given
+    if audio_file is None:
+        concat_segments(video_files, output_file)
+        return
+    video_file = os.path.join(temp_dir, f'video{os.path.splitext(output_file)[1]}')
+    concat_segments(video_files, video_file)
+    mux_audio(video_file, audio_file, output_file)
+    os.remove(video_file) # the next output can have the same extension
+
+def write_composited_video(project, video_composited, outputs, output_settings, frame_pool, still_spans, start_time, font_dirs=None, audio_files=None, logger='bar'): # writes the composited video into every output [{'file', 'size'}, ...] (see get_output_groups), still spans (see segments.plan_still_spans) are rendered by ffmpeg and joined with the composited parts without re-encoding; returns the encoder stats of the composited parts
+    fps = output_settings['fps']
+    audio_files = audio_files or [None] * len(outputs)
+    if not still_spans:
+        return write_video(video_composited, [(output['file'], output['size'], audio_file) for output, audio_file in zip(outputs, audio_files)], fps, preset=output_settings['preset'], logger=logger, frame_pool=frame_pool)
+    from ffmpeg_engine import render_still_span # only imported when used
+
+    frame_count = int(video_composited.duration * fps)
+    parts = [] # [(first frame, end frame, still span or None), ...]
+    position = 0
+    for span in still_spans:
+        if span['first_frame'] > position:
+            parts.append((position, span['first_frame'], None))
+        parts.append((span['first_frame'], span['end_frame'], span))
+        position = span['end_frame']
+    if position < frame_count:
+        parts.append((position, frame_count, None))
+
+    encoder_stats = []
+    with tempfile.TemporaryDirectory(prefix='movie-maker-renderer-', dir=os.path.dirname(os.path.abspath(outputs[0]['file']))) as temp_dir:
+        part_files = [[] for _ in outputs] # files of the parts of every output
+        for i, (first_frame, end_frame, span) in enumerate(parts):
+            files = [os.path.join(temp_dir, f'part_{i:04d}_{j}{os.path.splitext(output["file"])[1]}') for j, output in enumerate(outputs)]
+            if span is not None:
+                render_still_span(project, span, [(file, output['size']) for file, output in zip(files, outputs)], output_settings, start_time, temp_dir, font_dirs)
+            else:
+                part = video_composited.subclipped(first_frame / fps).with_duration((end_frame - first_frame + 0.5) / fps) # half a frame more so that rounding down the frame count never drops the last frame
+                encoder_stats += write_video(part, [(file, output['size'], None) for file, output in zip(files, outputs)], fps, preset=output_settings['preset'], logger=logger, frame_pool=frame_pool)
+            for j, file in enumerate(files):
+                part_files[j].append(file)
+        for output, files, audio_file in zip(outputs, part_files, audio_files):
+            join_video(files, output['file'], audio_file, temp_dir)
+    return encoder_stats
+
+def render_segment(project_file, output_settings, segment, outputs, render_options): # runs in a worker process, so the project is parsed again and only the clips of the segment are built; returns the profile report and cProfile dump of the worker when profiling (see profiling.py)
+    profile = profiling.start(render_options['profile'] == 'stats') if render_options['profile'] and profiling.active is None else None # segments rendered in the main process are added to its profile
+    project = read_project(project_file)
+    media_pool = MediaPool(render_options['max_readers'])
+    video_clips, _ = build_video_clips(project, output_settings, media_pool, segment['extent_ids'], segment['start'])
+    title_clips = build_title_clips(project, output_settings, (segment['start'], segment['end']), render_options['font_dirs'])
+    frame_count = segment['end_frame'] - segment['first_frame']
+    frame_pool = make_frame_pool(output_settings, render_options['max_memory'])
+    video_composited = (
+        media_pool.track_video(composite_video(video_clips, title_clips, output_settings, frame_pool))
+            .subclipped(segment['first_frame'] / output_settings['fps'])
+            .with_duration((frame_count + 0.5) / output_settings['fps']) # half a frame more so that rounding down the frame count never drops the last frame
+    )
+    media_pool.finish_planning()
+    encoder_stats = write_composited_video(project, video_composited, outputs, output_settings, frame_pool, segment['still_spans'], segment['first_frame'] / output_settings['fps'], render_options['font_dirs'], logger=None)
+    media_pool.close()
+    log(f'Segment {segment["index"] + 1} done ({frame_count} frames, {sum(span["end_frame"] - span["first_frame"] for span in segment["still_spans"])} from stills)! ' + '; '.join(str(stats) for stats in encoder_stats + [media_pool.video.stats]))
+    if profile is None:
+        if profiling.active is not None: # rendered in the main process, the readers of the segment are added to its profile
+            profiling.active.add_segment_readers(media_pool.video.opened_count)
+        return None
+    profiling.stop()
+    stats_file = None
+    if profile.stats is not None and profile.stats.getstats(): # empty when only still spans were rendered
+        stats_file = outputs[0]['file'] + '.pstats' # next to the segment in the temporary directory
+        profile.stats.dump_stats(stats_file)
+    return profile.to_dict(media_pool.video), stats_file
+
+def get_audio_file(temp_dir, output_file): # temporary file for the mixed audio, its codec can be muxed into the output container without re-encoding
+    return os.path.join(temp_dir, 'audio.ogg' if get_audio_codec(output_file) == 'libvorbis' else 'audio.mp3')
+
+@profiling.timed('mix_audio')
+def mix_output_audio(plan, outputs, temp_dir, time_range=None): # mixes the audio once per audio codec of the outputs, returns the audio file of every output (None when the project has no audio)
+    has_audio = {} # { 'audio file': bool, ... }
+    for output in outputs:
+        audio_file = get_audio_file(temp_dir, output['file'])
+        if audio_file not in has_audio:
+            has_audio[audio_file] = mix_audio(plan, audio_file, log, time_range)
+    return [audio_file if has_audio[audio_file] else None for audio_file in (get_audio_file(temp_dir, output['file']) for output in outputs)]
+
+def render_parallel(project_file, project, plan, outputs, output_settings, video_clips, jobs, render_options, segment_cache=None): # renders the segments in jobs processes, segments found in the segment cache are not rendered again
+    min_duration = SEGMENT_CACHE_MIN_DURATION if segment_cache is not None else None # with the cache, the cuts must not depend on the number of jobs or the total duration
+    segments = plan_segments(project.placeholders['Main'], video_clips, plan['titles'], plan['duration'], output_settings['fps'], jobs, min_duration)
+    log(f'Split timeline into {len(segments)} segment(s) at hard cuts: ' + ', '.join(f'{segment["start"]:.2f}s-{segment["end"]:.2f}s' for segment in segments))
+    for segment in segments:
+        segment['still_spans'] = plan_still_spans(plan, output_settings['fps'], segment['first_frame'] / output_settings['fps'], segment['end_frame'] - segment['first_frame'])
+
+    with tempfile.TemporaryDirectory(prefix='movie-maker-renderer-', dir=os.path.dirname(os.path.abspath(outputs[0]['file']))) as temp_dir:
+        log('Writing audio file...')
+        audio_files = mix_output_audio(plan, outputs, temp_dir)
+        log('Writing audio file done!')
+
+        extensions = [os.path.splitext(output['file'])[1] for output in outputs]
+        segment_files = [[os.path.join(temp_dir, f'segment_{segment["index"]:04d}_{j}{extension}') for j, extension in enumerate(extensions)] for segment in segments] # file of every segment and output
+        pending = [list(range(len(outputs))) for _ in segments] # outputs that are rendered of every segment
+        if segment_cache is not None:
+            with profiling.stage('segment_cache'):
+                keys = [[get_segment_key(project, plan, segment, output_settings, output['file'], render_options['font_dirs'], output['size']) for output in outputs] for segment in segments]
+                for i in range(len(segments)):
+                    for j in range(len(outputs)):
+                        cached_file = segment_cache.get(keys[i][j], extensions[j])
+                        if cached_file is not None:
+                            segment_files[i][j] = cached_file
+                            pending[i].remove(j)
+            log(f'Found {segment_cache.hit_count} of {len(segments) * len(outputs)} segment(s) in the segment cache')
+
+        rendered = [i for i in range(len(segments)) if pending[i]]
+        log(f'Rendering {len(rendered)} segment(s) with {min(jobs, len(rendered))} process(es)...')
+        arguments = [
+            [project_file] * len(rendered),
+            [output_settings] * len(rendered),
+            [segments[i] for i in rendered],
+            [[{'file': segment_files[i][j], 'size': outputs[j]['size']} for j in pending[i]] for i in rendered], # only the outputs missing in the cache, all are scaled from the same composited frames
+            [render_options] * len(rendered)
+        ]
+        if jobs > 1 and len(rendered) > 1:
+            with ProcessPoolExecutor(max_workers=jobs, initializer=profiling.stop) as executor: # forked workers must not add to the inherited profile of this process
+                results = list(executor.map(render_segment, *arguments)) # list() to raise errors of the worker processes
+        else:
+            results = list(map(render_segment, *arguments))
+        for result in results:
+            if result is not None: # profile of a worker process
+                profiling.active.add_worker(*result)
+        if segment_cache is not None:
+            for i in rendered:
+                for j in pending[i]:
+                    segment_files[i][j] = segment_cache.put(keys[i][j], segment_files[i][j])
+            deleted_count = segment_cache.evict(keep_files=[file for files in segment_files for file in files])
+            if deleted_count:
+                log(f'Deleted {deleted_count} least recently used segment(s) from the segment cache')
+        log('Rendering segments done!')
+
+        log('Joining segments and audio...')
+        for j, output in enumerate(outputs):
+            join_video([files[j] for files in segment_files], output['file'], audio_files[j], temp_dir)
+        log('Joining segments and audio done!')
+
+def build_clips(project, plan, output_settings, media_pool, time_range=None): # builds the clips of the main sequence, only the clips intersecting time_range (start, end) if given
+    extent_ids, start_time = None, 0.0
+    if time_range is not None:
+        main_clips = [clip for clip in plan['main'] if clip['start'] < time_range[1] and clip['end'] > time_range[0]] # clips shifted into the first one for a transition intersect as well
+        extent_ids = [clip['extent_id'] for clip in main_clips]
+        start_time = main_clips[0]['start'] + main_clips[0]['crossfade_duration'] if main_clips else 0.0 # end of the clip before the first built clip
+    log('Start building video clips.')
+    # then build main video sequence:
+    video_clips, _ = build_video_clips(project, output_settings, media_pool, extent_ids, start_time)
+    log('Building video clips done!')
+    return video_clips
+
+def render_serial(project, plan, outputs, output_settings, media_pool, video_clips, font_dirs=None, time_range=None, max_memory=DEFAULT_MAX_MEMORY): # renders the whole timeline or only time_range (start, end) into the outputs [{'file', 'size'}, ...]
+    log('Start building title clips.')
+    # then build title/text clips (are rendered transparently above main video clips)
+    title_clips = build_title_clips(project, output_settings, time_range, font_dirs)
+    log('Building title clips done!')
 
     log('Compositing video/title clips...')
-    # video_composited = CompositeVideoClip([TextClip(font='segoeui.ttf', text="Test", duration=5, font_size=30).with_fps(30).with_duration(10)])
-    video_composited = CompositeVideoClip(video_clips + title_clips) # put title clips on top of video clips
+    frame_pool = make_frame_pool(output_settings, max_memory)
+    log(f'Compositing into {frame_pool.count} preallocated frame buffers')
+    video_composited = media_pool.track_video(composite_video(video_clips, title_clips, output_settings, frame_pool)) # readers are opened and closed while the clips are played
+    if time_range is not None:
+        video_composited = video_composited.subclipped(time_range[0], min(time_range[1], video_composited.duration)) # readers seek to the first frame of the range
     log('Compositing video/title clips done!')
-    log('Compositing audio clips...')
-    audio_composited = CompositeAudioClip(list(map(lambda v: v.audio, video_clips)) + audio_clips)
-    log('Compositing audio clips done!')
-    video_composited.audio = audio_composited
-
-    log('Start writing video file...')
-    # Write the result to a file (many options available!)
-    video_composited.write_videofile(output_file, fps=output_settings['fps']) # optional: set e.g. threads=4 for better performance, but ffmpeg normally detects optimal number automatically
-    log('Writing video file done!')
-
-    log('Opening explorer...')
-    open_explorer_on_file(output_file)
-    log('Opening explorer done!')
-    log('Playing sound...')
-    play_notification_sound()
-    log('Playing sound done!')
+
+    with tempfile.TemporaryDirectory(prefix='movie-maker-renderer-', dir=os.path.dirname(os.path.abspath(outputs[0]['file']))) as temp_dir:
+        log('Mixing audio clips...')
+        audio_files = mix_output_audio(plan, outputs, temp_dir, time_range)
+        log('Mixing audio clips done!')
+
+        log('Start writing video file...')
+        # Write the result to a file (many options available!)
+        media_pool.finish_planning()
+        start_time = time_range[0] if time_range is not None else 0.0
+        still_spans = plan_still_spans(plan, output_settings['fps'], start_time, int(video_composited.duration * output_settings['fps']))
+        if still_spans:
+            log(f'Rendering {len(still_spans)} still span(s) with ffmpeg: ' + ', '.join(f'{start_time + span["first_frame"] / output_settings["fps"]:.2f}s-{start_time + span["end_frame"] / output_settings["fps"]:.2f}s' for span in still_spans))
+        encoder_stats = write_composited_video(project, video_composited, outputs, output_settings, frame_pool, still_spans, start_time, font_dirs, audio_files) # frames are decoded, composited and encoded in parallel threads
+        log('Writing video file done!')
+        for stats in encoder_stats:
+            log(stats)
+
+def get_preview_settings(output_settings): # reduced resolution (aspect ratio is maintained) and fps with the fastest encoder preset for quick previews
+    scale = min(1, PREVIEW_MAX_WIDTH / output_settings['width'])
+    width, height = int(output_settings['width'] * scale), int(output_settings['height'] * scale)
+    return {
+        'width': width if is_even(width) else width - 1, # yuv420p needs even dimensions
+        'height': height if is_even(height) else height - 1,
+        'fps': min(output_settings['fps'], PREVIEW_MAX_FPS),
+        'preset': PREVIEW_PRESET
+    }
+
+def get_output_groups(output_files, output_settings, preview=False): # outputs with the same fps and aspect ratio are scaled from the same composited frames, the timeline is composited once per group at the size of its largest output (so titles are rasterized at that size and scaled down like the video); returns [(output settings of the group, [{'file': file, 'size': (width, height)}, ...]), ...]
+    groups = []
+    files = set()
+    for output in ([output_files] if isinstance(output_files, str) else output_files):
+        file, width, height, fps = parse_output(output) if isinstance(output, str) else output # see utils.parse_output
+        settings = {
+            'width': int(width or output_settings['width']),
+            'height': int(height or output_settings['height']),
+            'fps': int(fps or output_settings['fps']),
+            'preset': output_settings['preset']
+        }
+        if preview:
+            settings = get_preview_settings(settings)
+        if os.path.normcase(os.path.abspath(file)) in files:
+            raise ValueError(f'Output file "{file}" is given more than once')
+        files.add(os.path.normcase(os.path.abspath(file)))
+
+        for group_settings, outputs in groups:
+            if group_settings['fps'] == settings['fps'] and abs(group_settings['width'] / group_settings['height'] - settings['width'] / settings['height']) < OUTPUT_ASPECT_RATIO_TOLERANCE:
+                outputs.append({'file': file, 'size': (settings['width'], settings['height'])})
+                if settings['width'] > group_settings['width']:
+                    group_settings.update(settings)
+                break
+        else:
+            groups.append((settings, [{'file': file, 'size': (settings['width'], settings['height'])}]))
+    return groups
+
+def render(project_file: str, output_file: str, output_width: int, output_height: int, output_fps: int, overwrite_existing_file=False, jobs=1, font_dirs=None, max_readers=8, engine='moviepy', audio_only=False, time_range=None, preview=False, max_memory=DEFAULT_MAX_MEMORY, segment_cache_size=DEFAULT_SEGMENT_CACHE_SIZE, interactive=True, profile_file=None, profile_stats_file=None): # interactive=False never asks before overwriting (existing output files raise FileExistsError) and does not open the explorer or play a sound, e.g. for batch renders; profile_file is the json report of a profiled render (see profiling.py), profile_stats_file a cProfile dump of its render loop
+    output_settings = {
+        'width': int(output_width),
+        'height': int(output_height),
+        'fps': int(output_fps),
+        'preset': 'medium' # ffmpeg encoder preset
+    }
+    output_groups = get_output_groups(output_file, output_settings, preview)
+    output_files = [output['file'] for _, outputs in output_groups for output in outputs]
+    render_options = { # settings that are also needed by the worker processes
+        'font_dirs': font_dirs,
+        'max_readers': int(max_readers),
+        'max_memory': max_memory,
+        'profile': ('stats' if profile_stats_file else 'report') if profile_file else None
+    }
+
+    log('Rendering with the following settings:')
+    log('--------------------------------------')
+    log(f'Project file: "{project_file}"')
+    for group_settings, outputs in output_groups:
+        for output in outputs:
+            log(f'Output file: "{output["file"]}"')
+            log(f'Output width: {output["size"][0]} px')
+            log(f'Output height: {output["size"][1]} px')
+            log(f'Output fps: {group_settings["fps"]}')
+    log(f'Preview: {preview}')
+    log(f'Overwrite pre-existing output file: {overwrite_existing_file}')
+    log(f'Render processes: {jobs}')
+    log(f'Additional font directories: {font_dirs or []}')
+    log(f'Max. open media readers: {max_readers}')
+    log(f'Max. memory of frame buffers: {max_memory} MB')
+    log(f'Segment cache size: {segment_cache_size} MB')
+    log(f'Render engine: {engine}')
+    log(f'Audio only: {audio_only}')
+    log(f'Profile report: {profile_file}')
+    log('--------------------------------------')
+
+    log('Start time: ' + str(get_current_datetime()))
+    profile = profiling.start(profile_stats_file is not None) if profile_file else None
+
+    for file in output_files:
+        if not overwrite_existing_file and not interactive and os.path.exists(file):
+            raise FileExistsError(f'Output file "{file}" already exists (use --overwrite-existing-file to overwrite it)')
+        elif not overwrite_existing_file:
+            prevent_file_overwrite(file)
+        elif os.path.exists(file):
+            log(f'File "{file}" already exists and will be overwritten (--overwrite-existing-file)')
+
+    project = read_project(project_file)
+    media_pool = MediaPool(max_readers)
+    with profiling.stage('plan_timeline'): # probes the media files
+        plan = plan_timeline(project, media_pool.probe)
+    if time_range is not None:
+        time_range = (max(0.0, time_range[0]), min(time_range[1], plan['duration']))
+        if time_range[0] >= time_range[1]:
+            raise ValueError(f'Time range starts after the end of the timeline ({plan["duration"]:.2f}s)')
+        log(f'Rendering time range {time_range[0]:.2f}s-{time_range[1]:.2f}s of the timeline ({plan["duration"]:.2f}s)')
+
+    if engine == 'ffmpeg' and not audio_only:
+        from ffmpeg_engine import render_ffmpeg # only imported when used, the moviepy engine does not need it
+        for group_settings, outputs in output_groups:
+            for output in outputs: # every output is a separate filter graph
+                log(f'Rendering "{output["file"]}" with a single ffmpeg filter graph...')
+                render_ffmpeg(project, output['file'], {**group_settings, 'width': output['size'][0], 'height': output['size'][1]}, media_pool.probe, font_dirs, log, time_range)
+                log('Rendering with a single ffmpeg filter graph done!')
+    elif audio_only:
+        for file in output_files:
+            log(f'Writing audio file "{file}"...')
+            if not mix_audio(plan, file, log, time_range):
+                log('Info: Project has no audio, no file was written.')
+            log('Writing audio file done!')
+    else:
+        for i, (group_settings, outputs) in enumerate(output_groups):
+            if len(output_groups) > 1 or len(outputs) > 1:
+                log(f'Compositing at {group_settings["width"]}x{group_settings["height"]} px, {group_settings["fps"]} fps for ' + ', '.join(f'"{output["file"]}" ({output["size"][0]}x{output["size"][1]} px)' for output in outputs))
+            if i > 0:
+                media_pool.start_planning() # clips are built again at the size of this group
+            if (jobs > 1 or segment_cache_size > 0) and time_range is None: # without the segment cache a single process renders the timeline in one piece
+                segment_cache = SegmentCache(segment_cache_size) if segment_cache_size > 0 else None
+                render_parallel(project_file, project, plan, outputs, group_settings, build_clips(project, plan, group_settings, media_pool), jobs, render_options, segment_cache)
+            else: # time ranges are always rendered in one process, they are usually short
+                render_serial(project, plan, outputs, group_settings, media_pool, build_clips(project, plan, group_settings, media_pool, time_range), font_dirs, time_range, max_memory)
+
+    media_pool.close()
+    log(f'Opened {media_pool.video.opened_count} video readers, at most {media_pool.video.peak_count} at the same time')
+    if media_pool.video.stats.count:
+        log(media_pool.video.stats)
+    if media_pool.images.decode_count:
+        log(f'Decoded {media_pool.images.decode_count} images, {media_pool.images.hit_count} frames of image clips were taken from the image cache')
+    log(f'Probed {media_pool.probe_cache.miss_count} media files, {media_pool.probe_cache.hit_count} were already in the probe cache')
+    if profile is not None:
+        profiling.stop()
+        settings = {'project': project_file, 'outputs': output_files, 'groups': [group_settings for group_settings, _ in output_groups], 'jobs': jobs, 'engine': engine, 'time_range': time_range, 'preview': preview, 'max_memory': max_memory, 'segment_cache_size': segment_cache_size}
+        report = profile.write(profile_file, media_pool.video, settings, profile_stats_file)
+        log(f'Profile report written to "{profile_file}"' + (f', cProfile of the render loop to "{profile_stats_file}"' if profile_stats_file else ''))
+        log('Frame times (mean ms): ' + ', '.join(f'{stage} {histogram["mean_ms"]:.2f}' for stage, histogram in report['frames'].items()) + f'; peak RSS {report["memory"]["peak_rss_mb"]} MB')
+
+    if interactive:
+        log('Opening explorer...')
+        open_explorer_on_file(output_files[0])
+        log('Opening explorer done!')
+        log('Playing sound...')
+        play_notification_sound()
+        log('Playing sound done!')
     log('End time: ' + str(get_current_datetime()))
     log('Rendering finished!')
@@ -0,0 +1,105 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from utils import get_cache_dir
+from probe_cache import get_file_key
+from project import TitleExtent
+
+SEGMENT_CACHE_VERSION = 2 # increase when the rendering of segments changes, older cached segments are not used anymore
+SEGMENT_CACHE_MIN_DURATION = 3.0 # seconds, the timeline is cut at every hard cut that leaves segments at least this long, so an edit only changes the segments around it
+
+def get_segment_cache_dir():
+    return os.path.join(get_cache_dir(), 'segments')
+
+def get_extent_properties(extent): # all properties of the extent from the project file except the ids
+    return {name: getattr(extent, name) for name in extent.__slots__ if name not in ['extent_id', 'media_item_id']}
+
+def get_segment_key(project, plan, segment, output_settings, output_file, font_dirs=None, size=None): # hash of everything the encoded frames of the segment depend on, times are relative to the segment so moved segments are found again; size is the size the encoder scales the composited frames to (see renderer.get_output_groups)
+    from titles import get_text_settings, get_sprite_key # imported here because titles imports moviepy, segment keys of titles are the only part that needs it
+    fps = output_settings['fps']
+    main = []
+    for extent_id in segment['extent_ids']:
+        extent = project.extents[extent_id]
+        properties = get_extent_properties(extent)
+        if not isinstance(extent, TitleExtent): # media file, a replaced or changed file is rendered again
+            properties['file'] = get_file_key(project.get_file(extent))
+        main.append(properties)
+    titles = []
+    for title in plan['titles']:
+        if title['start'] < segment['end'] and title['end'] > segment['start']:
+            text_settings = get_text_settings(project.extents[title['extent_id']], output_settings, font_dirs)
+            titles.append({
+                'sprite': get_sprite_key(text_settings), # text, font file and style
+                'start': round(title['start'] - segment['start'], 6),
+                'duration': round(title['duration'], 6),
+                'should_scroll': title['should_scroll']
+            })
+    definition = {
+        'version': SEGMENT_CACHE_VERSION,
+        'output_settings': output_settings,
+        'extension': os.path.splitext(output_file)[1].lower(), # codec
+        'frame_count': segment['end_frame'] - segment['first_frame'],
+        'frame_offset': round(segment['first_frame'] / fps - segment['start'], 6), # time of the first frame after the start of the segment
+        'main': main,
+        'titles': titles
+    }
+    if size is not None and tuple(size) != (output_settings['width'], output_settings['height']): # scaled from a larger output, the keys of unscaled segments do not change
+        definition['size'] = list(size)
+    return hashlib.sha1(json.dumps(definition, sort_keys=True).encode('utf-8')).hexdigest()
+
+class SegmentCache: # encoded segment files named by their key in a cache directory, bounded to max_size MB by deleting the least recently used ones (the modification time is updated on every use)
+    def __init__(self, max_size, cache_dir=None):
+        self.max_size = max_size
+        self.cache_dir = cache_dir or get_segment_cache_dir()
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def get_file(self, key, extension):
+        return os.path.join(self.cache_dir, key + extension)
+
+    def get(self, key, extension): # returns the cached segment file or None
+        file = self.get_file(key, extension)
+        try:
+            os.utime(file) # mark as recently used
+        except OSError:
+            self.miss_count += 1
+            return None
+        self.hit_count += 1
+        return file
+
+    def put(self, key, segment_file): # copies the rendered segment into the cache, returns the cached file
+        file = self.get_file(key, os.path.splitext(segment_file)[1])
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='.tmp', delete=False) as temp_file: # copied to a temporary file first, so a partly copied segment is never used
+                with open(segment_file, 'rb') as source:
+                    shutil.copyfileobj(source, temp_file)
+            os.replace(temp_file.name, file)
+        except OSError as e:
+            print(f'Warning: Segment could not be stored in the segment cache "{self.cache_dir}" ({e})')
+            return segment_file
+        return file
+
+    def evict(self, keep_files=()): # deletes the least recently used segments until the cache fits into max_size, keep_files are never deleted
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.is_file()]
+        except OSError:
+            return 0
+        entries = sorted(((entry.stat(), entry.path) for entry in entries), key=lambda entry: entry[0].st_mtime) # oldest first
+        total_size = sum(stat.st_size for stat, path in entries)
+        keep_files = {os.path.normcase(os.path.abspath(file)) for file in keep_files}
+        deleted_count = 0
+        for stat, path in entries:
+            if total_size <= self.max_size * 2**20:
+                break
+            if os.path.normcase(os.path.abspath(path)) in keep_files:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= stat.st_size
+            deleted_count += 1
+        return deleted_count
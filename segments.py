@@ -0,0 +1,95 @@
+import os
+import math
+from moviepy.config import FFMPEG_BINARY
+from moviepy.tools import subprocess_call
+from timeline import IntervalIndex
+
+MIN_STILL_SPAN_DURATION = 1.0 # seconds, shorter still spans are composited like the rest of the timeline because the extra ffmpeg process and join point cost more than they save
+
+def find_hard_cuts(video_clips, title_timings): # returns times in the 'Main' sequence where a clip starts without a transition and no title is visible
+    hard_cuts = []
+    for i in range(1, len(video_clips)):
+        cut = video_clips[i].start
+        if cut < video_clips[i-1].end - 1e-6: # clip is shifted into the previous one, so it has a crossfade transition
+            continue
+        if any(title_timing['start'] < cut - 1e-6 and cut + 1e-6 < title_timing['start'] + title_timing['duration'] for title_timing in title_timings): # title would be split in two
+            continue
+        hard_cuts.append((i, cut))
+    return hard_cuts
+
+def plan_segments(main_extent_ids, video_clips, title_timings, total_duration, fps, jobs, min_duration=None): # splits the 'Main' sequence at hard cuts into (at most) jobs segments of roughly equal duration, or at every hard cut that leaves segments of at least min_duration if given
+    hard_cuts = find_hard_cuts(video_clips, title_timings)
+    chosen_cuts = []
+    if min_duration is not None: # cut positions only depend on the clips around them, so segments stay the same when other parts of the timeline are edited
+        previous_cut = 0.0
+        for index, cut in hard_cuts:
+            if cut - previous_cut >= min_duration and total_duration - cut >= min_duration:
+                chosen_cuts.append((index, cut))
+                previous_cut = cut
+        jobs = 1
+    for k in range(1, jobs):
+        target = total_duration * k / jobs
+        candidates = [hard_cut for hard_cut in hard_cuts if hard_cut not in chosen_cuts]
+        if not candidates:
+            break
+        chosen_cuts.append(min(candidates, key=lambda hard_cut: abs(hard_cut[1] - target)))
+    chosen_cuts.sort()
+
+    end_frame = int(total_duration * fps) # moviepy rounds the frame count down
+    boundaries = [(0, 0.0, 0)]
+    for index, cut in chosen_cuts:
+        cut_frame = get_cut_frame(cut, fps)
+        if boundaries[-1][2] < cut_frame < end_frame: # skip cuts that would produce segments without frames
+            boundaries.append((index, cut, cut_frame))
+    boundaries.append((len(main_extent_ids), total_duration, end_frame))
+
+    segments = []
+    for (first_index, start, first_frame), (end_index, end, end_frame) in zip(boundaries, boundaries[1:]):
+        segments.append({
+            'index': len(segments),
+            'extent_ids': main_extent_ids[first_index:end_index],
+            'start': start,
+            'end': end,
+            'first_frame': first_frame, # frame k is at time k/fps like in moviepy
+            'end_frame': end_frame # first frame of the next segment
+        })
+    return segments
+
+def get_cut_frame(cut, fps): # returns the first frame at or after the cut, it is the first frame that shows the clip after the cut
+    return math.ceil(cut * fps - 1e-6)
+
+def plan_still_spans(plan, fps, start_time, frame_count, min_duration=MIN_STILL_SPAN_DURATION): # returns the spans of output frames that only show a color clip (or black) and non-scrolling titles, frame k is at start_time + k/fps; these frames only change with the title fades
+    main_index = IntervalIndex([(clip['start'], clip['end']) for clip in plan['main']])
+    title_index = IntervalIndex([(title['start'], title['end']) for title in plan['titles']])
+    boundaries = sorted(set([start_time] + [boundary for boundary in main_index.boundaries + title_index.boundaries if boundary > start_time]))
+
+    spans = []
+    for start, end in zip(boundaries, boundaries[1:] + [None]):
+        first_frame = max(0, get_cut_frame(start - start_time, fps))
+        end_frame = min(frame_count, get_cut_frame(end - start_time, fps)) if end is not None else frame_count
+        if first_frame >= end_frame:
+            continue
+        main_clips = [plan['main'][i] for i in main_index.at(start)]
+        titles = [plan['titles'][i] for i in title_index.at(start)]
+        if len(main_clips) > 1 or any(clip['type'] != 'color' for clip in main_clips) or any(title['should_scroll'] for title in titles): # video, transition or scrolling title
+            continue
+        color = list(main_clips[0]['color'][:3]) if main_clips else [0, 0, 0] # black when no clip is playing
+        if spans and spans[-1]['end_frame'] == first_frame and spans[-1]['color'] == color: # e.g. a title starts or ends on the same background
+            spans[-1]['end_frame'] = end_frame
+            spans[-1]['titles'] += [title for title in titles if title not in spans[-1]['titles']]
+        else:
+            spans.append({'first_frame': first_frame, 'end_frame': end_frame, 'color': color, 'titles': titles})
+    return [span for span in spans if span['end_frame'] - span['first_frame'] >= min_duration * fps]
+
+def concat_segments(segment_files, output_file): # joins the segments with the concat demuxer without re-encoding
+    list_file = os.path.join(os.path.dirname(os.path.abspath(output_file)), f'{os.path.basename(output_file)}.segments.txt')
+    with open(list_file, 'w', encoding='utf-8') as file:
+        for segment_file in segment_files:
+            file.write("file '%s'\n" % os.path.abspath(segment_file).replace("'", "'\\''")) # absolute paths, segments can be in the segment cache
+    try:
+        subprocess_call([FFMPEG_BINARY, '-y', '-f', 'concat', '-safe', '0', '-i', list_file, '-c', 'copy', output_file], logger=None)
+    finally:
+        os.remove(list_file)
+
+def mux_audio(video_file, audio_file, output_file): # adds the audio track to the video without re-encoding
+    subprocess_call([FFMPEG_BINARY, '-y', '-i', video_file, '-i', audio_file, '-map', '0:v', '-map', '1:a', '-c', 'copy', output_file], logger=None)
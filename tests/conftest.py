@@ -0,0 +1,26 @@
+import os
+import sys
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR) # the renderer modules are top level modules
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks')) # project and media generators of the benchmarks (synthetic.py)
+import synthetic
+from synthetic import color_clip, crossfade, media_item, video_clip # XML builders of the tests, shared with the benchmarks
+
+def title_clip(extent_id, gap_before, duration, lines, scrolling=False):
+    return synthetic.title_clip(extent_id, gap_before, duration, synthetic.text_effect(lines, scrolling))
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch): # font index, probe infos, title sprites and segments of the tests are not written to the cache of the user
+    directory = tmp_path / 'cache'
+    monkeypatch.setenv('MOVIE_MAKER_RENDERER_CACHE_DIR', str(directory))
+    return directory
+
+@pytest.fixture
+def write_project(tmp_path): # returns a function that writes a project of media items and extents (xml strings) and the extent ids of its tracks, returns the project file
+    def write(media_items=(), extents=(), main_ids=(), soundtrack_ids=(), text_ids=(), name='test.wlmp'):
+        project_file = tmp_path / name
+        project_file.write_text(synthetic.project_xml('test', media_items, extents, main_ids, soundtrack_ids, text_ids), encoding='utf-8')
+        return str(project_file)
+    return write
@@ -0,0 +1,43 @@
+import numpy as np
+from compositor import blend, make_scratch, divide_by_255, BLEND_BAND_ROWS
+
+def reference_blend(dst, src, alpha): # the float formula blend() computes with integers
+    alpha = np.asarray(alpha, dtype=float)
+    return np.floor((src * alpha + dst * (255 - alpha)) / 255 + 0.5).astype(np.uint8)
+
+def test_divide_by_255_rounds_like_float_division():
+    values = np.arange(255 * 255 + 1, dtype=np.uint16)
+    expected = np.floor(values / 255 + 0.5).astype(np.uint16)
+    divide_by_255(values, np.empty_like(values))
+    assert np.array_equal(values, expected)
+
+def test_blend_with_constant_opacity_matches_float_reference():
+    rng = np.random.default_rng(1)
+    height, width = BLEND_BAND_ROWS * 2 + 5, 37 # several bands and a partial one
+    src = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    scratch = make_scratch(width)
+    for alpha in (0, 1, 127, 128, 254, 255):
+        dst = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        expected = reference_blend(dst, src, alpha)
+        blend(dst, src, alpha, scratch)
+        assert np.array_equal(dst, expected), alpha
+
+def test_blend_with_alpha_mask_matches_float_reference():
+    rng = np.random.default_rng(2)
+    height, width = BLEND_BAND_ROWS + 9, 50
+    src = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    dst = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    alpha = rng.integers(0, 256, (height, width, 1)).astype(np.uint16)
+    expected = reference_blend(dst, src, alpha)
+    blend(dst, src, alpha, make_scratch(width))
+    assert np.array_equal(dst, expected)
+
+def test_blend_of_a_cropped_region_only_changes_that_region():
+    rng = np.random.default_rng(3)
+    frame = rng.integers(0, 256, (40, 60, 3), dtype=np.uint8)
+    original = frame.copy()
+    src = rng.integers(0, 256, (10, 20, 3), dtype=np.uint8)
+    blend(frame[5:15, 30:50], src, 100, make_scratch(60))
+    assert np.array_equal(frame[5:15, 30:50], reference_blend(original[5:15, 30:50], src, 100))
+    frame[5:15, 30:50] = original[5:15, 30:50]
+    assert np.array_equal(frame, original)
@@ -0,0 +1,49 @@
+import subprocess
+from moviepy.config import FFMPEG_BINARY
+from conftest import color_clip, crossfade, media_item, video_clip
+from engine_comparison import render_with_engine, compare_videos
+from ffmpeg_engine import get_range_plan
+
+OUTPUT_SETTINGS = {'width': 160, 'height': 90, 'fps': 10, 'preset': 'ultrafast'}
+
+def test_engines_render_the_same_frames_around_speed_2_clips(tmp_path, write_project):
+    media_file = tmp_path / 'clip.mp4'
+    subprocess.run([FFMPEG_BINARY, '-y', '-hide_banner', '-loglevel', 'error', '-f', 'lavfi', '-i', 'testsrc2=size=192x108:rate=30:duration=4', '-f', 'lavfi', '-i', 'sine=duration=4', '-shortest', '-pix_fmt', 'yuv420p', str(media_file)], check=True)
+    project_file = write_project(
+        media_items=[media_item(1, media_file, 1)],
+        extents=[
+            video_clip(10, 1, 0, 2.25, 1),
+            video_clip(11, 1, 0, 3.5, 2, transitions=crossfade(0.5)), # 1.75 s from 1.75 s, the crossfade starts between two frames
+            color_clip(12, 1, [1, 0, 0]), # hard cut at 3.5 s
+            video_clip(13, 1, 0.2, 2.75, 2), # 1.275 s, ends between two frames
+            color_clip(14, 0.5, [0, 0, 1]) # hard cut at 5.775 s
+        ],
+        main_ids=[10, 11, 12, 13, 14])
+
+    for engine in ['moviepy', 'ffmpeg']:
+        render_with_engine(engine, project_file, str(tmp_path / f'{engine}.mp4'), OUTPUT_SETTINGS)
+    frame_count_moviepy, frame_count_ffmpeg, differences = compare_videos(str(tmp_path / 'moviepy.mp4'), str(tmp_path / 'ffmpeg.mp4'))
+
+    assert frame_count_moviepy == frame_count_ffmpeg == 62 # 6.275 s, rounded down
+    assert max(differences) < 8, [(i, round(difference, 2)) for i, difference in enumerate(differences) if difference >= 8]
+
+def test_range_plan_only_keeps_the_clips_of_the_range():
+    def clip(start, end, crossfade_duration=0.0):
+        return {'start': start, 'end': end, 'duration': end - start, 'crossfade_duration': crossfade_duration}
+    plan = {
+        'main': [clip(0, 3), clip(3, 6), clip(5.5, 9, 0.5), clip(9, 12)], # the third clip crossfades into the second one
+        'soundtrack': [clip(0, 7), clip(7, 12)],
+        'titles': [clip(1, 2), clip(4, 8)],
+        'video_duration': 12, 'duration': 12
+    }
+
+    range_plan, skip_frames = get_range_plan(plan, (4.0, 8.0), 10)
+    assert skip_frames == 0
+    assert [(clip['start'], clip['end']) for clip in range_plan['main']] == [(-1.0, 2.0), (1.5, 5.0)]
+    assert [(clip['start'], clip['end']) for clip in range_plan['soundtrack']] == [(-4.0, 3.0), (3.0, 8.0)]
+    assert [(clip['start'], clip['end']) for clip in range_plan['titles']] == [(0.0, 4.0)]
+    assert (range_plan['video_duration'], range_plan['duration']) == (4.0, 4.0)
+
+    range_plan, skip_frames = get_range_plan(plan, (5.77, 8.0), 10) # starts in the crossfade, the graph starts 3 frames before the range
+    assert skip_frames == 3
+    assert [round(clip['start'], 6) for clip in range_plan['main']] == [-2.47, 0.03] # the whole crossfade is in the graph
@@ -0,0 +1,13 @@
+import pytest
+import font_index
+from synthetic import FONT_DIR
+
+def test_warm_lookup_does_not_resolve_font_dirs_again(monkeypatch):
+    monkeypatch.setattr(font_index, '_font_names', {})
+    assert font_index.find_font('Lato', [FONT_DIR]).endswith('Lato-Regular.ttf')
+
+    def fail(*args, **kwargs):
+        pytest.fail('font dirs were resolved again')
+    monkeypatch.setattr(font_index, 'get_font_dirs', fail)
+    assert font_index.find_font('Lato', [FONT_DIR]).endswith('Lato-Regular.ttf')
+    assert font_index.find_font('Missing font', [FONT_DIR]) is None
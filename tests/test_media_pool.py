@@ -0,0 +1,22 @@
+import subprocess
+from moviepy.config import FFMPEG_BINARY
+from conftest import crossfade, media_item, video_clip
+from engine_comparison import render_with_engine
+from media_pool import PooledVideoReader
+
+OUTPUT_SETTINGS = {'width': 160, 'height': 90, 'fps': 10, 'preset': 'ultrafast'}
+
+def test_crossfade_of_the_same_file_uses_a_reader_per_clip(tmp_path, write_project, monkeypatch): # both clips are decoded in the crossfade, a shared reader would seek back for every frame
+    media_file = tmp_path / 'clip.mp4'
+    subprocess.run([FFMPEG_BINARY, '-y', '-hide_banner', '-loglevel', 'error', '-f', 'lavfi', '-i', 'testsrc2=size=192x108:rate=30:duration=4', '-pix_fmt', 'yuv420p', str(media_file)], check=True)
+    project_file = write_project(
+        media_items=[media_item(1, media_file, 1)],
+        extents=[video_clip(10, 1, 0, 3), video_clip(11, 1, 0.5, 3.5, transitions=crossfade(1.5))],
+        main_ids=[10, 11])
+    starts = []
+    initialize = PooledVideoReader.initialize
+    monkeypatch.setattr(PooledVideoReader, 'initialize', lambda reader, start_time=0: (starts.append(start_time), initialize(reader, start_time)))
+
+    render_with_engine('moviepy', project_file, str(tmp_path / 'out.mp4'), OUTPUT_SETTINGS)
+
+    assert len(starts) == 2, starts
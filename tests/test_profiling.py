@@ -0,0 +1,20 @@
+import json
+import subprocess
+import pytest
+from moviepy.config import FFMPEG_BINARY
+from conftest import media_item, video_clip
+from renderer import render
+
+@pytest.mark.parametrize('jobs, segment_cache_size', [(1, 0), (1, 64), (2, 0)])
+def test_report_counts_the_readers_of_every_process(tmp_path, write_project, jobs, segment_cache_size): # segments are rendered with their own reader pools, in the main process (segment cache) or in worker processes (-j)
+    media_items = []
+    for i in range(2):
+        media_file = tmp_path / f'clip_{i}.mp4'
+        subprocess.run([FFMPEG_BINARY, '-y', '-hide_banner', '-loglevel', 'error', '-f', 'lavfi', '-i', 'testsrc2=size=192x108:rate=30:duration=4', '-pix_fmt', 'yuv420p', str(media_file)], check=True)
+        media_items.append(media_item(1 + i, media_file, 1))
+    project_file = write_project(media_items=media_items, extents=[video_clip(10, 1, 0, 3.5), video_clip(11, 2, 0, 3.5)], main_ids=[10, 11])
+    profile_file = tmp_path / 'profile.json'
+
+    render(project_file, str(tmp_path / 'out.mp4'), 160, 90, 10, jobs=jobs, segment_cache_size=segment_cache_size, interactive=False, profile_file=str(profile_file))
+
+    assert json.loads(profile_file.read_text(encoding='utf-8'))['readers']['opened'] == 2
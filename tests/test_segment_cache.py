@@ -0,0 +1,36 @@
+from synthetic import FONT_DIR
+from conftest import color_clip, title_clip
+from project import load_project
+from planner import plan_timeline
+from segment_cache import get_segment_key
+from segments import get_cut_frame
+
+OUTPUT_SETTINGS = {'width': 320, 'height': 180, 'fps': 10, 'preset': 'medium'}
+
+def get_key(write_project, intro_duration=0, second_color=(0.2, 0.4, 0.8), name='test.wlmp', output_file='out.mp4', output_settings=OUTPUT_SETTINGS): # key of the segment of the two clips after the intro, with a title over the second clip
+    main = [color_clip(11, 2, [0.8, 0.2, 0.2]), color_clip(12, 3, list(second_color))]
+    main_ids = [11, 12]
+    if intro_duration:
+        main.insert(0, color_clip(10, intro_duration, [0, 0, 0]))
+        main_ids.insert(0, 10)
+    project = load_project(write_project(extents=main + [title_clip(30, intro_duration + 2.5, 2, ['Segment title'])], main_ids=main_ids, text_ids=[30], name=name))
+    plan = plan_timeline(project, probe=None) # color clips and titles are not probed
+    fps = output_settings['fps']
+    segment = {'extent_ids': [str(extent_id) for extent_id in main_ids[-2:]], 'start': intro_duration, 'end': intro_duration + 5, 'first_frame': get_cut_frame(intro_duration, fps), 'end_frame': get_cut_frame(intro_duration + 5, fps)}
+    return get_segment_key(project, plan, segment, output_settings, output_file, [FONT_DIR])
+
+def test_segment_key_is_stable(write_project):
+    key = get_key(write_project)
+    assert len(key) == 40
+    assert get_key(write_project) == key
+    assert get_key(write_project, name='other.wlmp') == key # the project file is not part of the key
+
+def test_segment_key_does_not_change_when_the_segment_moves(write_project):
+    assert get_key(write_project, intro_duration=4) == get_key(write_project)
+
+def test_segment_key_changes_with_the_content(write_project):
+    key = get_key(write_project)
+    assert get_key(write_project, second_color=(0.2, 0.4, 0.9)) != key
+    assert get_key(write_project, output_file='out.webm') != key
+    assert get_key(write_project, output_settings={**OUTPUT_SETTINGS, 'fps': 25}) != key
+    assert get_key(write_project, intro_duration=0.25) != key # frames are taken at other times of the clips
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+from segments import find_hard_cuts, plan_segments, get_cut_frame
+
+def clips(*times):
+    return [SimpleNamespace(start=start, end=end) for start, end in times]
+
+VIDEO_CLIPS = clips((0, 3), (3, 6), (5.5, 9), (9, 12), (12, 15)) # the third clip crossfades into the second one
+TITLES = [{'start': 8.5, 'duration': 1.0}] # visible over the cut at 9
+EXTENT_IDS = ['a', 'b', 'c', 'd', 'e']
+
+def test_find_hard_cuts_skips_crossfades_and_cuts_under_titles():
+    assert find_hard_cuts(VIDEO_CLIPS, TITLES) == [(1, 3), (4, 12)]
+    assert find_hard_cuts(VIDEO_CLIPS, []) == [(1, 3), (3, 9), (4, 12)]
+
+def test_plan_segments_splits_at_the_hard_cuts_closest_to_equal_parts():
+    segments = plan_segments(EXTENT_IDS, VIDEO_CLIPS, TITLES, 15, 10, jobs=3)
+    assert [segment['extent_ids'] for segment in segments] == [['a'], ['b', 'c', 'd'], ['e']]
+    assert [(segment['start'], segment['end']) for segment in segments] == [(0.0, 3), (3, 12), (12, 15)]
+    assert [(segment['first_frame'], segment['end_frame']) for segment in segments] == [(0, 30), (30, 120), (120, 150)]
+    assert [segment['index'] for segment in segments] == [0, 1, 2]
+
+def test_plan_segments_with_one_job_is_one_segment():
+    segments = plan_segments(EXTENT_IDS, VIDEO_CLIPS, TITLES, 15, 10, jobs=1)
+    assert len(segments) == 1
+    assert segments[0]['extent_ids'] == EXTENT_IDS
+    assert (segments[0]['first_frame'], segments[0]['end_frame']) == (0, 150)
+
+def test_plan_segments_with_min_duration_cuts_at_every_long_enough_hard_cut():
+    segments = plan_segments(EXTENT_IDS, VIDEO_CLIPS, [], 15, 10, jobs=8, min_duration=3.0)
+    assert [segment['start'] for segment in segments] == [0.0, 3, 9, 12] # jobs is ignored
+    segments = plan_segments(EXTENT_IDS, VIDEO_CLIPS, [], 15, 10, jobs=1, min_duration=4.0)
+    assert [segment['start'] for segment in segments] == [0.0, 9] # 3 and 12 leave shorter segments
+
+def test_cut_between_two_frames_starts_at_the_next_frame():
+    assert get_cut_frame(3.05, 10) == 31
+    assert get_cut_frame(3.0, 10) == 30
+    assert get_cut_frame(0.1 * 3, 10) == 3 # float error below a whole frame
+    segments = plan_segments(['a', 'b'], clips((0, 3.05), (3.05, 6.5)), [], 6.5, 10, jobs=2)
+    assert [(segment['first_frame'], segment['end_frame']) for segment in segments] == [(0, 31), (31, 65)]
@@ -0,0 +1,24 @@
+from timeline import IntervalIndex
+
+def test_at_returns_the_intervals_playing_in_layer_order():
+    index = IntervalIndex([(0, 3), (2, 5), (5, None), (1, 2)])
+    assert index.at(-1) == []
+    assert index.at(0) == [0]
+    assert index.at(1.5) == [0, 3]
+    assert index.at(2) == [0, 1] # the end is exclusive
+    assert index.at(3) == [1]
+    assert index.at(5) == [2]
+    assert index.at(1000) == [2] # no end
+
+def test_overlapping_returns_the_intervals_playing_in_a_time_range():
+    index = IntervalIndex([(0, 3), (2, 5), (5, None)])
+    assert index.overlapping(2.9, 3.1) == [0, 1]
+    assert index.overlapping(3, 4) == [1]
+    assert index.overlapping(0, 10) == [0, 1, 2]
+    assert index.overlapping(5.5, 6) == [2]
+    assert index.overlapping(-2, -1) == []
+
+def test_intervals_with_equal_bounds_never_play():
+    index = IntervalIndex([(1, 1), (0, 2)])
+    assert index.at(1) == [1]
+    assert index.overlapping(0, 2) == [1]
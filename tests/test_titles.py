@@ -0,0 +1,29 @@
+from synthetic import FONT_DIR
+from conftest import title_clip
+from renderer import read_project, build_title_clips
+from titles import get_title_sprite, get_scroll_speed
+
+OUTPUT_SETTINGS = {'width': 320, 'height': 180, 'fps': 10}
+
+def test_scrolling_title_moves_with_its_own_sprite_offset(write_project): # the position of a scrolling title must not use the offset of a title built after it
+    project = read_project(write_project(extents=[
+        title_clip(300, 0, 4, ['Credits'] + [f'Line {i}' for i in range(6)], scrolling=True),
+        title_clip(301, 0, 3, ['Short'], scrolling=False)
+    ], text_ids=[300, 301]))
+    clips = build_title_clips(project, OUTPUT_SETTINGS, font_dirs=[FONT_DIR])
+    scrolling = get_title_sprite(project.extents[project.placeholders['Text'][0]], OUTPUT_SETTINGS, [FONT_DIR])
+    fading = get_title_sprite(project.extents[project.placeholders['Text'][1]], OUTPUT_SETTINGS, [FONT_DIR])
+    assert scrolling['offset'] != fading['offset'] # otherwise the test would not notice a wrong offset
+
+    offset_x, offset_y = scrolling['offset']
+    scroll_speed = get_scroll_speed(scrolling['size'], OUTPUT_SETTINGS, 4)
+    for t in (0, 1.5, 3.9):
+        assert tuple(clips[0].pos(t)) == (offset_x, offset_y + int(OUTPUT_SETTINGS['height'] - scroll_speed * t))
+    assert tuple(clips[1].pos(0)) == fading['offset']
+
+def test_wrapped_lines_of_a_scrolling_title_fit_into_its_clip(write_project): # the clip height of a scrolling title is the height of the wrapped text and the tolerance margin
+    project = read_project(write_project(extents=[title_clip(300, 0, 4, [f'Scrolling line {i} is much wider than the frame of the output, so it is wrapped into several lines of text' for i in range(3)], scrolling=True)], text_ids=[300]))
+    sprite = get_title_sprite(project.extents[project.placeholders['Text'][0]], OUTPUT_SETTINGS, [FONT_DIR])
+    height = sprite['image'].shape[0]
+    assert sprite['size'][0] == OUTPUT_SETTINGS['width']
+    assert 0 < sprite['offset'][1] and sprite['offset'][1] + height < sprite['size'][1]
@@ -0,0 +1,43 @@
+import numpy as np
+from bisect import bisect_left, bisect_right
+from moviepy import CompositeVideoClip
+from compositor import LayerCache, make_scratch, composite_layers
+
+class IntervalIndex: # sweep list over the start/end times of the clips, for every span between two consecutive start/end times the playing clips are stored
+    def __init__(self, intervals): # intervals is a list of (start, end), end can be None for clips without end
+        self.boundaries = sorted(set([start for start, end in intervals] + [end for start, end in intervals if end is not None]))
+        self.active = [[] for _ in self.boundaries] # self.active[k] contains the indices of the intervals playing in [boundaries[k], boundaries[k+1])
+        for i, (start, end) in enumerate(intervals): # indices are appended in ascending order, so the layer order of the clips is kept
+            first = bisect_left(self.boundaries, start)
+            last = bisect_left(self.boundaries, end) if end is not None else len(self.boundaries)
+            for k in range(first, last):
+                self.active[k].append(i)
+
+    def at(self, t): # returns indices of the intervals with start <= t < end
+        k = bisect_right(self.boundaries, t) - 1
+        return self.active[k] if k >= 0 else []
+
+    def overlapping(self, t_start, t_end): # returns indices of the intervals that play at some time in [t_start, t_end]
+        first = max(bisect_right(self.boundaries, t_start) - 1, 0)
+        last = bisect_right(self.boundaries, t_end)
+        indices = set()
+        for k in range(first, last):
+            indices.update(self.active[k])
+        return sorted(indices)
+
+class TimelineVideoClip(CompositeVideoClip): # composite that only blends the clips playing at t instead of checking every clip on every frame, frames are composited in place into the buffers of frame_pool (see compositor.py)
+    def __init__(self, clips, size=None, frame_pool=None):
+        super().__init__(clips, size=size, bg_color=(0, 0, 0)) # opaque black background, so no mask has to be composited
+        self.index = IntervalIndex([(clip.start, clip.end) for clip in self.clips])
+        self.frame_pool = frame_pool
+        self.cache = LayerCache()
+        self.scratch = make_scratch(self.size[0])
+
+    def playing_clips(self, t=0):
+        return [self.clips[i] for i in self.index.at(t)]
+
+    def frame_function(self, t):
+        frame = self.frame_pool.next() if self.frame_pool is not None else np.zeros((self.size[1], self.size[0], 3), dtype=np.uint8)
+        layers = self.playing_clips(t)
+        self.cache.keep(layers)
+        return composite_layers(frame, layers, t, self.cache, self.scratch)
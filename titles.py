@@ -0,0 +1,102 @@
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+from moviepy import TextClip
+from utils import find_font_file, get_cache_dir
+import profiling
+
+TITLE_FADE_DURATION = 1.5 # the default title texts in movie maker have a fade transition
+TITLE_CLIP_SIZE_TOLERANCE_MARGIN = 50 # tolerance margin for calculated title clip size e.g. if scrolled text is slighly cut off how many pixels the clip should be bigger on the y-axis
+TITLE_SPRITE_VERSION = 2 # increase when the rasterization of titles changes, older sprites in the cache are rendered again
+
+_sprites = {} # in-memory sprites of this process, structure is { 'key': sprite, ... }
+
+def get_text_settings(title_extent, output_settings, font_dirs=None): # everything the rasterized text of a title depends on, height is None when scrolling (then the text height is used)
+    text_outline_size = title_extent.outline_size_index * 4 # convert outline index value to pixels, must be integer!
+    font_size = int(title_extent.font_size * 110) # calculate approximate font size in point unit, factor is approx 110 (in combination with font_scale_factor)
+
+    font_scale_factor = output_settings['width'] / 1280 # scale font size to output resolution to always appear roughly the same size (like it would in HD = width 1280 px), otherwise the text would be too small in higher resolutions
+
+    # OPTIONAL: add text transparency
+
+    with profiling.stage('font_lookup'):
+        font_file = find_font_file(title_extent.font_family, font_dirs) # look up once, font index is cached after the first title
+
+    return {
+        'text': title_extent.text,
+        'font_file': font_file,
+        'font_size': int(font_size * font_scale_factor),
+        'color': tuple(title_extent.text_color),
+        'stroke_color': tuple(title_extent.outline_color),
+        'stroke_width': int(text_outline_size * font_scale_factor),
+        'text_align': {'MIDDLE': 'center', 'BEGIN': 'left', 'END': 'right'}.get(title_extent.justify, 'center'), # map movie maker names to moviepy names, 'center' is default
+        'width': output_settings['width'],
+        'height': output_settings['height'] if not title_extent.should_scroll else None
+    }
+
+def build_text_clip(text_settings, duration=None): # returns the text rendered once in a clip of the width (and height or the text height when scrolling) of the settings
+    return TextClip(font=text_settings['font_file'],
+            text=text_settings['text'],
+            font_size=text_settings['font_size'],
+            size=(text_settings['width'], text_settings['height']), # height None is the height of the wrapped text
+            margin=(0, TITLE_CLIP_SIZE_TOLERANCE_MARGIN // 2 if text_settings['height'] is None else 0), # the scrolled text is not cut off
+            method='caption',
+            color=text_settings['color'],
+            stroke_color=text_settings['stroke_color'],
+            stroke_width=text_settings['stroke_width'],
+            text_align=text_settings['text_align'],
+            horizontal_align='center',
+            vertical_align='center',
+            duration=duration
+    )
+
+def get_scroll_speed(title_clip_size, output_settings, duration): # optimal scroll speed so that all text is displayed within duration, the text moves from below the frame to above it
+    return (title_clip_size[1] + output_settings['height']) / duration
+
+def rasterize_text_clip(text_clip): # returns the text as rgba uint8 image
+    rgb = text_clip.get_frame(0)
+    alpha = np.round(text_clip.mask.get_frame(0) * 255) if text_clip.mask is not None else np.full(rgb.shape[:2], 255)
+    return np.dstack([rgb, alpha]).astype(np.uint8)
+
+def crop_to_content(image): # returns the part of the rgba image that is not fully transparent and its (x, y) offset
+    rows, columns = np.nonzero(image[:, :, 3].any(axis=1))[0], np.nonzero(image[:, :, 3].any(axis=0))[0]
+    if len(rows) == 0: # no visible text
+        return np.zeros((1, 1, 4), dtype=np.uint8), (0, 0)
+    left, top = int(columns[0]) // 2 * 2, int(rows[0]) // 2 * 2 # even offset, ffmpeg overlays on yuv420 frames at even positions only
+    return image[top:rows[-1] + 1, left:columns[-1] + 1].copy(), (left, top)
+
+def get_sprite_key(text_settings): # titles with the same text settings share one sprite, a changed font file is rendered again
+    font_stat = os.stat(text_settings['font_file']) if text_settings['font_file'] and os.path.isfile(text_settings['font_file']) else None
+    key = {**text_settings, 'font_mtime_ns': font_stat.st_mtime_ns if font_stat else None, 'version': TITLE_SPRITE_VERSION}
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+@profiling.timed('title_sprites')
+def get_title_sprite(title_extent, output_settings, font_dirs=None): # returns the title rasterized once and cropped to its visible text as { 'image': rgba uint8, 'offset': (x, y) in the title clip, 'size': (width, height) of the title clip }, cached on disk
+    text_settings = get_text_settings(title_extent, output_settings, font_dirs)
+    key = get_sprite_key(text_settings)
+    if key in _sprites:
+        return _sprites[key]
+
+    sprite_file = os.path.join(get_cache_dir(), 'title_sprites', f'{key}.npz')
+    sprite = None
+    if os.path.isfile(sprite_file):
+        try:
+            with np.load(sprite_file) as data:
+                sprite = {'image': data['image'], 'offset': tuple(int(value) for value in data['offset']), 'size': tuple(int(value) for value in data['size'])}
+        except Exception as e:
+            print(f'Warning: Title sprite "{sprite_file}" could not be read and is rendered again ({e})')
+    if sprite is None:
+        text_clip = build_text_clip(text_settings)
+        image, offset = crop_to_content(rasterize_text_clip(text_clip))
+        sprite = {'image': image, 'offset': offset, 'size': tuple(text_clip.size)}
+        try:
+            os.makedirs(os.path.dirname(sprite_file), exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(sprite_file), suffix='.tmp', delete=False) as file: # written to a temporary file first, parallel render processes can store the same sprite
+                np.savez(file, image=sprite['image'], offset=sprite['offset'], size=sprite['size'])
+            os.replace(file.name, sprite_file)
+        except OSError as e:
+            print(f'Warning: Title sprite "{sprite_file}" could not be written ({e})')
+    _sprites[key] = sprite
+    return sprite
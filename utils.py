@@ -1,24 +1,10 @@
 import os
 import os.path
+import re
+import sys
 import subprocess
-from fontTools import ttLib
 import datetime
 
-def get_volume(video_clip_info): # returns volume of video clip as a float factor
-    for bool_property in video_clip_info['BoundProperties']['BoundPropertyBool']: # when 'Mute' property is set to 'true' the volume is 0
-        if(bool_property['@Name'] == 'Mute' and bool_property['@Value'] == 'true'):
-            return 0.0 # return type is always float
-    for float_property in video_clip_info['BoundProperties']['BoundPropertyFloat']: # otherwise the volume float value is returned
-        if(float_property['@Name'] == 'Volume'):
-            return float(float_property['@Value'])
-    return 1.0 # when not property is set the volume remains unaltered
-
-def get_rotation_steps(video_clip_info): # returns rotation steps of video clip, multiply with 90 for degrees 
-    for int_property in video_clip_info['BoundProperties']['BoundPropertyInt']:
-        if(int_property['@Name'] == 'rotateStepNinety'):
-            return int(int_property['@Value']) # rotated in steps of 90 degrees
-    return 0
-
 def play_notification_sound():
     print('\007', end='') # play the bell/error notification sound e.g. to know when rendering is finished, also dont print a newline
 
@@ -26,30 +12,49 @@ def check_file_exists(file):
     if(not os.path.isfile(file)):
         raise FileNotFoundError(f'File "{file}" was not found')
     
-def get_extent(extent_id, media_extents):
-    return next(filter(lambda extent: extent['@extentID'] == extent_id, media_extents))
-
 def is_even(integer):
     return integer % 2 == 0
 
 def open_explorer_on_file(filepath):
     subprocess.Popen(f'explorer /select,"{filepath}"')
 
-def find_font_file(font_name): # only works with TrueType/OpenType fonts
-    font_dir_system = 'C:\\Windows\\Fonts\\'
-    font_dir_user = os.environ['USERPROFILE'] + '\\AppData\\Local\\Microsoft\\Windows\\Fonts\\'
-    font_paths_system = list(map(lambda filename: os.path.join(font_dir_system, filename), os.listdir(font_dir_system)))
-    font_paths_user = list(map(lambda filename: os.path.join(font_dir_user, filename), os.listdir(font_dir_user)))
-    
-    font_paths_filtered = list(filter(lambda filepath: os.path.isfile(filepath) and (os.path.splitext(filepath)[1] == '.ttf' or os.path.splitext(filepath)[1] == '.otf'), font_paths_system + font_paths_user)) # only allow ttf/otf fonts
-    for font_path in font_paths_filtered:
-        font = ttLib.TTFont(font_path)
-        font_family_name = font['name'].getDebugName(1)
-        font_full_name = font['name'].getDebugName(4)
-        if font_name == font_family_name or font_name == font_full_name:
-            return font_path
-    raise Exception(f'Font file (TrueType/OpenType) for font "{font_name}" was not found!')
+def find_font_file(font_name, font_dirs=None): # only works with TrueType/OpenType fonts, font_dirs are searched before the system/user font directories
+    from font_index import find_font # imported here because the font index uses the cache dir of this module
+    font_path = find_font(font_name, font_dirs)
+    if font_path is None:
+        raise Exception(f'Font file (TrueType/OpenType) for font "{font_name}" was not found!')
+    return font_path
+
+def get_cache_dir(): # returns the directory for persistent caches (e.g. font index), can be changed with the MOVIE_MAKER_RENDERER_CACHE_DIR environment variable
+    cache_dir = os.environ.get('MOVIE_MAKER_RENDERER_CACHE_DIR')
+    if not cache_dir:
+        if sys.platform == 'win32':
+            cache_dir = os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~\\AppData\\Local')), 'movie-maker-renderer')
+        else:
+            cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'movie-maker-renderer')
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def parse_time(text): # seconds from '75.5', '1:15.5' or '0:01:15.5'
+    seconds = 0.0
+    for part in text.strip().split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def parse_time_range(text): # (start, end) in seconds from 'START-END' e.g. '12-20' or '1:05-1:20', start or end can be left out ('-20', '1:05-')
+    start, separator, end = text.partition('-')
+    if not separator:
+        raise ValueError(f'Time range "{text}" must have the format START-END')
+    time_range = (parse_time(start) if start.strip() else 0.0, parse_time(end) if end.strip() else float('inf'))
+    if time_range[1] <= time_range[0]:
+        raise ValueError(f'End of time range "{text}" must be after its start')
+    return time_range
 
+def parse_output(text): # (file, width, height, fps) from 'FILE', 'FILE:WIDTHxHEIGHT' or 'FILE:WIDTHxHEIGHT@FPS' e.g. 'out_720p.mp4:1280x720@25', size and fps are None when left out
+    match = re.fullmatch(r'(.+):(\d+)x(\d+)(?:@(\d+))?', text.strip())
+    if match is None: # only a file name (can contain ':' on windows e.g. 'C:\\videos\\out.mp4')
+        return (text, None, None, None)
+    return (match[1], int(match[2]), int(match[3]), int(match[4]) if match[4] else None)
 
 def get_current_datetime():
     return datetime.datetime.now()